@@ -0,0 +1,562 @@
+from __future__ import annotations
+import asyncio
+import copy
+import os
+import time
+from urllib.parse import quote
+from tqdm import tqdm
+
+from Driveup.drive import col_idx_to_a1
+from Driveup.features import utils,service,manifest,resumable,sheets,aio,metrics
+
+from typing import Union, List, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+
+class AsyncDrive:
+    """Asyncio version of Drive: the same transfers as coroutines, on an aiohttp session.
+
+    Thousands of transfers can be in flight on a single event loop without threads. Requests
+    share the rate limiters of Drive (see executor) and files are sent and received in chunks
+    (resumable uploads, ranged downloads).
+
+    Example:
+        async with AsyncDrive(authorize(SECRET_PATH)) as drive:
+            await drive.upload_folder(LOCAL_PATH, FOLDER_ID)
+    """
+    def __init__(self,creds,metadata_ttl:float=60,root_url:str=None,max_connections:int=aio.DEFAULT_MAX_CONNECTIONS,timeout:float=None):
+        """Constructor for AsyncDrive.
+
+        Args:
+          creds: Dictionary containing credentials generated with auth lib and it's corresponding type
+          (value generated with the authorize method from the auth module in features).
+          metadata_ttl: Seconds that spreadsheet metadata (sheet titles, ids and grid sizes) is cached. 0 disables the cache.
+          root_url: Root URL of the Google APIs (e.g. 'http://localhost:8080/' for a local emulator). Defaults to Google's.
+          max_connections: Maximum number of HTTP connections open at the same time.
+          timeout: Seconds to wait for each request before giving up (None waits forever).
+
+        Needs aiohttp (pip install driveup[async]). The HTTP session is opened on first use,
+        close it with close() or by using the object as an async context manager.
+        """
+        self.mode = creds['type']
+        self.creds = creds
+        self.client = aio.AsyncClient(creds['creds'], root_url=root_url, max_connections=max_connections, timeout=timeout)
+        self.metadata_ttl = metadata_ttl
+        self._spreadsheets = {} # {spreadsheet_id: (expiration time, [sheet properties])}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self,*exc_info):
+        await self.close()
+
+    async def close(self):
+        """Closes the HTTP session."""
+        await self.client.close()
+
+    async def _drive_request(self,method:str,path:str,**kwargs):
+        return await self.client.request(method, self.client.drive_url + path, api='drive', **kwargs)
+
+    async def _sheets_request(self,method:str,path:str,**kwargs):
+        return await self.client.request(method, self.client.sheets_url + path, api='sheets', **kwargs)
+
+    async def _list_files(self,folder_id:str,fields:str=service.LISTING_FIELDS):
+        """Lists every file of a drive folder, following nextPageToken."""
+        files_list = []
+        page_token = None
+        while True:
+            response = await self._drive_request('GET', 'files', name='drive.files.list', params={
+                'q': f"'{folder_id}' in parents and trashed = false", 'fields': f"nextPageToken, files({fields})",
+                'pageSize': 1000, 'pageToken': page_token, 'supportsAllDrives': True
+            })
+            files_list.extend(response.get('files', []))
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                return files_list
+
+    async def _get_metadata(self,file_id:str,fields:str=None):
+        return await self._drive_request('GET', f'files/{file_id}', name='drive.files.get', params={'fields': fields, 'supportsAllDrives': True})
+
+    async def _create_subfolder(self,subfolder_name:str,parent_folder_id:str,folder_index:service.FolderIndex=None,update:bool=True):
+        """Creates (or finds, if update is True) a drive subfolder, keeping the parent's FolderIndex up to date."""
+        existing = folder_index.get(name=subfolder_name) if folder_index != None and update == True else None
+        if existing:
+            return existing['id']
+
+        subfolder = await self._drive_request('POST', 'files', name='drive.files.create', params={'fields': 'id', 'supportsAllDrives': True},
+                                              json_body={'name': subfolder_name, 'mimeType': FOLDER_MIME_TYPE, 'parents': [parent_folder_id]})
+        if self.mode == 'service':
+            await self._drive_request('PATCH', f"files/{subfolder['id']}", name='drive.files.update', params={'removeParents': parent_folder_id, 'addParents': parent_folder_id, 'supportsAllDrives': True}, json_body={})
+
+        if folder_index != None:
+            folder_index.add({'id': subfolder['id'], 'name': subfolder_name, 'mimeType': FOLDER_MIME_TYPE})
+
+        return subfolder['id']
+
+    async def _gather(self,coroutines,max_concurrency:int,pbar=None):
+        """Awaits coroutines with at most max_concurrency running at the same time.
+
+        Returns:
+            list: (result, exception) tuples, in the same order as coroutines.
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def run(coroutine):
+            async with semaphore:
+                try:
+                    return await coroutine, None
+                except Exception as e:
+                    return None, e
+                finally:
+                    if pbar is not None:
+                        pbar.update(1)
+
+        return await asyncio.gather(*(run(coroutine) for coroutine in coroutines))
+
+    async def upload(self,file_path: Union[str, List[str]],folder_id: Union[str, List[str]],file_title:str=None,file_id: Union[str, List[str]]=None,update:bool=True,convert:bool=False,url:bool=True,max_concurrency:int=100,skip_unchanged:bool=False,chunk_size:int=resumable.DEFAULT_CHUNK_SIZE,progress:bool=True,folder_index:service.FolderIndex=None):
+        """Upload a file or a list of files to a specified drive folder(s) by ID.
+
+        Same behaviour as Drive.upload: an existing file with the same name (or file_id) in the
+        folder is updated, otherwise a new one is created. Lists of files are uploaded concurrently.
+
+        Args:
+            file_path: Path or list of paths of the local file(s) wich content will be uploaded.
+            folder_id: ID of the drive folder(s) in wich the file(s) will be uploaded.
+            file_title: Name that will be shown in drive for the uploaded file. (If set to None, local file name will be used instead)
+            file_id: Pointing ID to overwrite the content of an specified, previously created, drive file within the folder.
+            update: If set to True, the content of an existing file with the same name in drive is overwritten. Otherwise, another one with the same name is created.
+            convert: If set to True, files are converted (if conversion is available) to their corresponding google mimeType in Drive.
+            url: If set to True, URL type input is accepted as folder_id and automatically converted to ID type.
+            max_concurrency: Number of files of a list uploaded at the same time.
+            skip_unchanged: If set to True, existing drive files with the same size and MD5 checksum as the local file aren't uploaded again.
+            chunk_size: Bytes sent per request of the resumable upload (must be a multiple of 256 KB).
+            progress: If set to True, a progress bar is shown (uploaded bytes of a single file, or uploaded files of a list).
+            folder_index: FolderIndex of the drive folder, to avoid listing it again (used by upload_folder).
+
+        Returns:
+            errors: Only for lists, dictionary mapping every failed local path to its exception.
+        """
+        if isinstance(file_path, list):
+            if isinstance(folder_id, list):
+                jobs = [(file,folder,None) for file,folder in zip(file_path,folder_id)]
+            elif file_id == None:
+                jobs = [(file,folder_id,None) for file in file_path]
+            else:
+                jobs = [(file,folder_id,id) for file,id in zip(file_path,file_id)]
+
+            if url == True:
+                jobs = [(file,utils.url_to_id(folder),id) for file,folder,id in jobs]
+
+            # Every folder is listed once for all its files
+            folder_ids = list(dict.fromkeys(folder for _,folder,_ in jobs))
+            listings = await asyncio.gather(*(self._list_files(folder) for folder in folder_ids))
+            folder_indexes = {folder: service.FolderIndex(files_list) for folder,files_list in zip(folder_ids,listings)}
+
+            pbar = tqdm(total=len(jobs), desc='Total upload progress: ', disable=not progress)
+            results = await self._gather((self.upload(file,folder,file_title=file_title,file_id=id,update=update,convert=convert,url=False,skip_unchanged=skip_unchanged,chunk_size=chunk_size,progress=False,folder_index=folder_indexes[folder]) for file,folder,id in jobs), max_concurrency, pbar)
+            pbar.close()
+
+            errors = {}
+            for (file,_,_),(_,exception) in zip(jobs,results):
+                if exception != None:
+                    errors[file] = exception
+                    metrics.log(f"Error uploading file: {file}\nERROR: {exception}", 'error', path=file, error=str(exception))
+            return errors
+
+        if isinstance(file_id, list):
+            file_id = file_id[0]
+        if isinstance(folder_id, list):
+            folder_id = folder_id[0]
+        if url == True:
+            folder_id = utils.url_to_id(folder_id)
+        if file_title == None:
+            file_title = utils.get_filename(file_path)
+
+        file_metadata = {'name': file_title, 'parents': [folder_id]}
+        if file_id != None:
+            file_metadata['id'] = file_id
+
+        file_extension = utils.get_file_extension(file_path)
+
+        if convert == True:
+            file_metadata = utils.convert(file_metadata,file_extension)
+        else:
+            file_metadata['name'] += f'.{file_extension}' if file_extension != "" else file_metadata['name']
+
+        if folder_index == None:
+            folder_index = service.FolderIndex(await self._list_files(folder_id))
+        existing = folder_index.get(file_id=file_metadata.get('id'),name=file_metadata['name'])
+
+        pbar = tqdm(total=os.path.getsize(file_path), unit='B', unit_scale=True, disable=not progress)
+        try:
+            if existing and update == True:
+                if skip_unchanged == True and manifest.is_unchanged(file_path,existing):
+                    return
+                gfile = await self.update(file_path,existing['id'],chunk_size=chunk_size,pbar=pbar)
+            else:
+                if update == False:
+                    file_metadata.pop('id', None)
+                gfile = await aio.upload_chunks(self.client, 'POST', self.client.upload_url + 'files', file_path, file_metadata,
+                                                params={'fields': 'id', 'supportsAllDrives': True}, chunk_size=chunk_size, pbar=pbar)
+                # Created with its folder in parents, also with service accounts: no parents update needed
+                folder_index.add({**file_metadata, 'id': gfile['id']})
+        finally:
+            pbar.close()
+
+        return gfile
+
+    async def update(self,file_path:str,file_id:str,chunk_size:int=resumable.DEFAULT_CHUNK_SIZE,pbar=None):
+        """Update content of a drive file with a local file.
+
+        Args:
+            file_path: Path of the local file wich content will be overwriting (updating) the drive file content.
+            file_id: ID of the drive file that will be updated.
+            chunk_size: Bytes sent per request (must be a multiple of 256 KB).
+            pbar: tqdm progress bar (with the file size as total) updated with the uploaded bytes.
+        """
+        return await aio.upload_chunks(self.client, 'PATCH', self.client.upload_url + f'files/{file_id}', file_path, {},
+                                       params={'supportsAllDrives': True}, chunk_size=chunk_size, pbar=pbar)
+
+    async def upload_folder(self,local_folder_path:str,folder_id:str,update:bool=True,subfolder:bool=False,subfolder_name:str=None,recursive:bool=True,convert:bool=False,url:bool=True,max_concurrency:int=100,skip_unchanged:bool=False,chunk_size:int=resumable.DEFAULT_CHUNK_SIZE):
+        """Upload entire local folder to a specified drive folder by ID.
+
+        Same behaviour as Drive.upload_folder with max_workers > 1: the local subfolder structure
+        is replicated in drive level by level (folders of a level are listed and created
+        concurrently) and then all files are uploaded concurrently.
+
+        Args:
+            local_folder_path: Path of the local folder wich contents will be uploaded.
+            folder_id: ID of the drive folder in wich the local folder's content will be uploaded.
+            update: If set to True, existing files and folders with the same name in drive are updated. Otherwise, new ones are created.
+            subfolder: If set to True, the content is uploaded to a new drive subfolder named as the local folder (or subfolder_name).
+            subfolder_name: Name of the subfolder created when subfolder is True. If set to None, the local folder name is used.
+            recursive: If set to True, subfolders are uploaded too. Otherwise, only the files of the folder are uploaded.
+            convert: If set to True, files are converted (if conversion is available) to their corresponding google mimeType in Drive.
+            url: If set to True, URL type input is accepted as folder_id and automatically converted to ID type.
+            max_concurrency: Number of files uploaded at the same time.
+            skip_unchanged: If set to True, existing drive files with the same size and MD5 checksum as the local ones aren't uploaded again.
+            chunk_size: Bytes sent per request of each resumable upload (must be a multiple of 256 KB).
+
+        Returns:
+            errors: Dictionary mapping the local path of every file that couldn't be uploaded to its exception.
+        """
+        if url == True:
+            folder_id = utils.url_to_id(folder_id)
+
+        if subfolder == True:
+            if subfolder_name == None:
+                subfolder_name = utils.get_filename(local_folder_path)
+            folder_id = await self._create_subfolder(subfolder_name,folder_id,service.FolderIndex(await self._list_files(folder_id)),update)
+
+        jobs = [] # (file_path, folder_id, FolderIndex of the folder)
+        level = [(local_folder_path,folder_id)]
+        while level:
+            listings = await asyncio.gather(*(self._list_files(drive_folder_id) for _,drive_folder_id in level))
+
+            subfolders = []
+            for (local_path,drive_folder_id),files_list in zip(level,listings):
+                folder_index = service.FolderIndex(files_list)
+                for file in os.listdir(local_path):
+                    file_path = str(local_path) + '/' + file
+                    if os.path.isfile(file_path):
+                        jobs.append((file_path,drive_folder_id,folder_index))
+                    elif os.path.isdir(file_path):
+                        if recursive == True:
+                            subfolders.append((file_path,utils.get_filename(file_path),drive_folder_id,folder_index))
+                    else:
+                        metrics.log('\nError uploading file: ' + file_path + '\n(Not file or directory)', 'error')
+
+            subfolder_ids = await asyncio.gather(*(self._create_subfolder(name,parent,folder_index,update) for _,name,parent,folder_index in subfolders))
+            level = [(file_path,subfolder_id) for (file_path,_,_,_),subfolder_id in zip(subfolders,subfolder_ids)]
+
+        metrics.log(f'Started uploading folder with {len(jobs)} files\n')
+        pbar = tqdm(total=len(jobs), desc='Total upload progress: ')
+        results = await self._gather((self.upload(file_path,drive_folder_id,update=update,convert=convert,url=False,skip_unchanged=skip_unchanged,chunk_size=chunk_size,progress=False,folder_index=folder_index) for file_path,drive_folder_id,folder_index in jobs), max_concurrency, pbar)
+        pbar.close()
+
+        errors = {}
+        for (file_path,_,_),(_,exception) in zip(jobs,results):
+            if exception != None:
+                errors[file_path] = exception
+                metrics.log(f"Error uploading file: {file_path}\nERROR: {exception}", 'error', path=file_path, error=str(exception))
+
+        return errors
+
+    async def download(self,id:str,path:str,file_metadata:dict=None,chunk_size:int=resumable.DEFAULT_CHUNK_SIZE,progress:bool=True):
+        """Downloads file.
+
+        Same behaviour as Drive.download: binary files are downloaded as they are (in ranged
+        chunks, resuming an existing '<path>.part' file) and Google native files are exported
+        to the format given by the extension of path.
+
+        Args:
+            id: Drive file wich content will be downloaded (specified by it's ID)
+            path: Local path file in wich the content will be downloaded (name of the file with extension must be included)
+            file_metadata: Drive metadata of the file (at least its 'mimeType'), e.g. an item of a folder listing. If set to None, it's requested to the API.
+            chunk_size: Bytes requested per HTTP request.
+            progress: If set to True, a progress bar with the downloaded bytes is shown.
+
+        Returns:
+            str: Local path of the downloaded file, or None if it couldn't be downloaded (the error is logged).
+        """
+        extension = utils.get_file_extension(path)
+
+        if file_metadata == None:
+            file_metadata = await self._get_metadata(id,fields=service.LISTING_FIELDS)
+
+        new_extension,export_type = utils.get_export_type(file_metadata,extension)
+
+        # When extension is not specified in path, it is created by default from file's mimeType
+        if extension == '' and new_extension:
+            path = path + '.' + new_extension
+
+        if export_type == 'error':
+            metrics.log("\nError downloading file: " + path + "\n." + extension + " extension it's not an available type of convertion for the specified file", 'error')
+        elif export_type == 'folder-error':
+            metrics.log("\nError downloading file: " + path + "\n. File id detected as a folder. Download method is not intended for downloading drive folders, use 'download_folder()' instead", 'error')
+        else:
+            try:
+                await self._download_content(id,path,export_type,file_metadata,chunk_size,progress)
+                return path
+            except Exception as e:
+                metrics.log(f"Error downloading file: {path}\nERROR: {e}", 'error', path=path, error=str(e))
+
+        return None
+
+    async def _download_content(self,id:str,path:str,mode:str,file_metadata:dict,chunk_size:int,progress:bool):
+        """Downloads (mode 'binary') or exports (mode is the export mimeType) a file to '<path>.part' and renames it to path."""
+        size = int(file_metadata['size']) if file_metadata.get('size') != None else None
+        part_path = path + '.part'
+
+        if mode == 'binary':
+            url, params = self.client.drive_url + f'files/{id}', {'alt': 'media', 'supportsAllDrives': True}
+            offset = os.path.getsize(part_path) if os.path.isfile(part_path) else 0
+            if size == None or offset > size:
+                offset = 0
+        else:
+            # Exports are generated on the fly, they can't be resumed
+            url, params = self.client.drive_url + f'files/{id}/export', {'mimeType': mode}
+            offset = 0
+
+        pbar = tqdm(total=size, initial=offset, unit='B', unit_scale=True, disable=not progress)
+        with open(part_path, 'ab' if offset else 'wb') as fh:
+            if size == None or offset < size:
+                await aio.download_chunks(self.client, url, fh, offset=offset, size=size, chunk_size=chunk_size, params=params, pbar=pbar)
+        pbar.close()
+
+        if offset and file_metadata.get('md5Checksum') and manifest.file_md5(part_path) != file_metadata['md5Checksum']:
+            os.remove(part_path)
+            return await self._download_content(id,path,mode,file_metadata,chunk_size,progress)
+
+        os.replace(part_path, path)
+
+    async def download_folder(self,local_folder_path:str,folder_id:str,subfolder:bool=False,recursive:bool=True,url:bool=True,max_concurrency:int=100,chunk_size:int=resumable.DEFAULT_CHUNK_SIZE):
+        """Downloads entire drive folder.
+
+        Same behaviour as Drive.download_folder with max_workers > 1: the drive tree is listed
+        level by level (folders of a level concurrently), creating the local subfolders, and
+        then all files are downloaded concurrently. Files that would share a local path (same
+        names, or subfolders flattened with recursive=False) get ' (1)', ' (2)'... suffixes.
+
+        Args:
+            local_folder_path: Path of the local folder in wich the content will be downloaded.
+            folder_id: ID of the drive folder wich content will be downloaded.
+            subfolder: If set to True, a local folder named as the drive folder is created inside local_folder_path and the content is downloaded there.
+            recursive: If set to True, drive subfolders are replicated locally. Otherwise, the files of all subfolders are downloaded to the same local folder.
+            url: If set to True, URL type input is accepted as folder_id and automatically converted to ID type.
+            max_concurrency: Number of files downloaded at the same time.
+            chunk_size: Bytes requested per HTTP request of each download.
+
+        Returns:
+            tuple: Number of files found and number of files downloaded.
+        """
+        if url == True:
+            folder_id = utils.url_to_id(folder_id)
+
+        if subfolder == True:
+            folder_metadata = await self._get_metadata(folder_id,fields='id, name')
+            local_folder_path = os.path.join(local_folder_path,folder_metadata['name'])
+            os.makedirs(local_folder_path, exist_ok=True)
+
+        jobs = [] # (file_metadata, local_file_path)
+        used_paths = set()
+        level = {folder_id: local_folder_path}
+        while level:
+            listings = await asyncio.gather(*(self._list_files(drive_folder_id) for drive_folder_id in level))
+            next_level = {}
+            for (drive_folder_id,local_path),files_list in zip(level.items(),listings):
+                for file in files_list:
+                    if file['mimeType'] == FOLDER_MIME_TYPE:
+                        if recursive == True:
+                            subfolder_path = os.path.join(local_path,file['name'])
+                            os.makedirs(subfolder_path, exist_ok=True)
+                        else:
+                            subfolder_path = local_path
+                        next_level[file['id']] = subfolder_path
+                    else:
+                        jobs.append((file,utils.unique_path(utils.download_path(file,local_path),used_paths)))
+            level = next_level
+
+        pbar = tqdm(total=len(jobs), desc='Total download progress: ')
+        results = await self._gather((self.download(file['id'],file_path,file_metadata=file,chunk_size=chunk_size,progress=False) for file,file_path in jobs), max_concurrency, pbar)
+        pbar.close()
+
+        return len(jobs),sum(1 for path,exception in results if exception == None and path != None)
+
+    async def _get_spreadsheet_sheets(self,spreadsheet_id:str,refresh:bool=False) -> list:
+        """Returns the properties (sheetId, title, gridProperties) of every sheet of a spreadsheet, cached for metadata_ttl seconds.
+
+        Cached grid sizes may be stale: anything sized from gridProperties must use refresh=True (see Drive._get_spreadsheet_sheets).
+        """
+        cached = self._spreadsheets.get(spreadsheet_id)
+        if cached and cached[0] > time.monotonic() and not refresh:
+            return copy.deepcopy(cached[1])
+
+        spreadsheet = await self._sheets_request('GET', f'spreadsheets/{spreadsheet_id}', name='sheets.spreadsheets.get', params={'fields': 'sheets(properties(sheetId,title,gridProperties))'})
+        sheets_props = [sheet.get('properties', {}) for sheet in spreadsheet.get('sheets', [])]
+
+        if self.metadata_ttl > 0:
+            self._spreadsheets[spreadsheet_id] = (time.monotonic() + self.metadata_ttl, sheets_props)
+
+        return copy.deepcopy(sheets_props)
+
+    def invalidate_metadata(self,spreadsheet_id:str=None):
+        """Discards cached spreadsheet metadata (all of it if spreadsheet_id is None), see Drive.invalidate_metadata."""
+        if spreadsheet_id == None:
+            self._spreadsheets.clear()
+        else:
+            self._spreadsheets.pop(spreadsheet_id, None)
+
+    async def _get_sheet_properties(self,spreadsheet_id:str,sheet_name:str=None,refresh:bool=False) -> Optional[dict]:
+        for props in await self._get_spreadsheet_sheets(spreadsheet_id,refresh):
+            if sheet_name == None or props.get('title') == sheet_name:
+                return props
+        return None
+
+    async def _resize_sheet(self,spreadsheet_id:str,sheet_id:int,rows:int,cols:int,clear_values:bool=False):
+        """Resizes a sheet (at least 1x1), clearing its values in the same request if clear_values is True."""
+        rows, cols = max(1, rows), max(1, cols)
+        requests = [{"updateSheetProperties": {
+            "properties": {"sheetId": sheet_id, "gridProperties": {"rowCount": rows, "columnCount": cols}},
+            "fields": "gridProperties(rowCount,columnCount)"
+        }}]
+        if clear_values:
+            requests.append({"updateCells": {"range": {"sheetId": sheet_id}, "fields": "userEnteredValue"}})
+
+        try:
+            await self._sheets_request('POST', f'spreadsheets/{spreadsheet_id}:batchUpdate', name='sheets.spreadsheets.batchUpdate', json_body={"requests": requests})
+        except Exception:
+            self.invalidate_metadata(spreadsheet_id)
+            raise
+
+        cached = self._spreadsheets.get(spreadsheet_id)
+        for props in (cached[1] if cached else []):
+            if props.get('sheetId') == sheet_id:
+                props.setdefault('gridProperties', {}).update({'rowCount': rows, 'columnCount': cols})
+
+    async def df_update(self,df: pd.DataFrame,spreadsheet_id:str,sheet_name:str=None,unformat:bool=False,chunk_size:int=2000,reset_sheet_structure:bool=True,max_payload_bytes:int=sheets.MAX_PAYLOAD_BYTES):
+        """Update content of a drive sheet with a pandas dataframe.
+
+        Same behaviour as Drive.df_update (without diff mode or lists of DataFrames): the sheet is
+        resized (or expanded) and cleared, and values are written in chunks of chunk_size rows
+        packed into values.batchUpdate requests of at most max_payload_bytes.
+
+        Args:
+            df: DataFrame.
+            spreadsheet_id: ID of the Google Spreadsheet.
+            sheet_name: Name of the sheet. Defaults to the first sheet.
+            unformat: If True, fill NaN with 'NULL' and convert all to string.
+            chunk_size: Rows per chunk.
+            reset_sheet_structure: If True, the sheet is resized to fit the DataFrame. Otherwise, it's only expanded if necessary.
+            max_payload_bytes: Maximum size of each write request body.
+
+        Raises:
+            ValueError: If the sheet doesn't exist.
+        """
+        sheet_props = await self._get_sheet_properties(spreadsheet_id, sheet_name, refresh=not reset_sheet_structure)
+        if not sheet_props:
+            raise ValueError(f"Sheet named '{sheet_name}' not found in {spreadsheet_id}.")
+
+        sheet_name = sheet_props['title']
+        grid = sheet_props.get('gridProperties', {})
+        headers_list = sheets.serialize_headers(df, unformat) if not df.columns.empty else []
+        total_rows = (1 if headers_list else 0) + len(df)
+        num_cols = df.shape[1]
+
+        if reset_sheet_structure:
+            await self._resize_sheet(spreadsheet_id, sheet_props['sheetId'], total_rows, num_cols, clear_values=True)
+        elif total_rows > grid.get('rowCount', 1) or num_cols > grid.get('columnCount', 1):
+            await self._resize_sheet(spreadsheet_id, sheet_props['sheetId'], max(grid.get('rowCount', 1), total_rows), max(grid.get('columnCount', 1), num_cols), clear_values=True)
+        else:
+            sheet_range = "'" + sheet_name.replace("'", "''") + "'"
+            await self._sheets_request('POST', f"spreadsheets/{spreadsheet_id}/values/{quote(sheet_range, safe='')}:clear", name='sheets.spreadsheets.values.clear', json_body={})
+
+        if total_rows == 0:
+            return
+
+        end_col_letter = col_idx_to_a1(num_cols - 1) if num_cols > 0 else "A"
+
+        def chunk_ranges():
+            current_row = 1
+            if headers_list:
+                yield f"'{sheet_name}'!A1:{end_col_letter}1", [headers_list]
+                current_row += 1
+            for chunk in sheets.iter_rows(df, chunk_size, unformat):
+                yield f"'{sheet_name}'!A{current_row}:{end_col_letter}{current_row + len(chunk) - 1}", chunk
+                current_row += len(chunk)
+
+        for data in sheets.pack_ranges(chunk_ranges(), max_payload_bytes):
+            await self._sheets_request('POST', f'spreadsheets/{spreadsheet_id}/values:batchUpdate', name='sheets.spreadsheets.values.batchUpdate', json_body={'valueInputOption': 'USER_ENTERED', 'data': data})
+
+    async def df_download(self,id:str,sheet_name:str=None,unformat:bool=False,block_size:int=10000,max_concurrency:int=1,infer_dtypes:bool=False,dtype:dict=None,dtype_backend:str=None):
+        """Download content of a drive sheet to a pandas dataframe.
+
+        Same behaviour as Drive.df_download: the sheet is read in blocks of block_size rows,
+        max_concurrency of them at the same time.
+
+        Args:
+            id: ID of the drive sheet that will be downloaded.
+            sheet_name: Name of the specific sheet that will be downloaded. If set to None, first sheet of the file will be downloaded.
+            unformat: If True, fill missing values with 'NULL' and convert all to string.
+            block_size: Rows read by each request.
+            max_concurrency: Number of blocks fetched at the same time.
+            infer_dtypes: If True, columns whose values are all numbers, booleans or dates get numeric, boolean or datetime dtypes.
+            dtype: Dictionary {column: dtype} of types to apply to specific columns.
+            dtype_backend: 'numpy_nullable' or 'pyarrow' (needs pyarrow installed) to convert the result with DataFrame.convert_dtypes.
+        """
+        # Values of a named sheet are read unformatted, the first sheet keeps the default (formatted) rendering
+        render_options = {} if sheet_name == None else {'valueRenderOption': 'UNFORMATTED_VALUE', 'dateTimeRenderOption': 'FORMATTED_STRING'}
+
+        sheet_props = await self._get_sheet_properties(id, sheet_name)
+        if not sheet_props:
+            metrics.log(f"Error: Sheet named '{sheet_name}' not found in {id}.", 'error')
+            return None
+
+        title = sheet_props['title'].replace("'", "''")
+
+        async def get_block(block):
+            # Whole rows, or the whole sheet for a single block
+            start, end = block
+            block_range = quote(f"'{title}'!{start}:{end}" if end != None else f"'{title}'", safe='')
+            response = await self._sheets_request('GET', f"spreadsheets/{id}/values/{block_range}", name='sheets.spreadsheets.values.get', params=render_options)
+            values = response.get('values', [])
+            return (end - start + 1 if end != None else len(values)), values
+
+        # The cached grid size may be stale, it's only trusted to read small sheets whole (see Drive._get_sheet_values)
+        if sheet_props.get('gridProperties', {}).get('rowCount', 1) <= block_size:
+            blocks = [(1, None)]
+        else:
+            fresh_props = await self._get_sheet_properties(id, sheet_props['title'], refresh=True) or sheet_props
+            blocks = sheets.row_blocks(fresh_props.get('gridProperties', {}).get('rowCount', 1), block_size)
+
+        results = await self._gather((get_block(block) for block in blocks), max_concurrency)
+        for _,exception in results:
+            if exception != None:
+                raise exception
+
+        values = sheets.join_blocks(result for result,_ in results)
+
+        return sheets.build_frame(values, unformat=unformat, infer_dtypes=infer_dtypes, dtype=dtype, dtype_backend=dtype_backend)
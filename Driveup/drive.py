@@ -1,15 +1,22 @@
-from googleapiclient.discovery import build
+from __future__ import annotations
 from googleapiclient.http import MediaFileUpload
 import os
-import pandas as pd
 # import io
 # from googleapiclient.http import MediaIoBaseDownload
-from tqdm import tqdm
 import string
+import threading
+import functools
+import copy
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-from Driveup.features import utils,service
+from Driveup.features import utils,service,manifest,resumable,sheets,executor,transport,discovery,metrics
 
-from typing import overload,Union,List, Optional
+from typing import overload,Union,List, Optional, Iterable, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    # pandas is only imported when a DataFrame method is called
+    import pandas as pd
 
 def col_idx_to_a1(col_idx: int) -> str:
     """Converts a 0-indexed column number into an A1 notation letter (e.g., 0 -> A, 26 -> AA)."""
@@ -24,10 +31,48 @@ def col_idx_to_a1(col_idx: int) -> str:
         idx = idx // 26 - 1
     return letters if letters else "A" # Should not be empty if col_idx >=0
 
+class _BulkUpload:
+    """State shared by the calls of one bulk upload (see bulk_upload). Safe to share between threads."""
+    def __init__(self):
+        self.folder_indexes = {} # {folder_id: FolderIndex}
+        self.folder_locks = {} # {folder_id: Lock held while the folder is being listed}
+        self.pending_parents = [] # [(file_id, old_parents, folder_id, file_path)] parent fix-ups waiting to be batched
+        self.parent_errors = {} # {file_path: exception} fix-ups that failed and weren't reported yet
+        self.manifests = {} # {manifest_path: Manifest}
+        self.lock = threading.Lock()
+
+def bulk_upload(method):
+    """Scopes the state shared by a (possibly recursive or parallel) bulk upload.
+
+    While the outermost call runs, drive folders are listed at most once (per-folder indexes),
+    service-mode parent fix-ups are queued to be sent in HTTP batches and incremental upload
+    manifests are loaded once. Queued fix-ups are flushed, manifests saved and indexes
+    discarded when it returns, so nothing outlives the upload.
+
+    The state belongs to the calling thread (and to the workers of its parallel transfers),
+    so several threads can run bulk uploads on the same Drive object at the same time.
+    """
+    @functools.wraps(method)
+    def wrapper(self,*args,**kwargs):
+        if self._bulk != None:
+            return method(self,*args,**kwargs)
+
+        bulk = self._local.bulk = _BulkUpload()
+        try:
+            return method(self,*args,**kwargs)
+        finally:
+            try:
+                self._flush_parents()
+                for upload_manifest in bulk.manifests.values():
+                    upload_manifest.save()
+            finally:
+                self._local.bulk = None
+    return wrapper
+
 class Drive:
     """Contains DriveUp main methods and have full access to both drive and sheets API.
     """
-    def __init__(self,creds):
+    def __init__(self,creds,metadata_ttl:float=60,pool_size:int=None,root_url:str=None):
         """Constructor for Drive.
 
         Use credentials from authorization flow to create the object and it's services based on them.
@@ -35,31 +80,386 @@ class Drive:
         Args:
           creds: Dictionary containing credentials generated with auth lib and it's corresponding type. 
           Value generated with the authorize method from the auth module in features
+          metadata_ttl: Seconds that spreadsheet metadata (sheet titles, ids and grid sizes) is cached. 0 disables the cache.
+          pool_size: If set, services use a pooled keep-alive transport (requests session) with this many
+          connections per host, shared by all threads, instead of one httplib2 connection per service.
+          root_url: Root URL of the Google APIs (e.g. 'http://localhost:8080/' for a local emulator). Defaults to Google's.
+
+        Services are built lazily, the first time they are used.
         """
         self.mode = creds['type']
-        self.drive_service = build('drive', 'v3', credentials=creds['creds'])
-        self.sheets_service = build('sheets', 'v4', credentials=creds['creds'])
+        self.creds = creds
+        self._local = threading.local()
+        self._session_stores = {} # {resume_path: SessionStore} of resumable uploads
+        self._session_stores_lock = threading.Lock()
+        self.metadata_ttl = metadata_ttl
+        self._spreadsheets = {} # {spreadsheet_id: (expiration time, [sheet properties])}
+        self._spreadsheets_lock = threading.Lock()
+        self.root_url = root_url
+        self._http = transport.SessionHttp(creds['creds'], pool_size=pool_size) if pool_size else None
+        self._services = {} # {api name: client shared by every thread}, only with the pooled transport
+        self._services_lock = threading.Lock()
+
+    def _build(self,service_name:str,version:str):
+        """Builds a client of a Google API, on the pooled transport if there is one."""
+        if self._http != None:
+            return discovery.build(service_name, version, root_url=self.root_url, http=self._http)
+
+        return discovery.build(service_name, version, root_url=self.root_url, credentials=self.creds['creds'])
+
+    def _get_service(self,service_name:str,version:str):
+        """Returns the client of an API used by the calling thread, building it the first time.
+
+        The httplib2 transport behind a client is not thread-safe, so every thread gets its own
+        client. With the pooled transport (thread-safe), all threads share the same one.
+        """
+        attribute = service_name + '_service'
+        api_service = getattr(self._local, attribute, None)
+        if api_service != None:
+            return api_service
+
+        if self._http != None:
+            with self._services_lock:
+                api_service = self._services.get(service_name)
+                if api_service == None:
+                    api_service = self._services[service_name] = self._build(service_name, version)
+        else:
+            api_service = self._build(service_name, version)
 
-    def _get_sheet_properties(self, spreadsheet_id: str, sheet_name: str) -> Optional[dict]:
-        """Helper to get sheet properties (including sheetId) from sheetName."""
-        try:
-            spreadsheet = self.sheets_service.spreadsheets().get(
-                spreadsheetId=spreadsheet_id, fields="sheets(properties(sheetId,title,gridProperties))"
-            ).execute()
-            for sheet in spreadsheet.get('sheets', []):
-                props = sheet.get('properties', {})
-                if props.get('title') == sheet_name:
-                    return props
+        setattr(self._local, attribute, api_service)
+        return api_service
+
+    @property
+    def drive_service(self):
+        """Drive service of the calling thread (see _get_service)."""
+        return self._get_service('drive', 'v3')
+
+    @property
+    def sheets_service(self):
+        """Sheets service of the calling thread (see _get_service)."""
+        return self._get_service('sheets', 'v4')
+
+    def _init_worker(self,bulk=None):
+        """Thread pool initializer of parallel transfers (the worker's clients are built on first use).
+
+        Args:
+            bulk: State of the bulk upload the worker takes part in (None outside bulk uploads).
+        """
+        self._local.worker = True
+        self._local.bulk = bulk
+
+    @property
+    def _bulk(self):
+        """State of the bulk upload run by the calling thread (None outside bulk uploads)."""
+        return getattr(self._local, 'bulk', None)
+
+    def _get_folder_index(self,folder_id:str):
+        """Returns the listing index of a drive folder, listing it only the first time (None outside bulk uploads).
+
+        Only callers asking for the same folder wait for its listing, other folders are listed in parallel.
+        """
+        bulk = self._bulk
+        if bulk == None:
             return None
-        except Exception as e:
-            print(f"Error getting sheet properties for '{sheet_name}': {e}")
+
+        with bulk.lock:
+            folder_index = bulk.folder_indexes.get(folder_id)
+            if folder_index != None:
+                return folder_index
+            folder_lock = bulk.folder_locks.setdefault(folder_id,threading.Lock())
+
+        with folder_lock:
+            with bulk.lock:
+                folder_index = bulk.folder_indexes.get(folder_id)
+            if folder_index == None:
+                listed = service.FolderIndex(service.list_files(folder_id,self.drive_service,fields=service.LISTING_FIELDS))
+                with bulk.lock:
+                    folder_index = bulk.folder_indexes.setdefault(folder_id,listed)
+
+        return folder_index
+
+    def _add_empty_folder_index(self,folder_id:str):
+        """Indexes a folder that was just created: it's empty, so there's no need to list it."""
+        bulk = self._bulk
+        if bulk != None:
+            with bulk.lock:
+                bulk.folder_indexes.setdefault(folder_id,service.FolderIndex())
+
+    def _index_folders(self,folder_ids):
+        """Lists (in HTTP batches) every folder in folder_ids that isn't indexed yet."""
+        bulk = self._bulk
+        with bulk.lock:
+            missing = [folder_id for folder_id in dict.fromkeys(folder_ids) if folder_id not in bulk.folder_indexes]
+
+        if missing:
+            listings = service.list_folders(missing,self.drive_service,fields=service.LISTING_FIELDS)
+            with bulk.lock:
+                for folder_id,files_list in listings.items():
+                    bulk.folder_indexes.setdefault(folder_id,service.FolderIndex(files_list))
+
+    def _get_manifest(self,manifest_path:str):
+        """Returns the incremental upload manifest stored in manifest_path, loading it only once per bulk upload."""
+        if manifest_path == None:
             return None
 
-    def _resize_sheet(self, spreadsheet_id: str, sheet_id: int, rows: int, cols: int):
-        """Resizes the given sheet to specified rows and columns."""
+        bulk = self._bulk
+        with bulk.lock:
+            upload_manifest = bulk.manifests.get(manifest_path)
+            if upload_manifest == None:
+                upload_manifest = manifest.Manifest(manifest_path)
+                bulk.manifests[manifest_path] = upload_manifest
+
+        return upload_manifest
+
+    def _get_session_store(self,resume_path:str):
+        """Returns the store of resumable upload sessions saved in resume_path (None disables persistence)."""
+        if resume_path == None:
+            return None
+
+        with self._session_stores_lock:
+            session_store = self._session_stores.get(resume_path)
+            if session_store == None:
+                session_store = resumable.SessionStore(resume_path)
+                self._session_stores[resume_path] = session_store
+
+        return session_store
+
+    def _fix_parents(self,file_id:str,old_parents,folder_id:str,file_path:str=None):
+        """Moves a file created by a service account to its folder.
+
+        During bulk uploads the update is queued and sent later in an HTTP batch together with others,
+        failures are reported under file_path (see _collect_parent_errors).
+        """
+        bulk = self._bulk
+        if bulk == None:
+            executor.execute(self.drive_service.files().update(fileId=file_id,removeParents=old_parents,addParents=folder_id,supportsAllDrives=True))
+            return
+
+        with bulk.lock:
+            bulk.pending_parents.append((file_id,old_parents,folder_id,file_path))
+            flush = len(bulk.pending_parents) >= 100
+
+        if flush:
+            self._flush_parents()
+
+    def _flush_parents(self):
+        """Sends the queued parent fix-ups in HTTP batches."""
+        bulk = self._bulk
+        with bulk.lock:
+            pending,bulk.pending_parents = bulk.pending_parents,[]
+
+        if not pending:
+            return
+
+        drive_service = self.drive_service
+        requests = [drive_service.files().update(fileId=file_id,removeParents=old_parents,addParents=folder_id,supportsAllDrives=True) for file_id,old_parents,folder_id,_ in pending]
+
+        for (file_id,_,folder_id,file_path),(_,exception) in zip(pending,service.batch_execute(requests,drive_service)):
+            if exception != None:
+                metrics.log(f"Error moving file {file_id} to folder {folder_id}\nERROR: {exception}", 'error', file_id=file_id, folder_id=folder_id, path=file_path, error=str(exception))
+                with bulk.lock:
+                    bulk.parent_errors[file_path] = exception
+
+    def _collect_parent_errors(self,errors:dict):
+        """Sends the queued parent fix-ups and moves the failed ones into errors (keyed by local path)."""
+        self._flush_parents()
+
+        bulk = self._bulk
+        with bulk.lock:
+            parent_errors,bulk.parent_errors = bulk.parent_errors,{}
+        errors.update(parent_errors)
+
+        return errors
+
+    def _create_subfolders(self,folders,update:bool=True):
+        """Creates (or finds, if update is True) several drive subfolders with batched requests.
+
+        Args:
+            folders: List of (subfolder_name, parent_folder_id) tuples.
+            update: If set to True, existing subfolders with the same name are reused.
+
+        Returns:
+            subfolder_ids: IDs of the subfolders, in the same order as folders.
+        """
+        self._index_folders(parent_folder_id for _,parent_folder_id in folders)
+
+        subfolder_ids = [None] * len(folders)
+        to_create = []
+        for i,(subfolder_name,parent_folder_id) in enumerate(folders):
+            existing = self._get_folder_index(parent_folder_id).get(name=subfolder_name) if update == True else None
+            if existing:
+                subfolder_ids[i] = existing['id']
+            else:
+                to_create.append(i)
+
+        drive_service = self.drive_service
+        requests = [
+            drive_service.files().create(body={'name': folders[i][0], 'mimeType': 'application/vnd.google-apps.folder', 'parents': [folders[i][1]]}, fields='id',supportsAllDrives=True)
+            for i in to_create
+        ]
+        for i,(subfolder_metadata,exception) in zip(to_create,service.batch_execute(requests,drive_service)):
+            if exception != None:
+                raise exception
+            subfolder_ids[i] = subfolder_metadata['id']
+
+        if self.mode == 'service':
+            requests = [drive_service.files().update(fileId=subfolder_ids[i],removeParents=folders[i][1],addParents=folders[i][1],supportsAllDrives=True) for i in to_create]
+            for _,exception in service.batch_execute(requests,drive_service):
+                if exception != None:
+                    raise exception
+
+        for i in to_create:
+            self._get_folder_index(folders[i][1]).add({'id': subfolder_ids[i], 'name': folders[i][0], 'mimeType': 'application/vnd.google-apps.folder'})
+            self._add_empty_folder_index(subfolder_ids[i])
+
+        return subfolder_ids
+
+    def _create_subfolder(self,subfolder_name:str,parent_folder_id:str,update:bool=True):
+        """Creates (or finds, if update is True) a drive subfolder keeping folder indexes up to date."""
+        folder_index = self._get_folder_index(parent_folder_id)
+        existing = folder_index.get(name=subfolder_name) if folder_index != None and update == True else None
+
+        subfolder_id = service.create_subfolder(subfolder_name,None,parent_folder_id,update,self.drive_service,self.mode,folder_index)
+
+        if folder_index != None and existing == None:
+            self._add_empty_folder_index(subfolder_id)
+
+        return subfolder_id
+
+    def _parallel_upload(self,jobs,max_workers:int,pbar=None,**upload_options):
+        """Uploads (file_path, folder_id, file_id) jobs concurrently.
+
+        Each worker thread uploads through its own drive client. Failed uploads don't stop the
+        remaining ones, they are reported and collected instead. upload_options are passed to
+        every upload call (update, convert, file_title...).
+
+        Returns:
+            errors: Dictionary mapping the local path of every failed file to its exception.
+        """
+        errors = {}
+        with ThreadPoolExecutor(max_workers=max_workers,initializer=self._init_worker,initargs=(self._bulk,)) as pool:
+            futures = {
+                pool.submit(self.upload,file_path,folder_id=folder,file_id=file_id,url=False,**upload_options): file_path
+                for file_path,folder,file_id in jobs
+            }
+            for future in as_completed(futures):
+                file_path = futures[future]
+                try:
+                    future.result()
+                except Exception as e:
+                    errors[file_path] = e
+                    metrics.log(f"Error uploading file: {file_path}\nERROR: {e}", 'error', path=file_path, error=str(e))
+                if pbar is not None:
+                    pbar.update(1)
+        return errors
+
+    def _get_spreadsheet_sheets(self, spreadsheet_id: str, refresh: bool = False) -> list:
+        """Returns the properties (sheetId, title, gridProperties) of every sheet of a spreadsheet.
+
+        Properties are cached for metadata_ttl seconds, writes made through this object
+        (e.g. _resize_sheet) update the cache. Grid sizes can be changed by others while they
+        are cached: anything sized from gridProperties (resizes, ranges) must use refresh=True,
+        which reads the properties again.
+        """
+        with self._spreadsheets_lock:
+            cached = self._spreadsheets.get(spreadsheet_id)
+            if cached and cached[0] > time.monotonic() and not refresh:
+                return copy.deepcopy(cached[1])
+
+        spreadsheet = executor.execute(self.sheets_service.spreadsheets().get(
+            spreadsheetId=spreadsheet_id, fields="sheets(properties(sheetId,title,gridProperties))"
+        ))
+        sheets_props = [sheet.get('properties', {}) for sheet in spreadsheet.get('sheets', [])]
+
+        if self.metadata_ttl > 0:
+            with self._spreadsheets_lock:
+                self._spreadsheets[spreadsheet_id] = (time.monotonic() + self.metadata_ttl, sheets_props)
+
+        return copy.deepcopy(sheets_props)
+
+    def _update_cached_grid(self, spreadsheet_id: str, sheet_id: int, rows: int = None, cols: int = None):
+        """Updates the cached grid size of a sheet after a write changed it."""
+        with self._spreadsheets_lock:
+            cached = self._spreadsheets.get(spreadsheet_id)
+            if not cached:
+                return
+            for props in cached[1]:
+                if props.get('sheetId') == sheet_id:
+                    grid = props.setdefault('gridProperties', {})
+                    if rows != None:
+                        grid['rowCount'] = rows
+                    if cols != None:
+                        grid['columnCount'] = cols
+
+    def invalidate_metadata(self, spreadsheet_id: str = None):
+        """Discards cached spreadsheet metadata.
+
+        Needed when sheets are added, renamed or resized outside this object before the cache expires.
+
+        Args:
+            spreadsheet_id: ID of the spreadsheet whose metadata is discarded. If None, the whole cache is cleared.
+        """
+        with self._spreadsheets_lock:
+            if spreadsheet_id == None:
+                self._spreadsheets.clear()
+            else:
+                self._spreadsheets.pop(spreadsheet_id, None)
+
+    def _get_sheet_properties(self, spreadsheet_id: str, sheet_name: str = None, refresh: bool = False) -> Optional[dict]:
+        """Helper to get sheet properties (including sheetId) from sheetName (first sheet if None).
+
+        Cached gridProperties may be stale, see _get_spreadsheet_sheets.
+
+        Returns:
+            dict: Properties of the sheet, or None if the spreadsheet has no sheet named sheet_name.
+
+        Raises:
+            HttpError: If the spreadsheet can't be read (e.g. not found, no permission or quota exceeded).
+        """
+        for props in self._get_spreadsheet_sheets(spreadsheet_id, refresh):
+            if sheet_name == None or props.get('title') == sheet_name:
+                return props
+        return None
+
+    def _get_sheet_values(self, spreadsheet_id: str, sheet_props: dict, block_size: int = 10000, max_workers: int = 1, **render_options) -> list:
+        """Reads all the values of a sheet in blocks of rows.
+
+        Sheets of up to block_size rows (as cached) are read whole with a single request. Bigger ones
+        are read in blocks of whole rows covering the grid, whose size is read again first (the cached
+        one may be stale). Blocks are fetched in order, or concurrently with max_workers > 1. Empty
+        rows between blocks are kept, trailing empty rows are dropped.
+        """
+        title = sheet_props['title'].replace("'", "''")
+
+        if sheet_props.get('gridProperties', {}).get('rowCount', 1) <= block_size:
+            return executor.execute(self.sheets_service.spreadsheets().values().get(
+                spreadsheetId=spreadsheet_id, range=f"'{title}'", **render_options
+            )).get('values', [])
+
+        fresh_props = self._get_sheet_properties(spreadsheet_id, sheet_props['title'], refresh=True) or sheet_props
+        blocks = sheets.row_blocks(fresh_props.get('gridProperties', {}).get('rowCount', 1), block_size)
+
+        def get_block(block):
+            start, end = block
+            response = executor.execute(self.sheets_service.spreadsheets().values().get(
+                spreadsheetId=spreadsheet_id, range=f"'{title}'!{start}:{end}", **render_options
+            ))
+            return end - start + 1, response.get('values', [])
+
+        if max_workers > 1 and len(blocks) > 1:
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                return sheets.join_blocks(pool.map(get_block, blocks))
+
+        return sheets.join_blocks(map(get_block, blocks))
+
+    def _resize_sheet(self, spreadsheet_id: str, sheet_id: int, rows: int, cols: int, clear_values: bool = False):
+        """Resizes the given sheet to specified rows and columns.
+
+        If clear_values is True, cell values are cleared (formats are preserved) in the same request.
+        """
         effective_rows = max(1, rows)
         effective_cols = max(1, cols)
-        print(f"Resizing sheet ID {sheet_id} to {effective_rows} rows and {effective_cols} columns.")
+        metrics.log(f"Resizing sheet ID {sheet_id} to {effective_rows} rows and {effective_cols} columns.")
         requests = [
             {
                 "updateSheetProperties": {
@@ -74,25 +474,30 @@ class Drive:
                 }
             }
         ]
+        if clear_values:
+            requests.append({"updateCells": {"range": {"sheetId": sheet_id}, "fields": "userEnteredValue"}})
         try:
-            self.sheets_service.spreadsheets().batchUpdate(
+            executor.execute(self.sheets_service.spreadsheets().batchUpdate(
                 spreadsheetId=spreadsheet_id,
                 body={"requests": requests}
-            ).execute()
-            print(f"Sheet ID {sheet_id} resized successfully.")
+            ))
+            metrics.log(f"Sheet ID {sheet_id} resized successfully.")
         except Exception as e:
-            print(f"Error resizing sheet ID {sheet_id}: {e}")
+            metrics.log(f"Error resizing sheet ID {sheet_id}: {e}", 'error')
+            self.invalidate_metadata(spreadsheet_id)
             raise e
+        self._update_cached_grid(spreadsheet_id, sheet_id, effective_rows, effective_cols)
 
 
     @overload
-    def upload(self,file_path:list,folder_id:Union[str, List[str]],file_title:str=None,file_id:Union[str, List[str]]=None,update:bool=True,convert:bool=False,url:bool=True):
+    def upload(self,file_path:list,folder_id:Union[str, List[str]],file_title:str=None,file_id:Union[str, List[str]]=None,update:bool=True,convert:bool=False,url:bool=True,max_workers:int=1,skip_unchanged:bool=False,manifest_path:str=None,chunk_size:int=resumable.DEFAULT_CHUNK_SIZE,resume_path:str=None):
         ...
     @overload
-    def upload(self,file_path:str,folder_id:Union[str, List[str]],file_title:str=None,file_id:Union[str, List[str]]=None,update:bool=True,convert:bool=False,url:bool=True):
+    def upload(self,file_path:str,folder_id:Union[str, List[str]],file_title:str=None,file_id:Union[str, List[str]]=None,update:bool=True,convert:bool=False,url:bool=True,max_workers:int=1,skip_unchanged:bool=False,manifest_path:str=None,chunk_size:int=resumable.DEFAULT_CHUNK_SIZE,resume_path:str=None):
         ...
     
-    def upload(self,file_path: Union[str, List[str]],folder_id:Union[str, List[str]],file_title:str=None,file_id: Union[str, List[str]]=None,update:bool=True,convert:bool=False,url:bool=True):
+    @bulk_upload
+    def upload(self,file_path: Union[str, List[str]],folder_id:Union[str, List[str]],file_title:str=None,file_id: Union[str, List[str]]=None,update:bool=True,convert:bool=False,url:bool=True,max_workers:int=1,skip_unchanged:bool=False,manifest_path:str=None,chunk_size:int=resumable.DEFAULT_CHUNK_SIZE,resume_path:str=None):
         """Upload a file or a list of files to a specified drive folder(s) by ID.
 
         Iterates through the folder's files searching for one with the same name as the local 
@@ -108,21 +513,47 @@ class Drive:
             update: If set to True, the method will be overwrite (update) the content of an existing file with the same name in drive. Otherwise, it will create another with the same name.
             convert: If set to True, the method will convert all files (if conversion is available) to it's corresponding google mimeType in Drive.
             url: If set to True, the method will accept URL type input as folder_id and automatically convert it to ID type.
-            
+            max_workers: Number of files uploaded at the same time when file_path is a list. Each worker uses its own drive client. If set to 1, files are uploaded one after another.
+            skip_unchanged: If set to True, existing drive files with the same size and MD5 checksum as the local file aren't uploaded again. Google native files (converted ones) have no checksum and are always uploaded.
+            manifest_path: Path of a local JSON manifest (created if it doesn't exist) where uploaded files are recorded with their modification time, size, checksum and drive ID. With skip_unchanged, files that didn't change locally since they were recorded aren't hashed again.
+            chunk_size: Bytes sent per request of the resumable upload (must be a multiple of 256 KB). Smaller chunks lose less work on failures, bigger ones need fewer requests.
+            resume_path: Path of a local JSON file where unfinished upload sessions are saved after every chunk. Running the same upload again (same local file, unmodified) continues from the last byte received by drive. If set to None, sessions aren't saved.
+
+        Returns:
+            errors: Only for lists uploaded with max_workers > 1, dictionary mapping every failed local path to its exception.
         """
+        from tqdm import tqdm
+
+        if isinstance(file_path, list) and max_workers > 1: # if multipath in parallel
 
-        if isinstance(file_path, list): # if multipath
+            if isinstance(folder_id, list):
+                jobs = [(file,folder,None) for file,folder in zip(file_path,folder_id)]
+            elif file_id == None:
+                jobs = [(file,folder_id,None) for file in file_path]
+            else:
+                jobs = [(file,folder_id,id) for file,id in zip(file_path,file_id)]
+
+            if url == True:
+                jobs = [(file,utils.url_to_id(folder),id) for file,folder,id in jobs]
+
+            pbar = tqdm(total=len(jobs),desc='Total upload progress: ')
+            errors = self._parallel_upload(jobs,max_workers,pbar=pbar,file_title=file_title,update=update,convert=convert,skip_unchanged=skip_unchanged,manifest_path=manifest_path,chunk_size=chunk_size,resume_path=resume_path)
+            pbar.close()
+
+            return self._collect_parent_errors(errors)
+
+        elif isinstance(file_path, list): # if multipath
 
             if isinstance(folder_id, list): # needs a warning saying that will ignore file ids 
                 for file,folder in zip(file_path,folder_id): # needs a warning controlling if sizes of both lists are the same
-                    self.upload(file,folder_id=folder,file_title=file_title,file_id=file_id,update=update,convert=convert,url=url)
+                    self.upload(file,folder_id=folder,file_title=file_title,file_id=file_id,update=update,convert=convert,url=url,skip_unchanged=skip_unchanged,manifest_path=manifest_path,chunk_size=chunk_size,resume_path=resume_path)
             else:
                 if file_id == None: 
                     for file in file_path:
-                        self.upload(file,folder_id=folder_id,file_title=file_title,file_id=file_id,update=update,convert=convert,url=url)
+                        self.upload(file,folder_id=folder_id,file_title=file_title,file_id=file_id,update=update,convert=convert,url=url,skip_unchanged=skip_unchanged,manifest_path=manifest_path,chunk_size=chunk_size,resume_path=resume_path)
                 else: # needs a warning controlling if sizes of both lists are the same
                     for file,id in zip(file_path,file_id):
-                        self.upload(file,folder_id=folder_id,file_title=file_title,file_id=id,update=update,convert=convert,url=url)
+                        self.upload(file,folder_id=folder_id,file_title=file_title,file_id=id,update=update,convert=convert,url=url,skip_unchanged=skip_unchanged,manifest_path=manifest_path,chunk_size=chunk_size,resume_path=resume_path)
 
         else: # if single file path
 
@@ -141,9 +572,7 @@ class Drive:
             if file_title == None:
                 file_title = utils.get_filename(file_path)
 
-            pbar = tqdm(total=100, unit='B')
-
-            pbar.update(10)
+            pbar = tqdm(total=os.path.getsize(file_path), unit='B', unit_scale=True, disable=getattr(self._local, 'worker', False))
 
             drive_service = self.drive_service
 
@@ -160,44 +589,66 @@ class Drive:
             else:
                 file_metadata['name'] += f'.{file_extension}' if file_extension != "" else file_metadata['name']
 
-            duplicate_check, file_metadata = service.find_duplicate(file_metadata,drive_service)
+            # Body of files.create, before find_duplicate merges the existing file's metadata
+            create_metadata = {key: file_metadata[key] for key in service.CREATE_FIELDS if key in file_metadata}
+
+            folder_index = self._get_folder_index(folder_id)
+            duplicate_check, file_metadata = service.find_duplicate(file_metadata,drive_service,folder_index)
 
-            pbar.update(40)
+            upload_manifest = self._get_manifest(manifest_path)
 
             if duplicate_check and update == True:
                 file_id = file_metadata['id']
-                gfile = self.update(file_path,file_id)
+                if skip_unchanged == True and manifest.is_unchanged(file_path,file_metadata,upload_manifest):
+                    if upload_manifest != None:
+                        upload_manifest.record(file_path,file_id)
+                    pbar.close()
+                    return
+                gfile = self.update(file_path,file_id,chunk_size=chunk_size,resume_path=resume_path,pbar=pbar)
             else:
                 if update == False:
-                    del file_metadata['id'] 
-                media = MediaFileUpload(file_path, resumable=True)
-                gfile = drive_service.files().create(body=file_metadata, media_body=media, fields='id',supportsAllDrives=True).execute()
+                    create_metadata.pop('id',None)
+                media = MediaFileUpload(file_path, chunksize=chunk_size, resumable=True)
+                request = drive_service.files().create(body=create_metadata, media_body=media, fields='id',supportsAllDrives=True)
+                key = resumable.session_key(file_path,f"create:{folder_id}/{create_metadata['name']}")
+                gfile = resumable.upload_chunks(request,pbar,self._get_session_store(resume_path),key)
+
+                if folder_index != None:
+                    folder_index.add({**create_metadata,'id': gfile['id']})
 
                 if self.mode == 'service':
                     old_parents = gfile.get('parents')
                     file_id = gfile.get('id')
 
-                    drive_service.files().update(fileId=file_id,removeParents=old_parents,addParents=folder_id,supportsAllDrives=True).execute()
+                    self._fix_parents(file_id,old_parents,folder_id,file_path)
+
+            if upload_manifest != None:
+                upload_manifest.record(file_path,gfile['id'])
 
-            pbar.update(50)
+            pbar.close()
 
                 
-    def update(self,file_path: str,file_id: str):
+    def update(self,file_path: str,file_id: str,chunk_size: int=resumable.DEFAULT_CHUNK_SIZE,resume_path: str=None,pbar=None):
         """Update content of a drive file with a local file.
 
         Updates content of a drive file specified by its id with local information on the specified file path.
+        Content is sent in chunks through a resumable upload session.
 
         Args:
             file_path: Path of the local file wich content will be overwriting (updating) the drive file content.
             file_id: ID of the drive file that will be updated.      
+            chunk_size: Bytes sent per request (must be a multiple of 256 KB).
+            resume_path: Path of a local JSON file where the upload session is saved after every chunk, so an interrupted update can be continued by running it again. If set to None, the session isn't saved.
+            pbar: tqdm progress bar (with the file size as total) updated with the uploaded bytes.
             
         """
         
         drive_service = self.drive_service
-        media = MediaFileUpload(file_path, resumable=True)
+        media = MediaFileUpload(file_path, chunksize=chunk_size, resumable=True)
         void_metadata = {}
 
-        gfile = drive_service.files().update(fileId=file_id, body=void_metadata, media_body=media,supportsAllDrives=True).execute()
+        request = drive_service.files().update(fileId=file_id, body=void_metadata, media_body=media,supportsAllDrives=True)
+        gfile = resumable.upload_chunks(request,pbar,self._get_session_store(resume_path),resumable.session_key(file_path,f'update:{file_id}'))
 
         return gfile
     
@@ -207,7 +658,9 @@ class Drive:
                   sheet_name: str = None,
                   unformat: bool = False,
                   chunk_size: int = 2000,
-                  reset_sheet_structure: bool = True):
+                  reset_sheet_structure: bool = True,
+                  max_payload_bytes: int = sheets.MAX_PAYLOAD_BYTES,
+                  diff: bool = False):
         """Update content of a drive sheet with a pandas dataframe.
 
         Args:
@@ -215,12 +668,18 @@ class Drive:
             spreadsheet_id: ID of the Google Spreadsheet.
             sheet_name: Name of the sheet. Defaults to the first sheet.
             unformat: If True, fill NaN with 'NULL' and convert all to string.
-            chunk_size: Rows per chunk for large DataFrames.
+            chunk_size: Rows per chunk for large DataFrames. Chunks are written with values.batchUpdate
+                        requests holding as many chunks as fit in max_payload_bytes.
             reset_sheet_structure: If True, the sheet's structure (dimensions and formats)
                                    will be completely reset to fit the new DataFrame, some
                                    calculated columns or aditional formats could be lost.
                                    If False (default), existing formats and dimensions are
                                    preserved, and the sheet is only expanded if necessary.
+            max_payload_bytes: Maximum size of each write request body when the DataFrame is chunked.
+            diff: If True, current values of the sheet are read and only the cells that changed are
+                  written (grouped in rectangular ranges), instead of clearing and rewriting the whole
+                  sheet. Rows or columns no longer in the DataFrame are removed with a resize if
+                  reset_sheet_structure is True, or emptied otherwise.
         """
         sheets_service = self.sheets_service
 
@@ -228,128 +687,122 @@ class Drive:
         if isinstance(df, list):
             # Get all sheet names once for list processing
             try:
-                file_metadata_for_list = sheets_service.spreadsheets().get(
-                    spreadsheetId=spreadsheet_id, fields="sheets(properties(title))"
-                ).execute()
-                available_sheets = file_metadata_for_list.get('sheets', [])
+                available_sheets = self._get_spreadsheet_sheets(spreadsheet_id)
             except Exception as e:
-                print(f"Error fetching sheet list for multi-DF update: {e}")
+                metrics.log(f"Error fetching sheet list for multi-DF update: {e}", 'error')
                 return
 
             if len(df) > len(available_sheets):
-                print(f"Warning: {len(df)} DFs provided, but only {len(available_sheets)} sheets exist. Extra DFs ignored.")
+                metrics.log(f"Warning: {len(df)} DFs provided, but only {len(available_sheets)} sheets exist. Extra DFs ignored.", 'warning')
 
             for i, single_df in enumerate(df):
                 if i < len(available_sheets):
-                    current_sheet_title = available_sheets[i].get("properties", {}).get("title")
+                    current_sheet_title = available_sheets[i].get("title")
                     if not current_sheet_title:
-                        print(f"Warning: Could not get title for sheet at index {i}. Skipping.")
+                        metrics.log(f"Warning: Could not get title for sheet at index {i}. Skipping.", 'warning')
                         continue
-                    print(f"Recursively updating sheet: '{current_sheet_title}' with DataFrame at index {i}")
+                    metrics.log(f"Recursively updating sheet: '{current_sheet_title}' with DataFrame at index {i}")
                     self.df_update(single_df, spreadsheet_id, current_sheet_title,
                                    unformat=unformat, chunk_size=chunk_size,
-                                   reset_sheet_structure=reset_sheet_structure) # Pass flag
+                                   reset_sheet_structure=reset_sheet_structure, # Pass flag
+                                   max_payload_bytes=max_payload_bytes, diff=diff)
                 else:
                     break
             return
 
         # --- Single DataFrame processing ---
-        df_to_process = df.copy()
-        if unformat:
-            df_to_process = df_to_process.fillna('NULL')
-            df_to_process = df_to_process.astype(str)
-            if not df_to_process.columns.empty:
-                 df_to_process.columns = df_to_process.columns.astype(str)
-
         # Determine target sheet name and get its properties (including sheetId and current dimensions)
         if not sheet_name: # If no sheet_name, try to get the first one
             try:
-                first_sheet_meta = sheets_service.spreadsheets().get(
-                    spreadsheetId=spreadsheet_id, fields="sheets(properties(title))" # Only need title for first sheet
-                ).execute().get('sheets', [])
+                first_sheet_meta = self._get_spreadsheet_sheets(spreadsheet_id)
                 if first_sheet_meta:
-                    sheet_name = first_sheet_meta[0].get("properties", {}).get("title")
+                    sheet_name = first_sheet_meta[0].get("title")
                 else:
-                    print(f"Error: Spreadsheet {spreadsheet_id} has no sheets. Cannot determine default sheet.")
+                    metrics.log(f"Error: Spreadsheet {spreadsheet_id} has no sheets. Cannot determine default sheet.", 'error')
                     return
             except Exception as e:
-                print(f"Error getting default sheet name: {e}")
+                metrics.log(f"Error getting default sheet name: {e}", 'error')
                 return
         
-        target_sheet_props = self._get_sheet_properties(spreadsheet_id, sheet_name)
+        # Resizes that keep the current size (diff, or reset_sheet_structure=False) need the real grid
+        target_sheet_props = self._get_sheet_properties(spreadsheet_id, sheet_name, refresh=diff or not reset_sheet_structure)
         if not target_sheet_props:
-            print(f"Error: Sheet named '{sheet_name}' not found or properties inaccessible in {spreadsheet_id}.")
+            metrics.log(f"Error: Sheet named '{sheet_name}' not found in {spreadsheet_id}.", 'error')
             return
         
         sheet_id_num = target_sheet_props['sheetId']
         current_sheet_rows = target_sheet_props.get('gridProperties', {}).get('rowCount', 1)
         current_sheet_cols = target_sheet_props.get('gridProperties', {}).get('columnCount', 1)
 
-        print(f"Processing sheet: '{sheet_name}' (ID: {sheet_id_num}) in spreadsheet: {spreadsheet_id}")
+        metrics.log(f"Processing sheet: '{sheet_name}' (ID: {sheet_id_num}) in spreadsheet: {spreadsheet_id}")
 
-        # Prepare DataFrame data
-        headers_list = df_to_process.columns.tolist() if not df_to_process.columns.empty else []
-        data_values = df_to_process.values.tolist()
+        # Prepare DataFrame data (values are serialized lazily, chunk by chunk, when they are uploaded)
+        headers_list = sheets.serialize_headers(df, unformat) if not df.columns.empty else []
         has_headers = bool(headers_list)
         
-        df_num_data_rows = len(data_values)
-        df_num_cols = len(headers_list) if has_headers else (len(data_values[0]) if df_num_data_rows > 0 and data_values[0] else 0)
+        df_num_data_rows = len(df)
+        df_num_cols = df.shape[1]
         df_total_rows = (1 if has_headers else 0) + df_num_data_rows
 
         # Effective dimensions the DataFrame requires (at least 1x1 for sheet operations)
         df_effective_rows = max(1, df_total_rows)
         df_effective_cols = max(1, df_num_cols)
 
-        # 1. Handle Sheet Structure (Resizing)
+        if diff:
+            self._df_update_diff(df, spreadsheet_id, target_sheet_props, headers_list,
+                                 unformat=unformat, reset_sheet_structure=reset_sheet_structure,
+                                 max_payload_bytes=max_payload_bytes)
+            return
+
+        # 1. Handle Sheet Structure (Resizing). Values are cleared in the same request when the sheet is resized.
+        values_cleared = False
         if reset_sheet_structure:
-            print(f"  Mode: Resetting sheet structure for '{sheet_name}'.")
+            metrics.log(f"  Mode: Resetting sheet structure for '{sheet_name}'.")
             try:
                 # print(f"    Initial resize to 1x1 to clear old structure...")
                 # self._resize_sheet(spreadsheet_id, sheet_id_num, rows=1, cols=1)
-                print(f"    Resizing sheet to fit new DataFrame: {df_effective_rows}x{df_effective_cols}.")
-                self._resize_sheet(spreadsheet_id, sheet_id_num, df_effective_rows, df_effective_cols)
+                metrics.log(f"    Resizing sheet to fit new DataFrame: {df_effective_rows}x{df_effective_cols}.")
+                self._resize_sheet(spreadsheet_id, sheet_id_num, df_effective_rows, df_effective_cols, clear_values=True)
+                values_cleared = True
             except Exception as e:
-                print(f"Halting due to error during sheet structure reset of '{sheet_name}': {e}")
+                metrics.log(f"Halting due to error during sheet structure reset of '{sheet_name}': {e}", 'error')
                 return
         else: # Default: Preserve structure, expand if necessary
-            print(f"  Mode: Preserving existing sheet structure for '{sheet_name}'.")
+            metrics.log(f"  Mode: Preserving existing sheet structure for '{sheet_name}'.")
             target_rows_for_sheet = max(current_sheet_rows, df_effective_rows)
             target_cols_for_sheet = max(current_sheet_cols, df_effective_cols)
 
             if target_rows_for_sheet > current_sheet_rows or target_cols_for_sheet > current_sheet_cols:
-                print(f"    Expanding sheet from {current_sheet_rows}x{current_sheet_cols} to {target_rows_for_sheet}x{target_cols_for_sheet}.")
+                metrics.log(f"    Expanding sheet from {current_sheet_rows}x{current_sheet_cols} to {target_rows_for_sheet}x{target_cols_for_sheet}.")
                 try:
-                    self._resize_sheet(spreadsheet_id, sheet_id_num, target_rows_for_sheet, target_cols_for_sheet)
+                    self._resize_sheet(spreadsheet_id, sheet_id_num, target_rows_for_sheet, target_cols_for_sheet, clear_values=True)
+                    values_cleared = True
                 except Exception as e:
-                    print(f"Halting due to error during sheet expansion of '{sheet_name}': {e}")
+                    metrics.log(f"Halting due to error during sheet expansion of '{sheet_name}': {e}", 'error')
                     return
             else:
-                print(f"    Sheet is already large enough. No expansion needed.")
+                metrics.log(f"    Sheet is already large enough. No expansion needed.")
 
-        # 2. Clear values from the sheet
+        # 2. Clear values from the sheet (unless already done while resizing)
         # Original method cleared the whole sheet. This is simple and preserves formats on cells.
-        print(f"  Clearing values from entire sheet '{sheet_name}' (preserves cell formats)...")
-        try:
-            sheets_service.spreadsheets().values().clear(
-                spreadsheetId=spreadsheet_id, range=f"'{sheet_name}'", body={}
-            ).execute()
-            print(f"  Values cleared from '{sheet_name}'.")
-        except Exception as e:
-            print(f"Error clearing values from sheet '{sheet_name}': {e}")
-            return
+        if not values_cleared:
+            metrics.log(f"  Clearing values from entire sheet '{sheet_name}' (preserves cell formats)...")
+            try:
+                executor.execute(sheets_service.spreadsheets().values().clear(
+                    spreadsheetId=spreadsheet_id, range=f"'{sheet_name}'", body={}
+                ))
+                metrics.log(f"  Values cleared from '{sheet_name}'.")
+            except Exception as e:
+                metrics.log(f"Error clearing values from sheet '{sheet_name}': {e}", 'error')
+                return
         
         # If DataFrame is empty, we're done after clearing and potential resize.
         if df_total_rows == 0:
-            print(f"DataFrame is empty. Sheet '{sheet_name}' has been prepared and values cleared.")
-            print(f"Sheet '{sheet_name}' update complete (empty).")
+            metrics.log(f"DataFrame is empty. Sheet '{sheet_name}' has been prepared and values cleared.")
+            metrics.log(f"Sheet '{sheet_name}' update complete (empty).")
             return
 
         # 3. Upload data (headers and values)
-        all_values_to_upload = []
-        if has_headers:
-            all_values_to_upload.append(headers_list)
-        all_values_to_upload.extend(data_values)
-
         # Use 'USER_ENTERED' to allow existing cell formats to apply to new data
         value_input_option = 'USER_ENTERED'
         
@@ -359,65 +812,386 @@ class Drive:
 
         if df_total_rows <= chunk_size: # Small enough for a single update call
             upload_range = f"'{sheet_name}'!A1:{end_col_letter_df}{df_total_rows}"
-            print(f"  Uploading {df_total_rows} rows in a single operation to {upload_range}...")
+            all_values_to_upload = [headers_list] if has_headers else []
+            for rows in sheets.iter_rows(df, chunk_size, unformat):
+                all_values_to_upload.extend(rows)
+            metrics.log(f"  Uploading {df_total_rows} rows in a single operation to {upload_range}...")
             try:
-                sheets_service.spreadsheets().values().update(
+                executor.execute(sheets_service.spreadsheets().values().update(
                     spreadsheetId=spreadsheet_id,
                     range=upload_range, # Write to A1 extending to DF's actual size
                     valueInputOption=value_input_option,
                     body={'values': all_values_to_upload}
-                ).execute()
-                print("  Data written successfully.")
+                ))
+                metrics.log("  Data written successfully.")
             except Exception as e:
-                print(f"Error writing data in single operation to {upload_range}: {e}")
+                metrics.log(f"Error writing data in single operation to {upload_range}: {e}", 'error')
                 return
         else: # Chunking required
-            print(f"  Uploading {df_total_rows} rows in chunks of {chunk_size}...")
-            current_gdrive_row = 1 # 1-indexed for Sheets A1 notation
+            metrics.log(f"  Uploading {df_total_rows} rows in chunks of {chunk_size}...")
 
-            # Write headers first
-            if has_headers:
-                header_range = f"'{sheet_name}'!A{current_gdrive_row}:{end_col_letter_df}{current_gdrive_row}"
-                print(f"    Writing headers to {header_range}...")
-                try:
-                    sheets_service.spreadsheets().values().update(
-                        spreadsheetId=spreadsheet_id,
-                        range=header_range,
-                        valueInputOption=value_input_option,
-                        body={'values': [headers_list]}
-                    ).execute()
+            def chunk_ranges():
+                current_gdrive_row = 1 # 1-indexed for Sheets A1 notation
+                if has_headers:
+                    yield f"'{sheet_name}'!A1:{end_col_letter_df}1", [headers_list]
                     current_gdrive_row += 1
-                except Exception as e:
-                    print(f"Error writing headers to {header_range}: {e}")
-                    return
-            
-            # Write data values in chunks
-            print(f"    Writing {df_num_data_rows} data rows in chunks...")
-            for i in range(0, df_num_data_rows, chunk_size):
-                chunk = data_values[i:i + chunk_size]
-                if not chunk: continue
-
-                start_row_for_chunk_in_sheet = current_gdrive_row
-                end_row_for_chunk_in_sheet = current_gdrive_row + len(chunk) - 1
-                chunk_range = f"'{sheet_name}'!A{start_row_for_chunk_in_sheet}:{end_col_letter_df}{end_row_for_chunk_in_sheet}"
-                
-                print(f"      Writing chunk to {chunk_range} (DF data rows {i+1} to {min(i+chunk_size, df_num_data_rows)})")
-                try:
-                    sheets_service.spreadsheets().values().update(
-                        spreadsheetId=spreadsheet_id,
-                        range=chunk_range,
-                        valueInputOption=value_input_option,
-                        body={'values': chunk}
-                    ).execute()
+                for chunk in sheets.iter_rows(df, chunk_size, unformat):
+                    yield f"'{sheet_name}'!A{current_gdrive_row}:{end_col_letter_df}{current_gdrive_row + len(chunk) - 1}", chunk
                     current_gdrive_row += len(chunk)
+
+            # Chunks for the next payload are serialized and its request (and JSON body) built in
+            # the background while the current one is being sent
+            write_requests = (
+                (data, sheets_service.spreadsheets().values().batchUpdate(
+                    spreadsheetId=spreadsheet_id,
+                    body={'valueInputOption': value_input_option, 'data': data}
+                ))
+                for data in sheets.pack_ranges(chunk_ranges(), max_payload_bytes)
+            )
+
+            for data, write_request in sheets.pipelined(write_requests):
+                metrics.log(f"    Writing {len(data)} chunk(s) from {data[0]['range']} to {data[-1]['range']}...")
+                try:
+                    executor.execute(write_request)
                 except Exception as e:
-                    print(f"Error writing data chunk to {chunk_range}: {e}")
+                    metrics.log(f"Error writing data chunks {data[0]['range']} to {data[-1]['range']}: {e}", 'error')
                     return
-            print("  All data chunks written successfully.")
+            metrics.log("  All data chunks written successfully.")
+
+        metrics.log(f"Sheet '{sheet_name}' update complete.")
+
+    def _df_update_diff(self, df: pd.DataFrame, spreadsheet_id: str, sheet_props: dict, headers_list: list,
+                        unformat: bool = False, reset_sheet_structure: bool = True,
+                        max_payload_bytes: int = sheets.MAX_PAYLOAD_BYTES):
+        """Differential mode of df_update: writes only the cells whose value changed."""
+        sheets_service = self.sheets_service
+        sheet_name = sheet_props['title']
+        sheet_id_num = sheet_props['sheetId']
+        current_sheet_rows = sheet_props.get('gridProperties', {}).get('rowCount', 1)
+        current_sheet_cols = sheet_props.get('gridProperties', {}).get('columnCount', 1)
+
+        metrics.log(f"  Mode: Differential update of '{sheet_name}'.")
+        try:
+            current_values = executor.execute(sheets_service.spreadsheets().values().get(
+                spreadsheetId=spreadsheet_id, range=f"'{sheet_name}'",
+                valueRenderOption='UNFORMATTED_VALUE', dateTimeRenderOption='SERIAL_NUMBER'
+            )).get('values', [])
+        except Exception as e:
+            metrics.log(f"Error reading current values of '{sheet_name}': {e}", 'error')
+            return
+
+        new_values = [headers_list] if headers_list else []
+        for rows in sheets.iter_rows(df, max(1, len(df)), unformat):
+            new_values.extend(rows)
+        df_total_rows = len(new_values)
+        df_num_cols = df.shape[1]
+
+        # Dates are written as text but read as serial numbers
+        compare_frame = sheets.with_serial_dates(df)
+        if compare_frame is df:
+            compare_values = new_values
+        else:
+            compare_values = [headers_list] if headers_list else []
+            for rows in sheets.iter_rows(compare_frame, max(1, len(df)), unformat):
+                compare_values.extend(rows)
+
+        mask = sheets.changed_cells(current_values, compare_values)
+
+        # 1. Rows and columns added or removed
+        if reset_sheet_structure:
+            # Cells outside the DataFrame are removed by the resize, no need to write them
+            mask = mask[:df_total_rows, :df_num_cols]
+            target_rows, target_cols = max(1, df_total_rows), max(1, df_num_cols)
+        else:
+            target_rows, target_cols = max(current_sheet_rows, df_total_rows), max(current_sheet_cols, df_num_cols)
+
+        if (target_rows, target_cols) != (current_sheet_rows, current_sheet_cols):
+            metrics.log(f"    Resizing sheet from {current_sheet_rows}x{current_sheet_cols} to {target_rows}x{target_cols}.")
+            try:
+                self._resize_sheet(spreadsheet_id, sheet_id_num, target_rows, target_cols)
+            except Exception as e:
+                metrics.log(f"Halting due to error during resize of '{sheet_name}': {e}", 'error')
+                return
+
+        # 2. Changed cells
+        rectangles = sheets.changed_rectangles(mask)
+        if not rectangles:
+            metrics.log(f"  No changes found in '{sheet_name}'.")
+            metrics.log(f"Sheet '{sheet_name}' update complete.")
+            return
+
+        def changed_ranges():
+            for top, left, bottom, right in rectangles:
+                a1_range = f"'{sheet_name}'!{col_idx_to_a1(left)}{top + 1}:{col_idx_to_a1(right - 1)}{bottom}"
+                values = [
+                    [row[col] if col < len(row) else '' for col in range(left, right)]
+                    for row in (new_values[i] if i < df_total_rows else [] for i in range(top, bottom))
+                ]
+                yield a1_range, values
+
+        metrics.log(f"  Writing {int(mask.sum())} changed cell(s) in {len(rectangles)} range(s)...")
+        for data in sheets.pack_ranges(changed_ranges(), max_payload_bytes):
+            try:
+                executor.execute(sheets_service.spreadsheets().values().batchUpdate(
+                    spreadsheetId=spreadsheet_id,
+                    body={'valueInputOption': 'USER_ENTERED', 'data': data}
+                ))
+            except Exception as e:
+                metrics.log(f"Error writing changed ranges {data[0]['range']} to {data[-1]['range']}: {e}", 'error')
+                return
+
+        metrics.log(f"Sheet '{sheet_name}' update complete.")
+
+    def df_upsert(self,
+                  df: pd.DataFrame,
+                  spreadsheet_id: str,
+                  sheet_name: str,
+                  key: str,
+                  unformat: bool = False,
+                  max_payload_bytes: int = sheets.MAX_PAYLOAD_BYTES):
+        """Update or insert the rows of a pandas dataframe in a keyed drive sheet.
 
-        print(f"Sheet '{sheet_name}' update complete.")
+        Rows of the sheet are matched with rows of the DataFrame by the key column, which is the
+        only column read. Matching rows are updated in place (only in the columns of the DataFrame,
+        other columns of the sheet are kept) with values.batchUpdate, and new keys are added with
+        values.append, which writes them after the last row of the table (even if its key is blank).
+        Requests are up to max_payload_bytes.
 
-    def upload_folder(self,local_folder_path :str,folder_id :str,update : bool =True,subfolder : bool=False,subfolder_name:str=None,recursive: bool=True,convert: bool=False,url: bool=True,total_files_to_upload_count=None,pbar=None):
+        Args:
+            df: DataFrame whose columns are (a subset of) the columns of the sheet.
+            spreadsheet_id: ID of the Google Spreadsheet.
+            sheet_name: Name of the sheet. Its first row must be the header (if the sheet is empty, the DataFrame's header is written).
+            key: Column that identifies the rows. If a key is repeated in df, its last row is used. Keys are compared as in sheets.normalize_keys.
+            unformat: If True, fill NaN with 'NULL' and convert all to string.
+            max_payload_bytes: Maximum size of each write request body.
+
+        Raises:
+            ValueError: If key isn't a column of df or of the header of the sheet, or a column of df isn't in the header of the sheet.
+        """
+        import pandas as pd
+
+        sheets_service = self.sheets_service
+
+        if key not in df.columns:
+            raise ValueError(f"Key column '{key}' not found in the DataFrame.")
+
+        sheet_props = self._get_sheet_properties(spreadsheet_id, sheet_name, refresh=True)
+        if not sheet_props:
+            metrics.log(f"Error: Sheet named '{sheet_name}' not found in {spreadsheet_id}.", 'error')
+            return
+        current_sheet_rows = sheet_props.get('gridProperties', {}).get('rowCount', 1)
+        current_sheet_cols = sheet_props.get('gridProperties', {}).get('columnCount', 1)
+
+        metrics.log(f"Upserting {len(df)} rows by '{key}' in sheet: '{sheet_name}' of spreadsheet: {spreadsheet_id}")
+
+        # 1. Header and key column
+        header = executor.execute(sheets_service.spreadsheets().values().get(
+            spreadsheetId=spreadsheet_id, range=f"'{sheet_name}'!1:1"
+        )).get('values', [])
+        header = header[0] if header else []
+        write_header = not header
+        if write_header:
+            header = sheets.serialize_headers(df, unformat)
+
+        header_positions = {}
+        for position, column in enumerate(header):
+            header_positions.setdefault(str(column), position)
+
+        if str(key) not in header_positions:
+            raise ValueError(f"Key column '{key}' not found in the header of sheet '{sheet_name}'.")
+        missing_columns = [column for column in df.columns if str(column) not in header_positions]
+        if missing_columns:
+            raise ValueError(f"Columns not found in the header of sheet '{sheet_name}': {missing_columns}")
+
+        key_values = []
+        if not write_header:
+            key_column = col_idx_to_a1(header_positions[str(key)])
+            key_column_values = executor.execute(sheets_service.spreadsheets().values().get(
+                spreadsheetId=spreadsheet_id, range=f"'{sheet_name}'!{key_column}:{key_column}",
+                majorDimension='COLUMNS', valueRenderOption='UNFORMATTED_VALUE'
+            )).get('values', [])
+            key_values = key_column_values[0][1:] if key_column_values else []
+
+        # 2. Match rows by key
+        existing_rows = pd.Series(range(2, 2 + len(key_values)), index=sheets.normalize_keys(key_values))
+        existing_rows = existing_rows[(existing_rows.index != '') & ~existing_rows.index.duplicated()]
+
+        df = df.drop_duplicates(subset=[key], keep='last')
+        matched_rows = sheets.normalize_keys(df[key]).map(existing_rows)
+        matched = matched_rows.notna().to_numpy()
+
+        # Columns are written in the order of the header, in blocks of adjacent columns
+        columns = sorted(df.columns, key=lambda column: header_positions[str(column)])
+        column_blocks = sheets.contiguous_blocks([header_positions[str(column)] for column in columns])
+
+        updates = df.loc[matched, columns]
+        update_rows = matched_rows[matched].astype(int).tolist()
+        order = sorted(range(len(update_rows)), key=update_rows.__getitem__)
+        updates, update_rows = updates.iloc[order], [update_rows[i] for i in order]
+
+        appends = df.loc[~matched, columns]
+
+        # 3. Grow the grid for a new header (values.append adds the rows of the appended keys by itself)
+        target_cols = max(current_sheet_cols, len(header))
+        if target_cols > current_sheet_cols:
+            metrics.log(f"    Expanding sheet from {current_sheet_rows}x{current_sheet_cols} to {current_sheet_rows}x{target_cols}.")
+            self._resize_sheet(spreadsheet_id, sheet_props['sheetId'], current_sheet_rows, target_cols)
+
+        # 4. Write the header and the updated rows
+        def update_ranges():
+            if write_header:
+                yield f"'{sheet_name}'!A1:{col_idx_to_a1(len(header) - 1)}1", [header]
+            if updates.empty:
+                return
+            values = [row for chunk in sheets.iter_rows(updates, len(updates), unformat) for row in chunk]
+            offset = 0
+            for start, stop in sheets.contiguous_blocks(update_rows):
+                block = values[offset:offset + stop - start]
+                offset += stop - start
+                column_offset = 0
+                for column_start, column_stop in column_blocks:
+                    width = column_stop - column_start
+                    a1_range = f"'{sheet_name}'!{col_idx_to_a1(column_start)}{start}:{col_idx_to_a1(column_stop - 1)}{stop - 1}"
+                    yield a1_range, [row[column_offset:column_offset + width] for row in block]
+                    column_offset += width
+
+        # 5. Append the new keys as rows of the header's width (blank in the columns missing from df)
+        def append_ranges():
+            if appends.empty:
+                return
+            positions = [header_positions[str(column)] for column in columns]
+            width = positions[-1] + 1
+            for chunk in sheets.iter_rows(appends, 2000, unformat):
+                rows = []
+                for values in chunk:
+                    row = [''] * width
+                    for position, value in zip(positions, values):
+                        row[position] = value
+                    rows.append(row)
+                yield f"'{sheet_name}'!A1", rows
+
+        metrics.log(f"  Updating {len(updates)} row(s) and appending {len(appends)} row(s)...")
+        for data in sheets.pack_ranges(update_ranges(), max_payload_bytes):
+            try:
+                executor.execute(sheets_service.spreadsheets().values().batchUpdate(
+                    spreadsheetId=spreadsheet_id,
+                    body={'valueInputOption': 'USER_ENTERED', 'data': data}
+                ))
+            except Exception as e:
+                metrics.log(f"Error writing ranges {data[0]['range']} to {data[-1]['range']}: {e}", 'error')
+                return
+
+        for data in sheets.pack_ranges(append_ranges(), max_payload_bytes):
+            rows = [row for value_range in data for row in value_range['values']]
+            try:
+                response = executor.execute(sheets_service.spreadsheets().values().append(
+                    spreadsheetId=spreadsheet_id,
+                    range=f"'{sheet_name}'!A1",
+                    valueInputOption='USER_ENTERED',
+                    insertDataOption='INSERT_ROWS',
+                    body={'values': rows}
+                ))
+            except Exception as e:
+                metrics.log(f"Error appending {len(rows)} row(s) to '{sheet_name}': {e}", 'error')
+                return
+            updated_range = response.get('updates', {}).get('updatedRange', '')
+            last_row = ''.join(c for c in updated_range.rpartition(':')[2] if c.isdigit())
+            if last_row and int(last_row) > current_sheet_rows:
+                current_sheet_rows = int(last_row)
+                self._update_cached_grid(spreadsheet_id, sheet_props['sheetId'], rows=current_sheet_rows)
+
+        metrics.log(f"Sheet '{sheet_name}' upsert complete.")
+
+    def df_append(self,
+                  df: Union[pd.DataFrame, Iterable[pd.DataFrame]],
+                  spreadsheet_id: str,
+                  sheet_name: str = None,
+                  unformat: bool = False,
+                  header: bool = True,
+                  chunk_size: int = 2000,
+                  max_payload_bytes: int = sheets.MAX_PAYLOAD_BYTES):
+        """Append the rows of a pandas dataframe (or a stream of dataframes) to a drive sheet.
+
+        Rows are added after the last row of the sheet with values.append, without clearing or
+        reading the existing values. DataFrames are serialized chunk by chunk and written in
+        requests of up to max_payload_bytes, so an iterator of DataFrames (e.g. a generator
+        reading a big file) is streamed into the sheet with constant memory.
+
+        Args:
+            df: DataFrame or iterable of DataFrames with the same columns.
+            spreadsheet_id: ID of the Google Spreadsheet.
+            sheet_name: Name of the sheet. Defaults to the first sheet.
+            unformat: If True, fill NaN with 'NULL' and convert all to string.
+            header: If True, the header of the (first) DataFrame is written when the sheet is empty.
+            chunk_size: Rows serialized at a time.
+            max_payload_bytes: Maximum size of each append request body.
+        """
+        import pandas as pd
+
+        sheets_service = self.sheets_service
+        frames = [df] if isinstance(df, pd.DataFrame) else df
+
+        sheet_props = self._get_sheet_properties(spreadsheet_id, sheet_name, refresh=True)
+        if not sheet_props:
+            metrics.log(f"Error: Sheet named '{sheet_name}' not found in {spreadsheet_id}.", 'error')
+            return
+        sheet_name = sheet_props['title']
+        current_sheet_rows = sheet_props.get('gridProperties', {}).get('rowCount', 1)
+        current_sheet_cols = sheet_props.get('gridProperties', {}).get('columnCount', 1)
+
+        write_header = header and not executor.execute(sheets_service.spreadsheets().values().get(
+            spreadsheetId=spreadsheet_id, range=f"'{sheet_name}'!1:1"
+        )).get('values')
+
+        metrics.log(f"Appending to sheet: '{sheet_name}' in spreadsheet: {spreadsheet_id}")
+
+        def append_ranges():
+            header_pending = write_header
+            for frame in frames:
+                if header_pending and not frame.columns.empty:
+                    yield f"'{sheet_name}'!A1", [sheets.serialize_headers(frame, unformat)]
+                    header_pending = False
+                for chunk in sheets.iter_rows(frame, chunk_size, unformat):
+                    yield f"'{sheet_name}'!A1", chunk
+
+        # values.append takes a single range, so every payload is merged into one block of rows.
+        # Payloads (and their requests) are built in the background while the previous one is sent.
+        def append_requests():
+            for data in sheets.pack_ranges(append_ranges(), max_payload_bytes):
+                rows = [row for value_range in data for row in value_range['values']]
+                width = max(len(row) for row in rows)
+                yield len(rows), width, sheets_service.spreadsheets().values().append(
+                    spreadsheetId=spreadsheet_id,
+                    range=f"'{sheet_name}'!A1",
+                    valueInputOption='USER_ENTERED',
+                    insertDataOption='OVERWRITE',
+                    body={'values': rows}
+                )
+
+        appended_rows = 0
+        for num_rows, width, append_request in sheets.pipelined(append_requests()):
+            # values.append extends the grid with new rows by itself; wider data needs more columns first
+            if width > current_sheet_cols:
+                metrics.log(f"    Expanding sheet from {current_sheet_rows}x{current_sheet_cols} to {current_sheet_rows}x{width}.")
+                self._resize_sheet(spreadsheet_id, sheet_props['sheetId'], current_sheet_rows, width)
+                current_sheet_cols = width
+            metrics.log(f"    Appending {num_rows} row(s)...")
+            try:
+                response = executor.execute(append_request)
+            except Exception as e:
+                metrics.log(f"Error appending rows to '{sheet_name}' after {appended_rows} row(s): {e}", 'error')
+                return
+            appended_rows += num_rows
+            updated_range = response.get('updates', {}).get('updatedRange', '')
+            last_row = ''.join(c for c in updated_range.rpartition(':')[2] if c.isdigit())
+            if last_row and int(last_row) > current_sheet_rows:
+                current_sheet_rows = int(last_row)
+                self._update_cached_grid(spreadsheet_id, sheet_props['sheetId'], rows=current_sheet_rows)
+
+        metrics.log(f"Sheet '{sheet_name}' append complete ({appended_rows} row(s)).")
+
+    @bulk_upload
+    def upload_folder(self,local_folder_path :str,folder_id :str,update : bool =True,subfolder : bool=False,subfolder_name:str=None,recursive: bool=True,convert: bool=False,url: bool=True,max_workers: int=1,skip_unchanged: bool=False,manifest_path: str=None,chunk_size: int=resumable.DEFAULT_CHUNK_SIZE,resume_path: str=None,total_files_to_upload_count=None,pbar=None,errors=None):
         """Upload entire local folder to a specified drive folder by ID.
 
         Takes all the content of a local folder and uploads it with the same structure to 
@@ -434,13 +1208,23 @@ class Drive:
             recursive: If set to True, it iterates through the local folder uploading subfolders content too. Otherwise, it only will upload content of the specified folder and ignore subfolders.
             convert: If set to True, the method will convert all files in the folder (if conversion is available) to it's corresponding google mimeType in Drive.
             url: If set to True, the method will accept URL type input as folder_id and automatically convert it to ID type.
-            
+            max_workers: Number of files uploaded at the same time. Drive subfolders are created first and then files are uploaded by a pool of workers, each one with its own drive client. If set to 1, files are uploaded one after another.
+            skip_unchanged: If set to True, existing drive files with the same size and MD5 checksum as the local ones aren't uploaded again (see upload).
+            manifest_path: Path of a local JSON manifest used to avoid hashing files that didn't change since the last run (see upload).
+            chunk_size: Bytes sent per request of each resumable upload (must be a multiple of 256 KB).
+            resume_path: Path of a local JSON file where unfinished upload sessions are saved, so interrupted uploads continue where they stopped when the folder is uploaded again (see upload).
+
+        Returns:
+            errors: Dictionary mapping the local path of every file that couldn't be uploaded (or, with a service account, moved to its drive folder) to its exception.
         """
+        from tqdm import tqdm
+
+        errors = {} if errors == None else errors
 
         if  total_files_to_upload_count == None and pbar == None:
-            print('\n> Calculating estimated files number...')
+            metrics.log('\n> Calculating estimated files number...')
             total_files_to_upload_count = sum(len(filenames) for _, _, filenames in os.walk(local_folder_path))
-            print(f'Started uploading folder with {total_files_to_upload_count} files\n')
+            metrics.log(f'Started uploading folder with {total_files_to_upload_count} files\n')
             pbar = tqdm(total = total_files_to_upload_count,desc='Total upload progress: ')
 
         if url == True:
@@ -453,29 +1237,72 @@ class Drive:
             if subfolder_name == None:
                 subfolder_name = utils.get_filename(local_folder_path)
 
-            folder_id = service.create_subfolder(subfolder_name,None,folder_id,update,self.drive_service,self.mode)
+            folder_id = self._create_subfolder(subfolder_name,folder_id,update)
+
+        if max_workers > 1:
+            jobs = self._plan_folder_upload(local_folder_path,folder_id,update=update,recursive=recursive)
+            errors.update(self._parallel_upload(jobs,max_workers,pbar=pbar,update=update,convert=convert,skip_unchanged=skip_unchanged,manifest_path=manifest_path,chunk_size=chunk_size,resume_path=resume_path))
+            return self._collect_parent_errors(errors)
 
         for file in files_list:
             file_path = str(local_folder_path)+ '/' + file
             if recursive == True:
                 if os.path.isfile(file_path):
                     try:
-                        self.upload(file_path,folder_id,convert=convert,url=False) # url=False -> not checking everytime
+                        self.upload(file_path,folder_id,convert=convert,url=False,skip_unchanged=skip_unchanged,manifest_path=manifest_path,chunk_size=chunk_size,resume_path=resume_path) # url=False -> not checking everytime
                     except Exception as e:
-                        print(f"Error uploading file: {file_path}\nERROR: {e}")
+                        errors[file_path] = e
+                        metrics.log(f"Error uploading file: {file_path}\nERROR: {e}", 'error', path=file_path, error=str(e))
                     pbar.update(1)
 
                 elif os.path.isdir(file_path):
                     subfolder_name = utils.get_filename(file_path)
-                    subfolder_id = service.create_subfolder(subfolder_name,None,folder_id,update,self.drive_service,self.mode)
-                    self.upload_folder(file_path,subfolder_id,update=update,subfolder=False,convert=convert,total_files_to_upload_count=total_files_to_upload_count,pbar=pbar)
+                    subfolder_id = self._create_subfolder(subfolder_name,folder_id,update)
+                    self.upload_folder(file_path,subfolder_id,update=update,subfolder=False,convert=convert,skip_unchanged=skip_unchanged,manifest_path=manifest_path,chunk_size=chunk_size,resume_path=resume_path,total_files_to_upload_count=total_files_to_upload_count,pbar=pbar,errors=errors)
                 else:
                     # not file nor dir
-                    print('\nError uploading file: ' + file_path + '\n(Not file or directory)')
+                    metrics.log('\nError uploading file: ' + file_path + '\n(Not file or directory)', 'error')
             else:
-                self.upload(file_path,folder_id,update=update)
+                self.upload(file_path,folder_id,update=update,skip_unchanged=skip_unchanged,manifest_path=manifest_path,chunk_size=chunk_size,resume_path=resume_path)
+
+        return self._collect_parent_errors(errors)
+
+    def _plan_folder_upload(self,local_folder_path:str,folder_id:str,update:bool=True,recursive:bool=True):
+        """Replicates the local subfolder structure in drive and lists the files that have to be uploaded.
+
+        The tree is walked level by level: all subfolders of a level are looked up and created with
+        batched requests, so that every file already knows its drive parent before the parallel
+        transfers start.
 
-    def download(self,id:str,path:str):
+        Returns:
+            jobs: List of (file_path, folder_id, file_id) tuples.
+        """
+        jobs = []
+        level = [(local_folder_path,folder_id)]
+
+        while level:
+            # Folders of this level will receive files and subfolders, their listings are needed for duplicate checks
+            self._index_folders(drive_folder_id for _,drive_folder_id in level)
+
+            subfolders = []
+            for local_path,drive_folder_id in level:
+                for file in os.listdir(local_path):
+                    file_path = str(local_path)+ '/' + file
+                    if os.path.isfile(file_path):
+                        jobs.append((file_path,drive_folder_id,None))
+                    elif os.path.isdir(file_path):
+                        if recursive == True:
+                            subfolders.append((file_path,utils.get_filename(file_path),drive_folder_id))
+                    else:
+                        # not file nor dir
+                        metrics.log('\nError uploading file: ' + file_path + '\n(Not file or directory)', 'error')
+
+            subfolder_ids = self._create_subfolders([(name,parent) for _,name,parent in subfolders],update=update)
+            level = [(file_path,subfolder_id) for (file_path,_,_),subfolder_id in zip(subfolders,subfolder_ids)]
+
+        return jobs
+
+    def download(self,id:str,path:str,file_metadata:dict=None,chunk_size:int=resumable.DEFAULT_CHUNK_SIZE):
         """Downloads file.
 
         Downloads the specified drive file content to a local file path. The method checks the file's 
@@ -488,43 +1315,90 @@ class Drive:
         Args:
             id: Drive file wich content will be downloaded (specified by it's ID)
             path: Local path file in wich the content will be downloaded (name of the file with extension must be included)  
+            file_metadata: Drive metadata of the file (at least its 'mimeType'), e.g. an item of a folder listing. If set to None, it's requested to the API.
+            chunk_size: Bytes requested per HTTP request. Interrupted binary downloads are resumed from the partial '<path>.part' file on the next call.
+
+        Returns:
+            str: Local path of the downloaded file, or None if it couldn't be downloaded (the error is logged).
         """
         extension = utils.get_file_extension(path)
 
-        file_metadata = service.get_full_metadata(id,self.drive_service) 
+        if file_metadata == None:
+            file_metadata = service.get_full_metadata(id,self.drive_service,fields=service.LISTING_FIELDS)
         
         new_extension,export_type = utils.get_export_type(file_metadata,extension)
 
         # When extension is not specified in path, it is created by default from file's mimeType
-        if extension == '':
+        if extension == '' and new_extension:
             path = path + '.' + new_extension
 
         if export_type == 'error':
-            print("\nError downloading file: " + path + "\n." + extension + " extension it's not an available type of convertion for the specified file")
+            metrics.log("\nError downloading file: " + path + "\n." + extension + " extension it's not an available type of convertion for the specified file", 'error')
 
         elif export_type == 'folder-error':
-            print("\nError downloading file: " + path + "\n. File id detected as a folder. Download method is not intended for downloading drive folders, use 'download_folder()' instead")
+            metrics.log("\nError downloading file: " + path + "\n. File id detected as a folder. Download method is not intended for downloading drive folders, use 'download_folder()' instead", 'error')
             
         else:
             try:
-                service.drive_download(id,path,self.drive_service,mode=export_type)
+                service.drive_download(id,path,self.drive_service,mode=export_type,progress=not getattr(self._local, 'worker', False),chunk_size=chunk_size,file_metadata=file_metadata)
+                return path
 
             except Exception as e:
-                print(f"Error downloading file: {path}\nERROR: {e}")
+                metrics.log(f"Error downloading file: {path}\nERROR: {e}", 'error', path=path, error=str(e))
+
+        return None
     
-    def download_folder(self, local_folder_path :str,folder_id :str,subfolder = False, recursive :bool = True, url :bool = True, files_counter = None, downloaded_files_counter = 0,pbar = None):
+    def download_folder(self, local_folder_path :str,folder_id :str,subfolder = False, recursive :bool = True, url :bool = True, max_workers :int = 1, chunk_size :int = resumable.DEFAULT_CHUNK_SIZE, files_counter = None, downloaded_files_counter = 0,pbar = None,used_paths = None):
+        """Downloads entire drive folder.
+
+        Downloads all the files of a drive folder (specified by it's ID) and it's subfolders to a local folder.
+        Files that would be downloaded to the same local path (same-named files in a drive folder, or in
+        different subfolders with recursive=False) get a ' (1)', ' (2)'... suffix instead of overwriting each other.
+
+        Args:
+            local_folder_path: Path of the local folder in wich the content will be downloaded.
+            folder_id: ID of the drive folder wich content will be downloaded.
+            subfolder: If set to True, a local folder named as the drive folder is created inside local_folder_path and the content is downloaded there.
+            recursive: If set to True, drive subfolders are replicated locally. Otherwise, the files of all subfolders are downloaded to the same local folder.
+            url: If set to True, the method will accept URL type input as folder_id and automatically convert it to ID type.
+            max_workers: Number of files downloaded at the same time. The whole drive tree is listed first (creating local subfolders) and then files are downloaded by a pool of workers, each one with its own drive client. If set to 1, files are downloaded one after another.
+            chunk_size: Bytes requested per HTTP request of each download.
+
+        Returns:
+            tuple: Number of files found and number of files downloaded successfully.
+        """
+        from tqdm import tqdm
+
+        used_paths = set() if used_paths == None else used_paths
 
         if url == True:
             folder_id = utils.url_to_id(folder_id)
 
         if subfolder == True:
 
-            folder_metadata = service.get_full_metadata(folder_id,self.drive_service)
+            folder_metadata = service.get_full_metadata(folder_id,self.drive_service,fields='id, name')
 
-            local_folder_path = local_folder_path + '\\' + folder_metadata['name']
+            local_folder_path = os.path.join(local_folder_path,folder_metadata['name'])
             os.makedirs(local_folder_path, exist_ok=True)
 
-        files_list = service.list_files(folder_id,service=self.drive_service)
+        if max_workers > 1:
+            jobs = self._plan_folder_download(local_folder_path,folder_id,recursive=recursive,used_paths=used_paths)
+
+            if pbar is None:
+                pbar = tqdm(total=0,desc='Total download progress: ')
+            pbar.total += len(jobs)
+            pbar.refresh()
+
+            with ThreadPoolExecutor(max_workers=max_workers,initializer=self._init_worker) as pool:
+                futures = [pool.submit(self.download,file['id'],file_path,file_metadata=file,chunk_size=chunk_size) for file,file_path in jobs]
+                for future in as_completed(futures):
+                    if future.result() != None:
+                        downloaded_files_counter += 1
+                    pbar.update(1)
+
+            return len(jobs),downloaded_files_counter
+
+        files_list = service.list_files(folder_id,service=self.drive_service,fields=service.LISTING_FIELDS)
 
         if files_counter == None and pbar == None:
             # print('\n> Calculating estimated files number...')
@@ -538,7 +1412,7 @@ class Drive:
         pbar.total = files_counter
  
         for file in files_list:
-            file_metadata = service.get_full_metadata(file['id'],self.drive_service)
+            file_metadata = file
             drive_folder = (file_metadata['mimeType'] == 'application/vnd.google-apps.folder')
 
             if drive_folder:
@@ -546,58 +1420,131 @@ class Drive:
                 files_counter-=1
 
                 if recursive == True:
-                    subfolder_name = local_folder_path + "\\" + file_metadata['name']
+                    subfolder_name = os.path.join(local_folder_path,file_metadata['name'])
                     os.makedirs(subfolder_name, exist_ok=True)
                 else:
                     subfolder_name = local_folder_path
 
-                subfolder_file_count,downloaded_subfiles_counter = self.download_folder(subfolder_name,file['id'],recursive=recursive,url=url,files_counter=files_counter,downloaded_files_counter=downloaded_files_counter,pbar=pbar)
+                subfolder_file_count,downloaded_subfiles_counter = self.download_folder(subfolder_name,file['id'],recursive=recursive,url=url,chunk_size=chunk_size,files_counter=files_counter,downloaded_files_counter=downloaded_files_counter,pbar=pbar,used_paths=used_paths)
                 files_counter = subfolder_file_count
                 downloaded_files_counter = downloaded_subfiles_counter
 
             else:
-                downloaded_files_counter +=1
                 # print(f"Downloading folder's files : {downloaded_files_counter}/{files_counter}")
-                file_path = local_folder_path + '\\' + file_metadata['name']
-                self.download(file['id'],file_path)
+                file_path = utils.unique_path(utils.download_path(file_metadata,local_folder_path),used_paths)
+                if self.download(file['id'],file_path,file_metadata=file_metadata,chunk_size=chunk_size) != None:
+                    downloaded_files_counter +=1
                 pbar.update(1)
 
         return files_counter,downloaded_files_counter
+
+    def _plan_folder_download(self,local_folder_path:str,folder_id:str,recursive:bool=True,used_paths:set=None):
+        """Walks a drive folder tree creating the local subfolders and lists the files that have to be downloaded.
+
+        The tree is walked level by level, listing all folders of a level with batched requests. Every job
+        gets a different local path (see utils.unique_path), so parallel downloads never write the same file.
+
+        Returns:
+            jobs: List of (file_metadata, local_file_path) tuples.
+        """
+        jobs = []
+        level = {folder_id: local_folder_path}
+        used_paths = set() if used_paths == None else used_paths
+
+        while level:
+            listings = service.list_folders(level,self.drive_service,fields=service.LISTING_FIELDS)
+            next_level = {}
+            for drive_folder_id,files_list in listings.items():
+                for file in files_list:
+                    if file['mimeType'] == 'application/vnd.google-apps.folder':
+                        if recursive == True:
+                            subfolder_path = os.path.join(level[drive_folder_id],file['name'])
+                            os.makedirs(subfolder_path, exist_ok=True)
+                        else:
+                            subfolder_path = level[drive_folder_id]
+                        next_level[file['id']] = subfolder_path
+                    else:
+                        jobs.append((file,utils.unique_path(utils.download_path(file,level[drive_folder_id]),used_paths)))
+            level = next_level
+
+        return jobs
     
-    def df_download(self,id:str,sheet_name:str=None,unformat:bool = False):
+    def df_download(self,id:str,sheet_name:str=None,unformat:bool = False,block_size:int = 10000,max_workers:int = 1,infer_dtypes:bool = False,dtype:dict = None,dtype_backend:str = None):
         """Download content of a drive sheet to a pandas dataframe.
 
-        Downloads content of a drive sheet specified by its id to a pandas dataframe.
+        Downloads content of a drive sheet specified by its id to a pandas dataframe. The sheet is
+        read in blocks of rows (every column of the grid), which can be fetched concurrently.
 
         Args:
             id: ID of the drive sheet that will be downloaded.  
             sheet_name: Name of the specific sheet that will be downloaded. If set to None, first sheet of the file will be downloaded.  
+            unformat: If True, fill missing values with 'NULL' and convert all to string.
+            block_size: Rows read by each request.
+            max_workers: Number of blocks fetched at the same time (each worker thread uses its own sheets client).
+            infer_dtypes: If True, columns whose values are all numbers, booleans or dates get numeric, boolean or datetime dtypes.
+            dtype: Dictionary {column: dtype} of types to apply to specific columns.
+            dtype_backend: 'numpy_nullable' or 'pyarrow' (needs pyarrow installed) to convert the result with DataFrame.convert_dtypes.
             
         """
 
+        # Values of a named sheet are read unformatted, the first sheet keeps the default (formatted) rendering
         if sheet_name == None:
-            sheet_metadata = self.sheets_service.spreadsheets().values().get(spreadsheetId=id, range='A1:Z').execute()
+            render_options = {}
+            sheet_props = self._get_sheet_properties(id)
         else:
-            sheet_metadata = self.sheets_service.spreadsheets().values().get(spreadsheetId=id, range=sheet_name, valueRenderOption='UNFORMATTED_VALUE', dateTimeRenderOption='FORMATTED_STRING').execute()
-        values = sheet_metadata.get('values', [])
+            render_options = {'valueRenderOption': 'UNFORMATTED_VALUE', 'dateTimeRenderOption': 'FORMATTED_STRING'}
+            sheet_props = self._get_sheet_properties(id, sheet_name)
+
+        if not sheet_props:
+            metrics.log(f"Error: Sheet named '{sheet_name}' not found in {id}.", 'error')
+            return None
 
-        headers = values[0]
-        rows = values[1:]
+        values = self._get_sheet_values(id, sheet_props, block_size, max_workers, **render_options)
 
-        max_cols = max(len(row) for row in rows)
-        max_dimensions = max(len(headers),max_cols)
+        df = sheets.build_frame(values, unformat=unformat, infer_dtypes=infer_dtypes, dtype=dtype, dtype_backend=dtype_backend)
 
-        headers += [None] * (max_dimensions - len(headers))
+        return df
 
-        for row in rows:
-            row += [None] * (max_dimensions - len(row))
+    def df_download_all(self,id:str,sheet_names:list = None,unformat:bool = False,infer_dtypes:bool = False,dtype:dict = None,dtype_backend:str = None):
+        """Download several sheets of a drive spreadsheet to pandas dataframes.
 
-        df = pd.DataFrame(rows,columns=headers)
+        Sheets are discovered with a single spreadsheets.get request and all their values are read
+        with a single values.batchGet request. DataFrames are built with the same rules as df_download
+        (first row as header, values read unformatted).
 
-        if unformat == True:
-            df = df.fillna('NULL')
-            df = df.astype(str)
-            df.columns = df.columns.astype(str)
+        Args:
+            id: ID of the drive spreadsheet that will be downloaded.
+            sheet_names: Names of the sheets that will be downloaded. If set to None, every sheet of the file will be downloaded.
+            unformat: If True, fill missing values with 'NULL' and convert all to string.
+            infer_dtypes: If True, columns whose values are all numbers, booleans or dates get numeric, boolean or datetime dtypes.
+            dtype: Dictionary {column: dtype} of types to apply to specific columns (of every sheet).
+            dtype_backend: 'numpy_nullable' or 'pyarrow' (needs pyarrow installed) to convert the results with DataFrame.convert_dtypes.
+
+        Returns:
+            dict: {sheet name: DataFrame}, in the order of the sheets in the spreadsheet.
+
+        Raises:
+            ValueError: If some of sheet_names aren't sheets of the spreadsheet.
+        """
+        titles = [props.get('title') for props in self._get_spreadsheet_sheets(id)]
 
+        if sheet_names != None:
+            missing_sheets = [name for name in sheet_names if name not in titles]
+            if missing_sheets:
+                raise ValueError(f"Sheets not found in spreadsheet {id}: {missing_sheets}")
+            titles = [title for title in titles if title in sheet_names]
 
-        return df
+        if not titles:
+            return {}
+
+        ranges = ["'" + title.replace("'", "''") + "'" for title in titles]
+        value_ranges = executor.execute(self.sheets_service.spreadsheets().values().batchGet(
+            spreadsheetId=id, ranges=ranges, valueRenderOption='UNFORMATTED_VALUE', dateTimeRenderOption='FORMATTED_STRING'
+        )).get('valueRanges', [])
+
+        dfs = {}
+        for title, value_range in zip(titles, value_ranges):
+            values = value_range.get('values', [])
+            dfs[title] = sheets.build_frame(values, unformat=unformat, infer_dtypes=infer_dtypes, dtype=dtype, dtype_backend=dtype_backend)
+
+        return dfs
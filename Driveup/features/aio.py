@@ -0,0 +1,270 @@
+from googleapiclient.errors import HttpError
+from Driveup.features import executor,metrics,resumable
+import asyncio
+import json
+import os
+
+import httplib2
+
+# Root URLs of the APIs (the same ones the discovery documents use)
+DRIVE_ROOT_URL = 'https://www.googleapis.com/'
+SHEETS_ROOT_URL = 'https://sheets.googleapis.com/'
+
+DEFAULT_MAX_CONNECTIONS = 100
+
+class AsyncClient:
+    """
+    Minimal asyncio client of the Drive and Sheets REST APIs, on an aiohttp session.
+
+    Requests are authorized with google.auth credentials (refreshed in a thread when they
+    expire, as google.auth is synchronous), go through the same rate limiters as the
+    synchronous clients (see executor) and retry transient errors. Failed requests raise
+    googleapiclient's HttpError, so errors can be handled in the same way for Drive and
+    AsyncDrive.
+
+    Args:
+        credentials: google.auth credentials used to authorize the requests.
+        root_url: Root URL of the Google APIs (e.g. 'http://localhost:8080/' for a local emulator). Defaults to Google's.
+        max_connections: Maximum number of connections open at the same time.
+        timeout: Seconds to wait for each request before giving up (None waits forever).
+    """
+    def __init__(self,credentials,root_url = None,max_connections = DEFAULT_MAX_CONNECTIONS,timeout = None):
+        try:
+            import aiohttp
+        except ImportError:
+            raise ImportError("AsyncDrive requires aiohttp: pip install driveup[async]")
+
+        self._aiohttp = aiohttp
+        self.credentials = credentials
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.drive_url = (root_url or DRIVE_ROOT_URL) + 'drive/v3/'
+        self.upload_url = (root_url or DRIVE_ROOT_URL) + 'upload/drive/v3/'
+        self.sheets_url = (root_url or SHEETS_ROOT_URL) + 'v4/'
+        self._session = None
+        self._refresh_lock = None
+
+    def _get_session(self):
+        # aiohttp sessions belong to the running event loop, so they are created on first use
+        if self._session == None or self._session.closed:
+            connector = self._aiohttp.TCPConnector(limit=self.max_connections)
+            self._session = self._aiohttp.ClientSession(connector=connector, timeout=self._aiohttp.ClientTimeout(total=self.timeout))
+            self._refresh_lock = asyncio.Lock()
+        return self._session
+
+    async def _authorize(self,headers):
+        if not self.credentials.valid:
+            async with self._refresh_lock:
+                if not self.credentials.valid:
+                    from google.auth.transport.requests import Request
+                    await asyncio.get_running_loop().run_in_executor(None, self.credentials.refresh, Request())
+        self.credentials.apply(headers)
+
+    async def send(self,method,url,params = None,json_body = None,data = None,headers = None,ok_status = ()):
+        """
+        Sends a single HTTP request (without rate limiting nor retries).
+
+        Args:
+            method: HTTP method.
+            url: Request URL.
+            params: Query parameters (None values are left out, lists are repeated).
+            json_body: Body to send as JSON.
+            data: Raw body (bytes).
+            headers: Additional request headers.
+            ok_status: Error status codes (e.g. 308) that are returned instead of raised.
+
+        The request is added to the metrics of the API call being sent (see executor.call_async).
+
+        Returns:
+            tuple: Status code, response headers and response body (bytes).
+
+        Raises:
+            HttpError: If the response status is an error (not in ok_status).
+        """
+        session = self._get_session()
+        headers = dict(headers or {})
+        await self._authorize(headers)
+        if json_body is not None:
+            # Serialized here (instead of by aiohttp) so the bytes sent are known
+            data = json.dumps(json_body).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+
+        try:
+            async with session.request(method, url, params=_query(params), data=data, headers=headers, allow_redirects=method in ('GET', 'HEAD')) as response:
+                content = await response.read()
+                status = response.status
+                response_headers = response.headers
+        except self._aiohttp.ClientConnectionError as e:
+            # Retryable like the connection errors of the synchronous transports
+            raise ConnectionError(str(e))
+
+        metrics.transferred(status, len(data) if data else 0, len(content))
+
+        if status >= 300 and status not in ok_status:
+            resp = httplib2.Response({'status': str(status), **{key.lower(): value for key,value in response_headers.items()}})
+            raise HttpError(resp, content, uri=url)
+
+        return status, response_headers, content
+
+    async def request(self,method,url,api = 'drive',tokens = 1,max_retries = executor.MAX_RETRIES,name = None,**kwargs):
+        """
+        Sends an API request through the rate limiter of api, retrying transient errors.
+
+        name is the API method in the metrics (e.g. 'drive.files.list', as the methodIds of
+        googleapiclient). Defaults to the HTTP method and the URL path. Arguments after name
+        are the ones of send.
+
+        Returns:
+            dict: The JSON response (empty if the response has no body).
+        """
+        async def send():
+            return await self.send(method,url,**kwargs)
+
+        if name == None:
+            name = f"{api}.{method} {url.split('?')[0].split('googleapis.com/')[-1]}"
+
+        _, _, content = await executor.call_async(send,api,tokens,max_retries,name)
+
+        return json.loads(content) if content else {}
+
+    async def close(self):
+        if self._session != None and not self._session.closed:
+            await self._session.close()
+
+def _query(params):
+    if not params:
+        return None
+
+    query = []
+    for key,value in params.items():
+        for item in (value if isinstance(value, (list, tuple)) else [value]):
+            if item is None:
+                continue
+            query.append((key, ('true' if item else 'false') if isinstance(item, bool) else str(item)))
+
+    return query
+
+def _committed_offset(headers):
+    """Next byte to send after a 308 answer of a resumable upload (from its 'Range: bytes=0-N' header)."""
+    committed = headers.get('Range')
+
+    return int(committed.rsplit('-', 1)[1]) + 1 if committed else 0
+
+async def upload_chunks(client,method,url,file_path,metadata,params = None,chunk_size = resumable.DEFAULT_CHUNK_SIZE,pbar = None,max_retries = executor.MAX_RETRIES):
+    """
+    Uploads a local file through a resumable upload session, chunk by chunk.
+
+    When a chunk fails with a transient error, the committed offset is asked to the server
+    and the upload continues from there after a backoff.
+
+    Args:
+        client: AsyncClient.
+        method: 'POST' to create a file or 'PATCH' to update the content of an existing one.
+        url: Upload URL of the request, e.g. client.upload_url + 'files'.
+        file_path: Path of the local file.
+        metadata: Drive metadata of the file (body of the session request).
+        params: Query parameters of the session request (e.g. fields).
+        chunk_size: Bytes sent per request (must be a multiple of 256 KB).
+        pbar: tqdm progress bar (with the file size as total) updated with the committed bytes.
+        max_retries: Consecutive retries of a chunk before the error is raised.
+
+    Returns:
+        dict: The API response of the finished upload.
+    """
+    size = os.path.getsize(file_path)
+    name = 'drive.files.create' if method == 'POST' else 'drive.files.update'
+
+    # Starting a session creates nothing yet, so it is retried like any idempotent call
+    _, headers, _ = await executor.call_async(lambda: client.send(
+        method, url, params={**(params or {}), 'uploadType': 'resumable'}, json_body=metadata,
+        headers={'X-Upload-Content-Length': str(size)}
+    ), 'drive', max_retries=max_retries, method=name, idempotent=True)
+    session_uri = headers['Location']
+
+    limiter = executor.LIMITERS['drive']
+    offset = 0
+    attempt = 0
+    record = None
+    with open(file_path, 'rb') as f:
+        while True:
+            if record == None:
+                record = metrics.CallRecord(name + '.chunk', 'drive')
+            record.retries = attempt
+            await limiter.acquire_async()
+            try:
+                with metrics.current(record):
+                    if attempt:
+                        # Asks the server for the committed offset before sending data again
+                        status, headers, content = await client.send('PUT', session_uri, headers={'Content-Range': f'bytes */{size}'}, ok_status=(308,))
+                    else:
+                        f.seek(offset)
+                        chunk = f.read(chunk_size)
+                        content_range = f'bytes {offset}-{offset + len(chunk) - 1}/{size}' if chunk else f'bytes */{size}'
+                        status, headers, content = await client.send('PUT', session_uri, data=chunk, headers={'Content-Range': content_range}, ok_status=(308,))
+            except Exception as e:
+                if attempt == max_retries or not executor.is_retryable(e):
+                    metrics.finish(record, e)
+                    raise
+                if executor.is_rate_limit(e):
+                    limiter.throttled()
+                    record.throttled += 1
+                await asyncio.sleep(executor.backoff(attempt))
+                attempt += 1
+                continue
+
+            limiter.succeeded()
+            metrics.finish(record)
+            record = None
+            attempt = 0
+            committed = _committed_offset(headers) if status == 308 else size
+            if pbar is not None:
+                pbar.update(committed - offset)
+            offset = committed
+
+            if status != 308:
+                return json.loads(content) if content else {}
+
+async def download_chunks(client,url,file_handle,offset = 0,size = None,chunk_size = resumable.DEFAULT_CHUNK_SIZE,params = None,pbar = None):
+    """
+    Downloads media content to an open file, with one ranged request per chunk.
+
+    Args:
+        client: AsyncClient.
+        url: Media URL (e.g. client.drive_url + f'files/{id}' with params={'alt': 'media'}).
+        file_handle: File opened for writing (binary) where the content is appended.
+        offset: First byte to download (bytes already in file_handle).
+        size: Total size of the content. If None, it's taken from the Content-Range of the first response.
+        chunk_size: Bytes requested per request.
+        params: Query parameters of every request.
+        pbar: tqdm progress bar updated with the downloaded bytes.
+    """
+    name = ('drive.files.export' if url.rstrip('/').endswith('/export') else 'drive.files.get') + '.chunk'
+
+    while size == None or offset < size:
+        end = offset + chunk_size - 1
+        status, headers, content = await executor.call_async(lambda: client.send(
+            'GET', url, params=params, headers={'Range': f'bytes={offset}-{end}'}, ok_status=(416,)
+        ), 'drive', method=name)
+
+        if status == 416:
+            # Empty file
+            break
+
+        if status == 200 and offset > 0:
+            # Range ignored: the response is the whole content, which replaces the partial one
+            file_handle.seek(0)
+            file_handle.truncate()
+            offset = 0
+            if pbar is not None:
+                pbar.reset(total=pbar.total)
+
+        file_handle.write(content)
+        offset += len(content)
+        if pbar is not None:
+            pbar.update(len(content))
+
+        content_range = headers.get('Content-Range')
+        if status == 200 or not content_range or content_range.endswith('/*'):
+            # Whole content in a single response
+            break
+        size = int(content_range.rsplit('/', 1)[1])
@@ -1,13 +1,198 @@
 from google_auth_oauthlib.flow import InstalledAppFlow
-from google.oauth2.service_account import Credentials
+from google.oauth2 import credentials as user_credentials
+from google.oauth2 import service_account
+from google.auth.exceptions import RefreshError
+from google.auth.transport.requests import Request
+from Driveup.features import metrics
+from contextlib import contextmanager
+import hashlib
 import json
+import os
+import threading
 
-def authorize(secrets):
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+SCOPES = ['https://www.googleapis.com/auth/drive']
+
+# Default folder of the token files of client secrets (one per OAuth client)
+TOKEN_DIR = os.path.join(os.path.expanduser('~'), '.driveup', 'tokens')
+
+# Credentials already authorized in this process: {cache key: credentials}
+_credentials_cache = {}
+# One lock per cache key, so an authorization flow waiting for the browser only blocks the calls with the same secret
+_credentials_locks = {}
+_credentials_cache_lock = threading.Lock()
+
+class _LockedRefresh:
+    """
+    Makes the refresh of google.auth credentials thread-safe.
+
+    The same credentials object is shared by the clients of every worker thread, and
+    google.auth refreshes it without any lock: threads finding the token expired at the
+    same time would all ask for a new one and overwrite it while others read it. Refreshes
+    are serialized here, and a thread that waited for another one's refresh reuses its
+    token. If the credentials have a token_store, refreshed tokens are saved to it.
+    """
+    token_store = None
+
+    def __init__(self,*args,**kwargs):
+        super().__init__(*args,**kwargs)
+        self._refresh_lock = threading.Lock()
+
+    def __getstate__(self):
+        state = dict(getattr(super(), '__getstate__', lambda: self.__dict__)())
+        state.pop('_refresh_lock', None)
+        return state
+
+    def __setstate__(self,state):
+        if hasattr(super(), '__setstate__'):
+            super().__setstate__(state)
+        else:
+            self.__dict__.update(state)
+        self.token_store = state.get('token_store')
+        self._refresh_lock = threading.Lock()
+
+    def refresh(self,request):
+        token = self.token
+        with self._refresh_lock:
+            if self.token != token and self.valid:
+                # Refreshed by another thread while waiting
+                return
+
+            if self.token_store == None:
+                super().refresh(request)
+                return
+
+            with self.token_store.lock():
+                # Another process sharing the token file may have refreshed it already
+                stored = self.token_store.load(self.scopes)
+                if stored != None and stored.token != token and stored.valid:
+                    self.token = stored.token
+                    self.expiry = stored.expiry
+                    return
+
+                super().refresh(request)
+                self.token_store.save(self)
+
+class UserCredentials(_LockedRefresh, user_credentials.Credentials):
+    """OAuth user credentials (client secrets) with thread-safe refresh, saved to their token_store when refreshed."""
+
+class ServiceAccountCredentials(_LockedRefresh, service_account.Credentials):
+    """Service account credentials with thread-safe refresh."""
+
+class TokenStore:
+    """
+    OAuth token of a client secret saved on disk.
+
+    The token (including its refresh token) is kept as JSON, readable only by the user,
+    and rewritten atomically. Reads and writes can be done under lock(), an exclusive
+    lock of a '.lock' file next to it, so several processes can share the same token
+    without running the authorization flow or refreshing the token at the same time.
+
+    Args:
+        path: Path of the token JSON file. It's created on the first save if it doesn't exist.
+    """
+    def __init__(self,path):
+        self.path = path
+        self._thread_lock = threading.Lock()
+
+    def __getstate__(self):
+        return {'path': self.path}
+
+    def __setstate__(self,state):
+        self.__init__(state['path'])
+
+    @contextmanager
+    def lock(self):
+        """Context manager holding the lock of the token file (between threads and processes)."""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+
+        with self._thread_lock:
+            with open(self.path + '.lock', 'a+') as lock_file:
+                _lock_file(lock_file)
+                try:
+                    yield
+                finally:
+                    _unlock_file(lock_file)
+
+    def load(self,scopes = None):
+        """
+        Reads the stored token.
+
+        Args:
+            scopes: Scopes the credentials are used for.
+
+        Returns:
+            UserCredentials: The stored credentials, or None if there is no (readable) token.
+        """
+        if not os.path.isfile(self.path):
+            return None
+
+        try:
+            with open(self.path, 'r') as f:
+                token_info = json.load(f)
+            credentials = UserCredentials.from_authorized_user_info(token_info, scopes)
+        except (ValueError, KeyError):
+            return None
+
+        credentials.token_store = self
+        return credentials
+
+    def save(self,credentials):
+        """Writes the token of credentials (atomically, readable only by the user)."""
+        tmp_path = self.path + '.tmp'
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            f.write(credentials.to_json())
+        os.replace(tmp_path, self.path)
+
+def _lock_file(lock_file):
+    if os.name == 'nt':
+        lock_file.seek(0)
+        while True:
+            try:
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                # LK_LOCK gives up after 10 seconds, keep waiting
+                continue
+    else:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+
+def _unlock_file(lock_file):
+    if os.name == 'nt':
+        lock_file.seek(0)
+        msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+    else:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+def default_token_path(secret_info):
+    """
+    Path of the token file of a client secret (in TOKEN_DIR, named after its client id).
+
+    Args:
+        secret_info (dict): Client secret dictionary.
+
+    Returns:
+        str: The token file path.
+    """
+    client_info = secret_info.get('installed') or secret_info.get('web') or secret_info
+    client_id = client_info.get('client_id') or json.dumps(secret_info, sort_keys=True)
+    name = hashlib.sha1(client_id.encode('utf-8')).hexdigest()
+
+    return os.path.join(TOKEN_DIR, f"{name}.json")
+
+def authorize(secrets,token_path = None,cache = True):
     """
     Authorize the user to access the Google Drive API.
 
     Args:
         secrets (str or dict): The path to the JSON file containing the user's OAuth credentials or a dictionary with the credentials.
+        token_path (str): File where the token of a client secret is saved (default: a file in TOKEN_DIR named after the client id).
+        cache (bool): If False, the saved token and the credentials of previous calls are not used and the authorization flow always runs.
 
     Returns:
         dict: A dictionary containing the credentials and the type of the secret.
@@ -24,6 +209,11 @@ def authorize(secrets):
     - If 'creds_type' is 'client', the function initiates user authorization using InstalledAppFlow.
     - If 'creds_type' is 'service', it creates a credentials object.
     - If 'creds_type' is neither 'client' nor 'service', the function returns an error message.
+    - Client tokens are saved to token_path and refreshed when expired, so the browser flow only runs
+      the first time (or when the refresh token is revoked). The token file is locked while it's read,
+      refreshed or written, so parallel processes can authorize at the same time.
+    - Credentials are cached per process: later calls with the same secret return the same credentials
+      object, which every Drive instance and worker thread can share (refreshes are thread-safe).
 
     Example Usage:
     ```
@@ -33,19 +223,32 @@ def authorize(secrets):
     ```
     """
 
-    scopes = ['https://www.googleapis.com/auth/drive']
+    scopes = SCOPES
 
     secret_info, creds_type = get_secret(secrets)
 
     if creds_type == 'client':
-        flow = InstalledAppFlow.from_client_config(secret_info, scopes=scopes)
-        secret = flow.run_local_server(port=0)
+        token_path = os.path.abspath(token_path or default_token_path(secret_info))
+        cache_key = ('client', token_path)
     elif creds_type == 'service':
-        secret = Credentials.from_service_account_info(secret_info, scopes=scopes)
+        cache_key = ('service', secret_info.get('client_email'), secret_info.get('private_key_id'))
     else:
         print('\033[0;31mERROR: Invalid secret dictionary. Please check the dictionary and try again.\033[0m')
         raise Exception('Invalid secret dictionary.')
 
+    with _credentials_cache_lock:
+        key_lock = _credentials_locks.setdefault(cache_key, threading.Lock())
+
+    with key_lock:
+        secret = _credentials_cache.get(cache_key) if cache else None
+
+        if secret == None:
+            if creds_type == 'client':
+                secret = _client_credentials(secret_info, scopes, TokenStore(token_path), cache)
+            else:
+                secret = ServiceAccountCredentials.from_service_account_info(secret_info, scopes=scopes)
+            _credentials_cache[cache_key] = secret
+
     creds_body = {
         'creds': secret,
         'type': creds_type
@@ -53,6 +256,38 @@ def authorize(secrets):
 
     return creds_body
 
+def _client_credentials(secret_info,scopes,token_store,cache = True):
+    """
+    Credentials of a client secret: the saved token (refreshed if expired) or a new one from the browser flow.
+
+    The token file stays locked until the credentials are saved, so concurrent processes
+    wait for the first one instead of opening several browser flows.
+    """
+    with token_store.lock():
+        secret = token_store.load(scopes) if cache else None
+
+        if secret != None and not secret.valid:
+            if secret.refresh_token:
+                try:
+                    secret.token_store = None # already holding the file lock
+                    secret.refresh(Request())
+                    token_store.save(secret)
+                except RefreshError:
+                    metrics.log('Saved token could not be refreshed, authorizing again.', 'warning', token_path=token_store.path)
+                    secret = None
+            else:
+                secret = None
+
+        if secret == None:
+            flow = InstalledAppFlow.from_client_config(secret_info, scopes=scopes)
+            flow_credentials = flow.run_local_server(port=0)
+            secret = UserCredentials.from_authorized_user_info(json.loads(flow_credentials.to_json()), scopes)
+            token_store.save(secret)
+
+    secret.token_store = token_store
+
+    return secret
+
 def get_secret(secret):
     """
     Get secret dictionary and type from a file path or a dictionary.
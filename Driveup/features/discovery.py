@@ -0,0 +1,67 @@
+from googleapiclient import discovery, discovery_cache
+import copy
+import json
+import threading
+
+_documents = {} # {(service_name, version, root_url): parsed discovery document}
+_documents_lock = threading.Lock()
+
+def get_document(service_name,version,root_url = None):
+    """
+    Returns the parsed discovery document of a Google API, reading and parsing it only once per process.
+
+    Documents are loaded from the copies bundled with google-api-python-client, so building a
+    client doesn't need any request to the discovery service.
+
+    Args:
+        service_name: Name of the API, e.g. 'drive'.
+        version: Version of the API, e.g. 'v3'.
+        root_url: If set, replaces the root URL of the API (e.g. 'http://localhost:8080/' for a local emulator).
+
+    Returns:
+        dict: The discovery document, or None if it isn't bundled.
+    """
+    key = (service_name, version, root_url)
+
+    with _documents_lock:
+        document = _documents.get(key)
+    if document != None:
+        return document
+
+    if root_url != None:
+        document = get_document(service_name, version)
+        if document == None:
+            return None
+        document = copy.deepcopy(document)
+        document['rootUrl'] = root_url
+        document['baseUrl'] = root_url + document.get('servicePath', '')
+    else:
+        content = discovery_cache.get_static_doc(service_name, version)
+        if content == None:
+            return None
+        document = json.loads(content)
+
+    with _documents_lock:
+        return _documents.setdefault(key, document)
+
+def build(service_name,version,root_url = None,**kwargs):
+    """
+    Builds a client of a Google API from its cached discovery document.
+
+    Same as googleapiclient.discovery.build (which it falls back to for APIs without a
+    bundled document), but the document is only parsed the first time.
+
+    Args:
+        service_name: Name of the API, e.g. 'drive'.
+        version: Version of the API, e.g. 'v3'.
+        root_url: If set, replaces the root URL of the API.
+        **kwargs: Arguments of build_from_document, e.g. credentials or http.
+
+    Returns:
+        Resource: The API client.
+    """
+    document = get_document(service_name, version, root_url)
+    if document == None:
+        return discovery.build(service_name, version, **kwargs)
+
+    return discovery.build_from_document(document, **kwargs)
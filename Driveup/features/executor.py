@@ -0,0 +1,265 @@
+from googleapiclient.errors import HttpError
+from Driveup.features import metrics
+import asyncio
+import json
+import random
+import socket
+import threading
+import time
+
+# Default per-minute quotas of the APIs (per user). Both can be changed with configure().
+DRIVE_REQUESTS_PER_MINUTE = 12000
+# Sheets allows 60 read and 60 write requests per minute per user (300 per minute is the project quota)
+SHEETS_REQUESTS_PER_MINUTE = 60
+# Seconds of quota that can be sent at once after an idle period
+BURST_SECONDS = 10
+
+MAX_RETRIES = 6
+MAX_BACKOFF = 64 # seconds
+
+RETRYABLE_STATUS = (429, 500, 502, 503, 504)
+# 403 errors that are rate limits (not permission problems)
+RATE_LIMIT_REASONS = ('userRateLimitExceeded', 'rateLimitExceeded', 'RESOURCE_EXHAUSTED')
+
+# API methods that add something new every time they are processed: if the response is lost
+# (server error, dropped connection) a retry could create a second file or append the rows twice.
+# They are only retried when the API rejected them for exceeding the quota (so they weren't processed).
+# Resumable uploads are sent as chunks ('drive.files.create.chunk'), which are safe to send again.
+NON_IDEMPOTENT_METHODS = (
+    'drive.files.create',
+    'drive.files.copy',
+    'drive.permissions.create',
+    'sheets.spreadsheets.create',
+    'sheets.spreadsheets.values.append',
+)
+
+class TokenBucket:
+    """
+    Token bucket rate limiter with an adaptive rate, shared by every thread.
+
+    Tokens are refilled continuously at the current rate, up to burst_seconds of quota. When
+    the API throttles a request the rate is halved (down to min_rate), and every successful
+    request increases it again by 1% of the quota, so the rate settles just under the limit
+    that is actually enforced.
+
+    Args:
+        requests_per_minute: Quota of the API. It's the initial and maximum rate.
+        min_requests_per_minute: The rate is never lowered below this value.
+        burst_seconds: Seconds of quota the bucket holds (at least one request).
+    """
+    def __init__(self,requests_per_minute,min_requests_per_minute = None,burst_seconds = BURST_SECONDS):
+        self.max_rate = requests_per_minute / 60
+        self.min_rate = (min_requests_per_minute or max(1, requests_per_minute / 100)) / 60
+        self.rate = self.max_rate
+        self.capacity = max(1, self.max_rate * burst_seconds)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self,tokens = 1):
+        """
+        Waits until tokens are available and takes them.
+
+        Args:
+            tokens: Number of requests about to be sent (e.g. the size of an HTTP batch).
+        """
+        while True:
+            wait = self._take(tokens)
+            if wait == None:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self,tokens = 1):
+        """Same as acquire, but waits without blocking the event loop."""
+        while True:
+            wait = self._take(tokens)
+            if wait == None:
+                return
+            await asyncio.sleep(wait)
+
+    def _take(self,tokens):
+        """Takes tokens if they are available. Otherwise returns the seconds to wait for them."""
+        tokens = min(tokens, self.capacity)
+        with self._lock:
+            self._refill()
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return None
+            return (tokens - self.tokens) / self.rate
+
+    def throttled(self):
+        """Lowers the rate after the API rejected a request for exceeding its quota."""
+        with self._lock:
+            self._refill()
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = min(self.tokens, 0)
+
+    def succeeded(self):
+        """Raises the rate (up to the quota) after a successful request."""
+        if self.rate < self.max_rate:
+            with self._lock:
+                self.rate = min(self.max_rate, self.rate + self.max_rate / 100)
+
+LIMITERS = {
+    'drive': TokenBucket(DRIVE_REQUESTS_PER_MINUTE),
+    'sheets': TokenBucket(SHEETS_REQUESTS_PER_MINUTE),
+}
+
+def configure(api,requests_per_minute,min_requests_per_minute = None):
+    """
+    Changes the quota used to limit the requests of an API.
+
+    Args:
+        api: 'drive' or 'sheets'.
+        requests_per_minute: Quota of the API (e.g. the one shown in Google Cloud console for the project).
+        min_requests_per_minute: Lowest rate the limiter can adapt down to.
+    """
+    LIMITERS[api] = TokenBucket(requests_per_minute,min_requests_per_minute)
+
+def api_of(request):
+    """Returns 'sheets' or 'drive' depending on the API an HttpRequest is addressed to."""
+    uri = getattr(request, 'uri', '') or ''
+
+    return 'sheets' if 'sheets.googleapis.com' in uri or '/v4/spreadsheets' in uri else 'drive'
+
+def _reason(error):
+    try:
+        data = json.loads(error.content.decode('utf-8') if isinstance(error.content, bytes) else error.content)
+        errors = data['error'].get('errors') or [{}]
+        return errors[0].get('reason') or data['error'].get('status')
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return None
+
+def is_rate_limit(error):
+    """Whether an exception is the API rejecting a request for exceeding its quota."""
+    if not isinstance(error, HttpError):
+        return False
+
+    return error.resp.status == 429 or (error.resp.status == 403 and _reason(error) in RATE_LIMIT_REASONS)
+
+def is_idempotent(method):
+    """Whether sending an API method (e.g. 'drive.files.get') twice has the same effect as sending it once."""
+    return method not in NON_IDEMPOTENT_METHODS
+
+def is_retryable(error,idempotent = True):
+    """
+    Whether a failed request can be sent again: rate limits, server errors and dropped connections.
+
+    Non idempotent requests are only sent again after rate limits, otherwise they may have been processed.
+    """
+    if is_rate_limit(error):
+        return True
+    if not idempotent:
+        return False
+    if isinstance(error, HttpError):
+        return error.resp.status in RETRYABLE_STATUS
+
+    return isinstance(error, (ConnectionError, socket.timeout, TimeoutError))
+
+def backoff(attempt):
+    """Jittered exponential backoff: a random delay between 50% and 100% of min(2 ** attempt, MAX_BACKOFF) seconds."""
+    return min(2 ** attempt, MAX_BACKOFF) * random.uniform(0.5, 1)
+
+def call(function,api = 'drive',tokens = 1,max_retries = MAX_RETRIES,method = None,idempotent = None):
+    """
+    Calls function (which sends API requests) through the rate limiter of api, retrying transient errors.
+
+    The call is recorded in metrics.REGISTRY (and passed to the metrics hooks) once it finishes.
+
+    Args:
+        function: Callable without arguments, e.g. request.execute or downloader.next_chunk.
+        api: 'drive' or 'sheets'.
+        tokens: Number of requests sent by function (e.g. the size of an HTTP batch).
+        max_retries: Retries before the error is raised.
+        method: Name of the call in the metrics. Defaults to the methodId of the request function belongs to.
+        idempotent: Whether function can be called again after a server error or a dropped connection. Defaults to is_idempotent(method).
+
+    Returns:
+        The result of function.
+    """
+    limiter = LIMITERS[api]
+    record = metrics.CallRecord(method or metrics.method_name(function,api),api,tokens)
+    send = metrics.measured(function,record)
+    idempotent = is_idempotent(record.method) if idempotent == None else idempotent
+
+    for attempt in range(max_retries + 1):
+        record.retries = attempt
+        limiter.acquire(tokens)
+        try:
+            result = send()
+        except Exception as e:
+            if attempt == max_retries or not is_retryable(e,idempotent):
+                metrics.finish(record,e)
+                raise
+            if is_rate_limit(e):
+                limiter.throttled()
+                record.throttled += 1
+            time.sleep(backoff(attempt))
+            continue
+
+        limiter.succeeded()
+        metrics.finish(record)
+        return result
+
+async def call_async(function,api = 'drive',tokens = 1,max_retries = MAX_RETRIES,method = None,idempotent = None):
+    """
+    Awaits function (a coroutine function sending API requests) through the rate limiter of api, retrying transient errors.
+
+    Limiters are the same as the ones of call, so synchronous and asynchronous clients share the quotas.
+    Requests sent by function are added to the call's metrics through metrics.transferred.
+
+    Args:
+        function: Coroutine function without arguments.
+        api: 'drive' or 'sheets'.
+        tokens: Number of requests sent by function.
+        max_retries: Retries before the error is raised.
+        method: Name of the call in the metrics, e.g. 'drive.files.list'.
+        idempotent: Whether function can be awaited again after a server error or a dropped connection. Defaults to is_idempotent(method).
+
+    Returns:
+        The result of function.
+    """
+    limiter = LIMITERS[api]
+    record = metrics.CallRecord(method or metrics.method_name(function,api),api,tokens)
+    idempotent = is_idempotent(record.method) if idempotent == None else idempotent
+
+    with metrics.current(record):
+        for attempt in range(max_retries + 1):
+            record.retries = attempt
+            await limiter.acquire_async(tokens)
+            try:
+                result = await function()
+            except Exception as e:
+                if attempt == max_retries or not is_retryable(e,idempotent):
+                    metrics.finish(record,e)
+                    raise
+                if is_rate_limit(e):
+                    limiter.throttled()
+                    record.throttled += 1
+                await asyncio.sleep(backoff(attempt))
+                continue
+
+            limiter.succeeded()
+            metrics.finish(record)
+            return result
+
+def execute(request,tokens = 1,max_retries = MAX_RETRIES):
+    """
+    Executes an API request through the rate limiter of its API, retrying transient errors.
+
+    Requests of NON_IDEMPOTENT_METHODS (e.g. files.create, values.append) are only retried after rate limits.
+
+    Args:
+        request: Not executed API request, e.g. service.files().get(fileId=...).
+        tokens: Number of requests it counts as (e.g. the size of an HTTP batch).
+        max_retries: Retries before the error is raised.
+
+    Returns:
+        The API response.
+    """
+    return call(request.execute,api_of(request),tokens,max_retries)
@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+import threading
+
+class Manifest:
+    """
+    Local record of uploaded files, used by incremental uploads.
+
+    For every local file it keeps its modification time, size, MD5 checksum and the ID
+    of the drive file it was uploaded to. While mtime and size don't change, the stored
+    checksum is reused, so unchanged files aren't read again on the next run.
+
+    Entries are stored as JSON in a single file. Safe to share between the worker
+    threads of a parallel upload.
+
+    Args:
+        path: Path of the manifest JSON file. It's created on the first save if it doesn't exist.
+    """
+    def __init__(self,path):
+        self.path = path
+        self.entries = {}
+        self._lock = threading.Lock()
+        self._changed = False
+
+        if os.path.isfile(path):
+            with open(path, 'r') as f:
+                self.entries = json.load(f)
+
+    def md5(self,file_path):
+        """
+        Returns the MD5 checksum of a local file, hashing it only if it changed since it was recorded.
+
+        Args:
+            file_path: Path of the local file.
+
+        Returns:
+            str: Hexadecimal MD5 checksum (as drive's 'md5Checksum').
+        """
+        key = os.path.abspath(file_path)
+        stat = os.stat(file_path)
+
+        with self._lock:
+            entry = self.entries.get(key)
+        if entry and entry['mtime'] == stat.st_mtime and entry['size'] == stat.st_size:
+            return entry['md5']
+
+        md5 = file_md5(file_path)
+
+        with self._lock:
+            entry = dict(self.entries.get(key, {}))
+            entry.update({'mtime': stat.st_mtime, 'size': stat.st_size, 'md5': md5})
+            self.entries[key] = entry
+            self._changed = True
+
+        return md5
+
+    def record(self,file_path,file_id):
+        """
+        Records a local file as uploaded to the drive file with ID file_id.
+
+        Args:
+            file_path: Path of the local file.
+            file_id: ID of the drive file.
+        """
+        md5 = self.md5(file_path)
+
+        with self._lock:
+            self.entries[os.path.abspath(file_path)]['id'] = file_id
+            self.entries[os.path.abspath(file_path)]['md5'] = md5
+            self._changed = True
+
+    def save(self):
+        """
+        Writes the manifest to disk (atomically, through a temporary file) if it changed.
+        """
+        with self._lock:
+            if not self._changed:
+                return
+            entries = dict(self.entries)
+            self._changed = False
+
+        folder = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(folder, exist_ok=True)
+
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(entries, f)
+        os.replace(tmp_path, self.path)
+
+def file_md5(file_path,chunk_size = 1024 * 1024):
+    """
+    Calculates the MD5 checksum of a local file reading it in chunks.
+
+    Args:
+        file_path: Path of the local file.
+        chunk_size: Bytes read at a time.
+
+    Returns:
+        str: Hexadecimal MD5 checksum.
+    """
+    md5 = hashlib.md5()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            md5.update(chunk)
+
+    return md5.hexdigest()
+
+def is_unchanged(file_path,file_metadata,manifest = None):
+    """
+    Checks whether a local file has the same content as a drive file.
+
+    Sizes are compared first, so the local checksum is only computed for files of the
+    same size. Google native files (docs, sheets...) have no checksum and are never
+    considered unchanged.
+
+    Args:
+        file_path: Path of the local file.
+        file_metadata: Drive metadata of the file, with its 'size' and 'md5Checksum'.
+        manifest: Manifest used to avoid hashing files that didn't change locally. If None, the file is always hashed.
+
+    Returns:
+        bool: True if both files have the same size and MD5 checksum.
+    """
+    remote_md5 = file_metadata.get('md5Checksum')
+    remote_size = file_metadata.get('size')
+
+    if remote_md5 == None or remote_size == None:
+        return False
+
+    if int(remote_size) != os.path.getsize(file_path):
+        return False
+
+    local_md5 = manifest.md5(file_path) if manifest != None else file_md5(file_path)
+
+    return local_md5 == remote_md5
@@ -0,0 +1,320 @@
+from googleapiclient.errors import HttpError
+from googleapiclient.http import BatchHttpRequest, HttpRequest
+import bisect
+import contextlib
+import contextvars
+import logging
+import threading
+import time
+
+# Upper bounds (seconds) of the latency histogram buckets. The last bucket has no bound.
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+LEVELS = {'debug': logging.DEBUG, 'info': logging.INFO, 'warning': logging.WARNING, 'error': logging.ERROR}
+
+LOGGER = None
+HOOKS = []
+
+# CallRecord of the API call being sent by the current asyncio task (see AsyncClient.send)
+_current_record = contextvars.ContextVar('driveup_call_record', default=None)
+
+class CallRecord:
+    """
+    Measurements of one API call, including all of its retries.
+
+    Args:
+        method: Name of the API method, e.g. 'drive.files.create' (resumable transfers add '.chunk').
+        api: 'drive' or 'sheets'.
+        tokens: Number of requests the call counts as (e.g. the size of an HTTP batch).
+
+    Attributes:
+        status: HTTP status of the last response (None if no response was received).
+        latency: Seconds from the first attempt until the call finished, retries and backoff included.
+        retries: Attempts after the first one.
+        throttled: Attempts rejected by the API for exceeding its quota.
+        requests: HTTP requests sent (every attempt, every part of a resumable transfer).
+        bytes_sent: Bytes of the request bodies.
+        bytes_received: Bytes of the response bodies.
+        error: Description of the exception raised by the call (None if it succeeded).
+    """
+    __slots__ = ('method', 'api', 'tokens', 'status', 'latency', 'retries', 'throttled', 'requests', 'bytes_sent', 'bytes_received', 'error', 'started')
+
+    def __init__(self,method,api = 'drive',tokens = 1):
+        self.method = method
+        self.api = api
+        self.tokens = tokens
+        self.status = None
+        self.latency = None
+        self.retries = 0
+        self.throttled = 0
+        self.requests = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.error = None
+        self.started = time.perf_counter()
+
+    def transferred(self,status,bytes_sent,bytes_received):
+        """Adds one HTTP request and response to the call."""
+        self.requests += 1
+        self.status = status
+        self.bytes_sent += bytes_sent
+        self.bytes_received += bytes_received
+
+    def as_dict(self):
+        return {key: getattr(self, key) for key in self.__slots__ if key != 'started'}
+
+class Histogram:
+    """
+    Counts of observed values in fixed buckets, with approximate quantiles.
+
+    Args:
+        buckets: Sorted upper bounds of the buckets.
+    """
+    def __init__(self,buckets = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self,value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self,q):
+        """Upper bound of the bucket where the q quantile (0-1) falls (the maximum for the last bucket)."""
+        if not self.count:
+            return None
+
+        rank = q * self.count
+        seen = 0
+        for i,count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return min(self.buckets[i], self.max) if i < len(self.buckets) else self.max
+
+        return self.max
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 6),
+            'max': round(self.max, 6),
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'p99': self.quantile(0.99),
+            'buckets': {str(bound): count for bound,count in zip(self.buckets + ('inf',), self.counts)},
+        }
+
+class MetricsRegistry:
+    """
+    Counters and latency histograms of the API calls, per API method.
+
+    Every call sent through executor (so every call of Drive and AsyncDrive) is recorded in
+    REGISTRY. To profile an operation, reset the registry, run it and take a snapshot:
+
+        metrics.REGISTRY.reset()
+        drive.upload_folder(path, folder_id)
+        print(metrics.REGISTRY.report())
+
+    Safe to share between threads.
+    """
+    def __init__(self,buckets = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._methods = {}
+        self._lock = threading.Lock()
+
+    def record(self,record):
+        """Adds a finished CallRecord to the counters of its method."""
+        with self._lock:
+            stats = self._methods.get(record.method)
+            if stats == None:
+                stats = self._methods[record.method] = {
+                    'calls': 0, 'errors': 0, 'retries': 0, 'throttled': 0, 'requests': 0,
+                    'bytes_sent': 0, 'bytes_received': 0, 'status': {}, 'latency': Histogram(self.buckets),
+                }
+            stats['calls'] += 1
+            stats['errors'] += record.error != None
+            stats['retries'] += record.retries
+            stats['throttled'] += record.throttled
+            stats['requests'] += record.requests
+            stats['bytes_sent'] += record.bytes_sent
+            stats['bytes_received'] += record.bytes_received
+            stats['status'][record.status] = stats['status'].get(record.status, 0) + 1
+            stats['latency'].observe(record.latency)
+
+    def snapshot(self):
+        """
+        Returns the current counters.
+
+        Returns:
+            dict: {method: {'calls', 'errors', 'retries', 'throttled', 'requests', 'bytes_sent', 'bytes_received', 'status': {status: count}, 'latency': histogram dict}}
+        """
+        with self._lock:
+            return {method: {**stats, 'status': dict(stats['status']), 'latency': stats['latency'].as_dict()} for method,stats in self._methods.items()}
+
+    def reset(self):
+        with self._lock:
+            self._methods = {}
+
+    def report(self):
+        """Returns the counters as a text table, one row per method."""
+        lines = [f"{'method':<40}{'calls':>7}{'errors':>7}{'retries':>8}{'MB sent':>9}{'MB recv':>9}{'p50 s':>8}{'p95 s':>8}{'max s':>8}"]
+        for method,stats in sorted(self.snapshot().items()):
+            latency = stats['latency']
+            lines.append(f"{method:<40}{stats['calls']:>7}{stats['errors']:>7}{stats['retries']:>8}"
+                         f"{stats['bytes_sent'] / 2 ** 20:>9.2f}{stats['bytes_received'] / 2 ** 20:>9.2f}"
+                         f"{latency['p50']:>8.3f}{latency['p95']:>8.3f}{latency['max']:>8.3f}")
+
+        return '\n'.join(lines)
+
+REGISTRY = MetricsRegistry()
+
+def add_hook(hook):
+    """
+    Registers a callable that receives the CallRecord of every finished API call.
+
+    Hooks run in the thread (or event loop) that sent the call, so they should be fast.
+    Exceptions raised by hooks are logged and ignored.
+    """
+    HOOKS.append(hook)
+
+def remove_hook(hook):
+    if hook in HOOKS:
+        HOOKS.remove(hook)
+
+def set_logger(logger):
+    """
+    Sends Driveup's messages to a logging.Logger instead of printing them.
+
+    Messages are logged with their values in the 'fields' attribute of the log record (for
+    structured formatters). The logger also receives every API call at DEBUG level, with
+    the fields of its CallRecord.
+
+    Args:
+        logger: logging.Logger, or None to print the messages again.
+    """
+    global LOGGER
+    LOGGER = logger
+
+def log(message,level = 'info',**fields):
+    """
+    Logs a message of Driveup with the logger set with set_logger, or prints it if there is none.
+
+    Args:
+        message: Text of the message.
+        level: 'debug', 'info', 'warning' or 'error'.
+        fields: Values the message refers to (e.g. file_id, error), for structured logs.
+    """
+    if LOGGER == None:
+        print(message)
+    else:
+        LOGGER.log(LEVELS[level], message, extra={'fields': fields})
+
+def method_name(function,api = 'drive'):
+    """Name of the API method a callable passed to executor.call sends (its methodId for googleapiclient requests)."""
+    target = getattr(function, '__self__', None)
+    name = getattr(function, '__name__', None)
+
+    if isinstance(target, HttpRequest):
+        return target.methodId + '.chunk' if name == 'next_chunk' else target.methodId
+    if _is_media_download(target):
+        return target._request.methodId + '.chunk'
+    if isinstance(target, BatchHttpRequest):
+        return api + '.batch'
+
+    return getattr(function, '__qualname__', None) or repr(function)
+
+def measured(function,record):
+    """
+    Wraps a callable passed to executor.call so the HTTP requests it sends are added to record.
+
+    Only googleapiclient's HttpRequest.execute/next_chunk, BatchHttpRequest.execute and
+    the next_chunk of media downloads (MediaIoBaseDownload or resumable.MediaRangeDownload)
+    can be measured: they are sent through an http object
+    that counts the bytes and keeps the status. Other callables are returned unchanged.
+    """
+    target = getattr(function, '__self__', None)
+    name = getattr(function, '__name__', None)
+
+    if isinstance(target, HttpRequest) and name in ('execute', 'next_chunk'):
+        return lambda: function(http=_MeasuredHttp(target.http, record))
+
+    if isinstance(target, BatchHttpRequest) and name == 'execute':
+        # Same http object execute would take (the one of the first request)
+        http = next((request.http for request in target._requests.values() if request.http != None), None)
+        return lambda: function(http=_MeasuredHttp(http, record)) if http != None else function()
+
+    if _is_media_download(target) and name == 'next_chunk':
+        def download():
+            request = target._request
+            http = request.http
+            request.http = _MeasuredHttp(http, record)
+            try:
+                return function()
+            finally:
+                request.http = http
+        return download
+
+    return function
+
+def _is_media_download(target):
+    """Whether target downloads the media of the HttpRequest in its _request (MediaIoBaseDownload, resumable.MediaRangeDownload)."""
+    return isinstance(getattr(target, '_request', None), HttpRequest)
+
+class _MeasuredHttp:
+    """Http object that adds the requests sent through it to a CallRecord. Everything else is the one of http."""
+    def __init__(self,http,record):
+        self.http = http
+        self.record = record
+
+    def request(self,uri,method = 'GET',*args,**kwargs):
+        resp, content = self.http.request(uri,method,*args,**kwargs)
+
+        body = kwargs.get('body', args[0] if args else None)
+        headers = kwargs.get('headers') or {}
+        # Resumable chunks are streams, their size is only in the headers
+        sent = len(body) if isinstance(body, (bytes, str)) else int(headers.get('Content-Length', headers.get('content-length', 0)))
+        self.record.transferred(resp.status, sent, len(content or b''))
+
+        return resp, content
+
+    def __getattr__(self,name):
+        return getattr(self.http, name)
+
+@contextlib.contextmanager
+def current(record):
+    """Makes record the CallRecord that transferred() adds to, in the current thread or asyncio task."""
+    token = _current_record.set(record)
+    try:
+        yield record
+    finally:
+        _current_record.reset(token)
+
+def transferred(status,bytes_sent,bytes_received):
+    """Adds an HTTP request and response to the CallRecord set with current (if any)."""
+    record = _current_record.get()
+    if record != None:
+        record.transferred(status, bytes_sent, bytes_received)
+
+def finish(record,error = None):
+    """Records a finished API call in REGISTRY, runs the hooks and logs the call at DEBUG level."""
+    record.latency = time.perf_counter() - record.started
+    if error != None:
+        record.error = f'{type(error).__name__}: {error}'
+        if isinstance(error, HttpError):
+            record.status = error.resp.status
+
+    REGISTRY.record(record)
+
+    for hook in list(HOOKS):
+        try:
+            hook(record)
+        except Exception as e:
+            log(f"Error in metrics hook {hook!r}: {e}", 'warning', hook=repr(hook), error=str(e))
+
+    logger = LOGGER
+    if logger != None and logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"{record.method} {record.status} {record.latency:.3f}s", extra={'fields': record.as_dict()})
@@ -0,0 +1,219 @@
+from googleapiclient.errors import HttpError
+from googleapiclient.http import MediaDownloadProgress
+from Driveup.features import executor
+import json
+import os
+import threading
+
+# Chunks must be multiples of 256 KB (except the last one)
+CHUNK_SIZE_UNIT = 256 * 1024
+DEFAULT_CHUNK_SIZE = 40 * CHUNK_SIZE_UNIT # 10 MB
+
+class SessionStore:
+    """
+    Local record of unfinished resumable upload sessions.
+
+    Every entry keeps the session URI given by drive and the last byte offset committed
+    by the server, so a new process can continue the same upload instead of starting it
+    over. Entries are stored as JSON in a single file that is rewritten (atomically)
+    every time a chunk is committed. Safe to share between threads.
+
+    Args:
+        path: Path of the sessions JSON file. It's created on the first save if it doesn't exist.
+    """
+    def __init__(self,path):
+        self.path = path
+        self.sessions = {}
+        self._lock = threading.Lock()
+
+        if os.path.isfile(path):
+            with open(path, 'r') as f:
+                self.sessions = json.load(f)
+
+    def get(self,key):
+        with self._lock:
+            return self.sessions.get(key)
+
+    def set(self,key,uri,offset):
+        with self._lock:
+            self.sessions[key] = {'uri': uri, 'offset': offset}
+            self._save()
+
+    def remove(self,key):
+        with self._lock:
+            if self.sessions.pop(key, None) != None:
+                self._save()
+
+    def _save(self):
+        folder = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(folder, exist_ok=True)
+
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.sessions, f)
+        os.replace(tmp_path, self.path)
+
+def session_key(file_path,target):
+    """
+    Builds the key of an upload session.
+
+    The key changes whenever the local file is modified, so a session is never
+    resumed with different content than the one it was started with.
+
+    Args:
+        file_path: Path of the local file being uploaded.
+        target: Description of the destination, e.g. 'update:<file_id>' or 'create:<folder_id>/<name>'.
+
+    Returns:
+        str: The session key.
+    """
+    stat = os.stat(file_path)
+
+    return f"{os.path.abspath(file_path)}|{stat.st_size}|{stat.st_mtime_ns}|{target}"
+
+def query_session(request):
+    """
+    Asks drive for the bytes committed to the resumable session of request.
+
+    Sends the empty PUT of the resumable upload protocol (Content-Range: bytes */size) to
+    request.resumable_uri and moves request.resumable_progress to the committed offset.
+
+    Args:
+        request: API request with a resumable media body and its resumable_uri set.
+
+    Returns:
+        response: The API response if the upload already finished, otherwise None.
+
+    Raises:
+        HttpError: If the session can't be queried (404 or 410 once it expired).
+    """
+    headers = {'Content-Range': f'bytes */{request.resumable.size()}', 'Content-Length': '0'}
+    resp, content = request.http.request(request.resumable_uri, 'PUT', headers=headers)
+
+    if resp.status in (200, 201):
+        return request.postproc(resp, content)
+    if resp.status != 308:
+        raise HttpError(resp, content, uri=request.resumable_uri)
+
+    # 'Range: bytes=0-<last committed byte>', missing when nothing was committed
+    committed_range = resp.get('range')
+    request.resumable_progress = int(committed_range.split('-')[1]) + 1 if committed_range else 0
+
+    return None
+
+class MediaRangeDownload:
+    """
+    Downloads the media of a request in chunks of Range requests, starting at any byte.
+
+    Same next_chunk contract as googleapiclient's MediaIoBaseDownload, whose chunks always
+    start at byte 0. If the server ignores the Range header and answers the whole file,
+    fd is rewritten from its start.
+
+    Args:
+        fd: File object the chunks are written to, positioned at offset.
+        request: Not executed media request, e.g. files().get_media(fileId=file_id).
+        chunksize: Bytes asked per request.
+        offset: Byte the download starts at (bytes before it are already in fd).
+    """
+    def __init__(self,fd,request,chunksize = DEFAULT_CHUNK_SIZE,offset = 0):
+        self._fd = fd
+        self._request = request
+        self._chunksize = chunksize
+        self.progress = offset
+        self.total_size = None
+
+    def next_chunk(self):
+        """
+        Downloads the next chunk.
+
+        Returns:
+            tuple: (MediaDownloadProgress, done).
+
+        Raises:
+            HttpError: If the response isn't a 2xx (or a 416 for an empty file).
+        """
+        request = self._request
+        headers = {key: value for key,value in request.headers.items() if key.lower() not in ('accept', 'accept-encoding', 'user-agent')}
+        headers['range'] = f'bytes={self.progress}-{self.progress + self._chunksize - 1}'
+
+        resp, content = request.http.request(request.uri, 'GET', headers=headers)
+
+        if resp.status == 416 and resp.get('content-range', '').endswith('/0'):
+            # Range not satisfiable: empty file
+            self.total_size = 0
+            return MediaDownloadProgress(self.progress, self.total_size), True
+        if resp.status not in (200, 206):
+            raise HttpError(resp, content, uri=request.uri)
+
+        if resp.status == 200 and self.progress:
+            # Whole file instead of the range
+            self._fd.seek(0)
+            self._fd.truncate()
+            self.progress = 0
+
+        self._fd.write(content)
+        self.progress += len(content)
+
+        if 'content-range' in resp:
+            self.total_size = int(resp['content-range'].rsplit('/', 1)[1])
+        elif 'content-length' in resp:
+            self.total_size = int(resp['content-length'])
+
+        done = self.total_size == None or self.progress >= self.total_size
+        return MediaDownloadProgress(self.progress, self.total_size), done
+
+def upload_chunks(request,pbar = None,session_store = None,key = None):
+    """
+    Executes a resumable upload request chunk by chunk.
+
+    If session_store contains a session for key, the upload continues from the last byte
+    committed by the server (asked with query_session before sending anything). Otherwise a new
+    session is started and stored after every committed chunk. The session is removed when
+    the upload finishes.
+
+    Args:
+        request: Not executed API request with a resumable media body, e.g. files().create(..., media_body=MediaFileUpload(..., resumable=True)).
+        pbar: tqdm progress bar (with the file size as total) updated with the committed bytes.
+        session_store: SessionStore where the session is persisted. If None, sessions are kept in memory only.
+        key: Key of the session in session_store (see session_key).
+
+    Returns:
+        response: The API response of the finished upload.
+    """
+    saved_session = session_store.get(key) if session_store != None else None
+
+    response = None
+    if saved_session:
+        request.resumable_uri = saved_session['uri']
+        try:
+            response = executor.call(lambda: query_session(request),'drive',method=request.methodId + '.status')
+        except HttpError as e:
+            if e.resp.status not in (404, 410):
+                raise
+            # Expired session, start over
+            session_store.remove(key)
+            request.resumable_uri = None
+            request.resumable_progress = 0
+
+    committed = request.resumable_progress
+    if pbar is not None and committed:
+        pbar.update(committed)
+
+    while response == None:
+        status, response = executor.call(request.next_chunk,'drive')
+
+        if response == None:
+            if session_store != None:
+                session_store.set(key,request.resumable_uri,request.resumable_progress)
+            progress = request.resumable_progress
+        else:
+            progress = request.resumable.size() or committed
+
+        if pbar is not None:
+            pbar.update(progress - committed)
+        committed = progress
+
+    if session_store != None:
+        session_store.remove(key)
+
+    return response
@@ -1,7 +1,7 @@
-from Driveup.features import utils
-from tqdm import tqdm
-import io
-from googleapiclient.http import MediaIoBaseDownload
+from Driveup.features import utils,manifest,resumable,executor,metrics
+import os
+import threading
+import time
 
 # def find_duplicate(list,name = None,file_id = None):
 #     if name == None and file_id == None:
@@ -24,28 +24,80 @@ from googleapiclient.http import MediaIoBaseDownload
             
 #         return condition
 
-def find_duplicate(file_metadata,service):
+# Per-file fields requested by folder listings that feed downloads and change detection
+LISTING_FIELDS = 'id, name, mimeType, size, md5Checksum, modifiedTime'
 
-    files_list = list_files(file_metadata['parents'],service)
+# Fields of a file's metadata sent in files.create bodies (listings also carry read-only ones like size)
+CREATE_FIELDS = ('id', 'name', 'parents', 'mimeType')
 
-    files_by_id = {file['id']: file for file in files_list}
-    files_by_name = {file['name']: file for file in files_list}
+class FolderIndex:
+    """
+    In-memory listing of a drive folder, indexed by file id and by file name.
+
+    Built from a single files.list call and updated in place every time a file is created
+    in the folder, so repeated duplicate checks on the same folder don't need new listings.
+    Safe to share between the worker threads of a parallel upload.
+
+    Args:
+        files_list: Files of the folder, as returned by list_files.
+    """
+    def __init__(self,files_list=()):
+        self.files_by_id = {}
+        self.files_by_name = {}
+        self._lock = threading.Lock()
+
+        for file in files_list:
+            self.add(file)
+
+    def add(self,file):
+        """
+        Adds (or replaces) a file of the folder. Same-named files keep the last one added.
+
+        Args:
+            file: Drive file metadata, it must contain at least 'id' and 'name'.
+        """
+        with self._lock:
+            self.files_by_id[file['id']] = file
+            self.files_by_name[file['name']] = file
+
+    def get(self,file_id = None,name = None):
+        """
+        Looks a file up by id first and then by name.
+
+        Returns:
+            file: The file metadata or None if there isn't a match.
+        """
+        with self._lock:
+            target_file = self.files_by_id.get(file_id) if file_id else None
+            if target_file == None and name != None:
+                target_file = self.files_by_name.get(name)
+
+        return target_file
+
+def find_duplicate(file_metadata,service,folder_index = None):
+    """
+    Searches the parent folder for the file described by file_metadata (by id first and then by name).
+
+    Args:
+        file_metadata: Metadata of the file, with its 'name', 'parents' and optionally 'id'.
+        service: The Google Drive service.
+        folder_index: FolderIndex of the parent folder. If None, the folder is listed through the API.
+
+    Returns:
+        tuple: Whether the file exists and the metadata updated with the existing file's one.
+    """
+    if folder_index == None:
+        parent_id = file_metadata['parents']
+        parent_id = parent_id[0] if isinstance(parent_id, list) else parent_id
+        folder_index = FolderIndex(list_files(parent_id,service,fields=LISTING_FIELDS))
 
-    target_file = file_metadata.get('id',False)
-    target_file = files_by_id.get(file_metadata['id']) if target_file else target_file
+    target_file = folder_index.get(file_id=file_metadata.get('id'),name=file_metadata['name'])
 
-    # Search first by id if it exists
     if target_file:
         file_metadata.update(target_file)
         return True,file_metadata
-    # Search then by name
     else:
-        target_file = files_by_name.get(file_metadata['name'])
-        if target_file:
-            file_metadata.update(target_file)
-            return True,file_metadata
-        else:
-            return False,file_metadata
+        return False,file_metadata
 
 
 # def get_update(name,file_id,folder_id,service,mode):
@@ -84,38 +136,142 @@ def find_duplicate(file_metadata,service):
 
 #     return file_metadata
     
-def list_files(folder_id,service):
+def _list_request(folder_id,service,fields,page_size,page_token = None):
+    return service.files().list(q=f"'{folder_id}' in parents and trashed = false", fields=f"nextPageToken, files({fields})",pageSize=page_size,pageToken=page_token,supportsAllDrives=True)
+
+def iter_files(folder_id,service,fields = 'id, name',page_size = 1000,page_token = None):
+    """
+    Lazily yields all files in the specified folder, following every result page.
+
+    Pages are requested only when the previous one has been consumed, so callers can
+    start working on the first files before the whole folder has been listed.
+
+    Args:
+        folder_id: The ID of the folder.
+        service: The Google Drive service.
+        fields: Field mask applied to each file, e.g. 'id, name, mimeType'.
+        page_size: Files requested per page (1000 is the maximum allowed by the API).
+        page_token: Token of the page to start from. If None, listing starts from the first page.
+
+    Yields:
+        file: The metadata of each file, restricted to the requested fields.
+    """
+    while True:
+        results = executor.execute(_list_request(folder_id,service,fields,page_size,page_token))
+
+        yield from results.get('files', [])
+
+        page_token = results.get('nextPageToken')
+        if not page_token:
+            break
+
+def list_files(folder_id,service,fields = 'id, name'):
     """
     Lists all files in the specified folder.
 
     Args:
         folder_id: The ID of the folder.
         service: The Google Drive service.
+        fields: Field mask applied to each file, e.g. 'id, name, mimeType'.
 
     Returns:
         files: A list of files.
     """
-    results = service.files().list(q=f"'{folder_id}' in parents and trashed = false", fields="nextPageToken, files(id, name)",supportsAllDrives=True).execute()  
-    files = results.get('files', [])
+    files = list(iter_files(folder_id,service,fields=fields))
         
     return files
 
+def list_folders(folder_ids,service,fields = 'id, name',page_size = 1000):
+    """
+    Lists several folders at once.
+
+    First pages of all folders are requested together through HTTP batches, only folders
+    with more than one page need additional (sequential) requests.
+
+    Args:
+        folder_ids: IDs of the folders.
+        service: The Google Drive service.
+        fields: Field mask applied to each file, e.g. 'id, name, mimeType'.
+        page_size: Files requested per page (1000 is the maximum allowed by the API).
+
+    Returns:
+        listings: Dictionary mapping every folder ID to its list of files.
+    """
+    folder_ids = list(folder_ids)
+    requests = [_list_request(folder_id,service,fields,page_size) for folder_id in folder_ids]
+
+    listings = {}
+    for folder_id,(results,exception) in zip(folder_ids,batch_execute(requests,service)):
+        if exception != None:
+            raise exception
+
+        files = results.get('files', [])
+        if results.get('nextPageToken'):
+            files.extend(iter_files(folder_id,service,fields=fields,page_size=page_size,page_token=results['nextPageToken']))
+        listings[folder_id] = files
+
+    return listings
+
+def batch_execute(requests,service,batch_size = 100,max_retries = executor.MAX_RETRIES):
+    """
+    Executes API requests grouped in HTTP batches.
+
+    Intended for small metadata calls (files.get, folder creation, parents updates...), wich
+    would otherwise cost a full round trip each. Media uploads and downloads can't be batched.
+    Every batch takes as many tokens of the rate limiter as requests it contains, and requests
+    of a batch that fail with a transient error (rate limits, server errors) are sent again in
+    a new batch after a backoff. Non idempotent requests (e.g. files.create) are only sent
+    again after rate limits (see executor.is_retryable).
+
+    Args:
+        requests: List of API requests (not executed), e.g. service.files().get(fileId=...).
+        service: The Google Drive service.
+        batch_size: Maximum number of requests per HTTP batch (100 is the limit of Drive API).
+        max_retries: Retries of each failed request before its error is returned.
+
+    Returns:
+        results: List of (response, exception) tuples in the same order as requests. Exception is None for successful calls.
+    """
+    results = [None] * len(requests)
+
+    def callback(request_id,response,exception):
+        results[int(request_id)] = (response,exception)
+
+    pending = list(range(len(requests)))
+    for attempt in range(max_retries + 1):
+        for start in range(0,len(pending),batch_size):
+            batch_ids = pending[start:start + batch_size]
+            batch = service.new_batch_http_request(callback=callback)
+            for i in batch_ids:
+                batch.add(requests[i],request_id=str(i))
+            idempotent = all(executor.is_idempotent(requests[i].methodId) for i in batch_ids)
+            executor.call(batch.execute,executor.api_of(requests[batch_ids[0]]),tokens=len(batch_ids),idempotent=idempotent)
+
+        failed = [i for i in pending if results[i][1] != None and executor.is_retryable(results[i][1],executor.is_idempotent(requests[i].methodId))]
+        if not failed or attempt == max_retries:
+            break
+
+        if any(executor.is_rate_limit(results[i][1]) for i in failed):
+            executor.LIMITERS[executor.api_of(requests[failed[0]])].throttled()
+        time.sleep(executor.backoff(attempt))
+        pending = failed
+
+    return results
+
 def files_counter_drive(folder_id,service,count = None):
     count = 0 if count == None else count
 
-    files_list = list_files(folder_id,service)
+    files_list = list_files(folder_id,service,fields='id, mimeType')
 
     for file in files_list:
-        file_metadata = get_full_metadata(file['id'],service)
-
-        if file_metadata['mimeType'] == 'application/vnd.google-apps.folder':
-            count += files_counter_drive(file_metadata['id'], service, count)
+        if file['mimeType'] == 'application/vnd.google-apps.folder':
+            count += files_counter_drive(file['id'], service)
         else:
             count += 1
     
     return count
 
-def get_full_metadata(file_id,service):
+def get_full_metadata(file_id,service,fields = None):
     """
     Retrieves complete metadata of a drive file by it's id.
 
@@ -124,15 +280,16 @@ def get_full_metadata(file_id,service):
     Args:
         file_id: The drive file ID.
         service: The Google Drive service.
+        fields: Field mask of the response, e.g. 'id, name, mimeType'. If None, API's default fields are returned.
 
     Returns:
         file_metadata: The file metadata.
     """
-    file_metadata = service.files().get(fileId=file_id,supportsAllDrives=True).execute()
+    file_metadata = executor.execute(service.files().get(fileId=file_id,fields=fields,supportsAllDrives=True))
     
     return file_metadata
             
-def create_subfolder(subfolder_name,subfolder_id,parent_folder_id,update,service,mode):
+def create_subfolder(subfolder_name,subfolder_id,parent_folder_id,update,service,mode,folder_index=None):
     """
     Creates a subfolder in the specified folder.
 
@@ -146,6 +303,7 @@ def create_subfolder(subfolder_name,subfolder_id,parent_folder_id,update,service
         update: A boolean value indicating whether to update an existing subfolder.
         service: The Google Drive service.
         mode: The mode (client / service).
+        folder_index: FolderIndex of the parent folder. It's used for the duplicate check and updated with the created subfolder.
 
     Returns:
         subfolder_id: The ID of the subfolder.
@@ -166,21 +324,23 @@ def create_subfolder(subfolder_name,subfolder_id,parent_folder_id,update,service
     # subfolder_metadata = {'name': subfolder_name, 'mimeType': 'application/vnd.google-apps.folder', 'parents': [parent_folder_id]}
 
     if update == True:
-        duplicate_check, subfolder_metadata = find_duplicate(subfolder_metadata,service)
+        duplicate_check, subfolder_metadata = find_duplicate(subfolder_metadata,service,folder_index)
     else:
         duplicate_check = False
         subfolder_metadata.pop('id',None)
 
     if duplicate_check == False:
         subfolder_metadata['parents'] = [subfolder_metadata['parents']]
-        subfolder_new_metadata = service.files().create(body=subfolder_metadata, fields='id',supportsAllDrives=True).execute()
+        subfolder_new_metadata = executor.execute(service.files().create(body=subfolder_metadata, fields='id',supportsAllDrives=True))
         subfolder_metadata.update(subfolder_new_metadata)
         if mode == 'service':
             old_parents = subfolder_metadata.get('parents')
             file_id = subfolder_metadata.get('id')
 
-            subfolder_metadata = service.files().update(fileId=file_id,removeParents=old_parents,addParents=old_parents,supportsAllDrives=True).execute()
-    print(subfolder_metadata)
+            subfolder_metadata = executor.execute(service.files().update(fileId=file_id,removeParents=old_parents,addParents=old_parents,supportsAllDrives=True))
+        if folder_index != None:
+            folder_index.add({'id': subfolder_metadata['id'], 'name': subfolder_name, 'mimeType': 'application/vnd.google-apps.folder'})
+    metrics.log(subfolder_metadata, 'debug')
     return subfolder_metadata['id']
 
     # if subfolder == None:
@@ -190,33 +350,56 @@ def create_subfolder(subfolder_name,subfolder_id,parent_folder_id,update,service
 
     # return subfolder['id']
     
-def drive_download(id,path,service ,mode):
+def drive_download(id,path,service ,mode,progress = True,chunk_size = resumable.DEFAULT_CHUNK_SIZE,file_metadata = None):
+    """
+    Downloads the content of a drive file to a local path, chunk by chunk.
 
-    # Unable to get real size of the file (without duplicating API calls)
-    size = 0
+    Content is written to '<path>.part' and renamed to path when it's complete. Binary
+    files resume an existing '.part' file with an HTTP Range request instead of starting
+    over; when drive provides a checksum, the finished file is verified and downloaded
+    again from scratch if it doesn't match (e.g. a stale '.part' of an older version).
 
-    pbar = tqdm(total = 100)
+    Args:
+        id: The drive file ID.
+        path: Local path of the downloaded file.
+        service: The Google Drive service.
+        mode: 'binary' for regular files, or the export mimeType for Google native files.
+        progress: If set to True, a progress bar with the downloaded bytes is shown.
+        chunk_size: Bytes requested per HTTP request.
+        file_metadata: Drive metadata of the file. Its 'size' and 'md5Checksum' (if present) are used for progress and verification.
+    """
+    from tqdm import tqdm
+
+    file_metadata = file_metadata if file_metadata != None else {}
+    size = int(file_metadata['size']) if file_metadata.get('size') != None else None
+    part_path = path + '.part'
 
     if mode == 'binary':
-        pbar.update(10)
         request = service.files().get_media(fileId=id)
-        pbar.update(20)
-        fh = io.FileIO(path, 'wb')
+        offset = os.path.getsize(part_path) if os.path.isfile(part_path) else 0
+        if size == None or offset > size:
+            offset = 0
+    else:
+        # Exports are generated on the fly, they can't be resumed
+        request = service.files().export_media(fileId=id, mimeType=mode)
+        offset = 0
 
-        downloader = MediaIoBaseDownload(fh, request)
+    pbar = tqdm(total=size, initial=offset, unit='B', unit_scale=True, disable=not progress)
 
-        done = False
-        while not done:
-            status, done = downloader.next_chunk()
-        pbar.update(70)
+    with open(part_path, 'ab' if offset else 'wb') as fh:
+        if size == None or offset < size:
+            # Continues after the bytes already on disk
+            downloader = resumable.MediaRangeDownload(fh, request, chunksize=chunk_size, offset=offset)
 
-    else:
-        pbar.update(10)
-        request = service.files().export_media(fileId=id, mimeType=mode)
-        pbar.update(20)
-        response = request.execute()
-        pbar.update(10)
+            done = False
+            while not done:
+                status, done = executor.call(downloader.next_chunk,'drive')
+                pbar.update(status.resumable_progress - pbar.n)
+
+    pbar.close()
+
+    if offset and file_metadata.get('md5Checksum') and manifest.file_md5(part_path) != file_metadata['md5Checksum']:
+        os.remove(part_path)
+        return drive_download(id,path,service,mode,progress=progress,chunk_size=chunk_size,file_metadata=file_metadata)
 
-        with open(path, 'wb') as f:
-            f.write(response)
-        pbar.update(60)
\ No newline at end of file
+    os.replace(part_path, path)
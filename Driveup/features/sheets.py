@@ -0,0 +1,510 @@
+from concurrent.futures import ThreadPoolExecutor
+import json
+import re
+
+# numpy and pandas are imported inside the functions that use them, so importing Driveup
+# doesn't load them until a DataFrame method is called
+
+# Recommended maximum size of a Sheets API request body
+MAX_PAYLOAD_BYTES = 2 * 1024 * 1024
+
+# Rows serialized to estimate the JSON size of a range (see estimate_size)
+SIZE_SAMPLE_ROWS = 64
+
+# Text keys read as numbers. Numbers with leading zeros (e.g. '007') are kept as text
+NUMBER_PATTERN = re.compile(r'-?(0|[1-9]\d*)(\.\d+)?([eE][-+]?\d+)?')
+
+# Text inferred as dates: day, month and year separated by '-', '/' or '.', optionally followed by a time
+DATE_PATTERN = re.compile(r'\d{1,4}[-/.]\d{1,2}[-/.]\d{1,4}([ T]\d{1,2}:\d\d(:\d\d(\.\d+)?)?( ?[AaPp][Mm])?)?')
+
+# Formatted booleans (true values at even positions)
+BOOLEAN_STRINGS = ['TRUE', 'FALSE', 'True', 'False', 'true', 'false']
+
+def pack_ranges(ranges,max_payload_bytes = MAX_PAYLOAD_BYTES):
+    """
+    Groups value ranges into values.batchUpdate payloads.
+
+    Ranges are added to the current payload until its (estimated JSON) size would exceed
+    max_payload_bytes. A single range bigger than the limit is sent on its own.
+
+    Args:
+        ranges: Iterable of (a1_range, values) tuples, where values is a list of rows.
+        max_payload_bytes: Maximum size of each payload in bytes.
+
+    Yields:
+        data: List of {'range', 'values'} dictionaries, ready to be used as the 'data' of a values.batchUpdate body.
+    """
+    data = []
+    data_size = 0
+
+    for a1_range,values in ranges:
+        range_size = estimate_size(values) + len(a1_range) + 32
+
+        if data and data_size + range_size > max_payload_bytes:
+            yield data
+            data = []
+            data_size = 0
+
+        data.append({'range': a1_range, 'values': values})
+        data_size += range_size
+
+    if data:
+        yield data
+
+def estimate_size(values,sample_rows = SIZE_SAMPLE_ROWS):
+    """
+    Estimates the JSON size of a list of rows without serializing all of them.
+
+    Up to sample_rows rows, evenly spread over the list, are serialized and their size is
+    scaled to the whole list. Lists with fewer rows are measured exactly.
+
+    Args:
+        values: List of rows (lists of JSON-safe values).
+        sample_rows: Number of rows serialized.
+
+    Returns:
+        int: Estimated size in bytes.
+    """
+    if len(values) <= sample_rows:
+        return len(json.dumps(values))
+
+    sample = values[::len(values) // sample_rows]
+    # Separators between rows are ', ' (2 bytes)
+    return round((len(json.dumps(sample)) - 2) * len(values) / len(sample)) + 2
+
+def pipelined(iterable):
+    """
+    Iterates one step ahead in a background thread.
+
+    While the caller works on an item (e.g. executing an API request), the next one is
+    already being produced (e.g. serializing the next chunk of data).
+
+    Args:
+        iterable: Any iterable. It must not yield None.
+
+    Yields:
+        The items of iterable, in order.
+    """
+    iterator = iter(iterable)
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        future = executor.submit(next,iterator,None)
+        while True:
+            item = future.result()
+            if item is None:
+                break
+            future = executor.submit(next,iterator,None)
+            yield item
+
+def serialize_column(column,unformat = False):
+    """
+    Converts a column to JSON-safe python values, vectorized by dtype.
+
+    - Missing values (NaN, NaT, None, pd.NA) become '' ('NULL' with unformat).
+    - Datetimes become 'YYYY-MM-DD HH:MM:SS' strings, timedeltas their string form.
+    - Numpy scalars become python int / float / bool.
+    - Categoricals are serialized once per category and mapped through their codes.
+
+    Args:
+        column: pandas Series.
+        unformat: If True, every value is converted to string (as str() does, dates of columns without times as 'YYYY-MM-DD') and missing values to 'NULL'.
+
+    Returns:
+        list: The serialized values.
+    """
+    import numpy as np
+    import pandas as pd
+
+    null_value = 'NULL' if unformat else ''
+    dtype = column.dtype
+
+    if isinstance(dtype, pd.CategoricalDtype):
+        categories = np.array(serialize_column(pd.Series(dtype.categories),unformat) + [null_value], dtype=object)
+        # Code -1 (missing value) points to the last element
+        return categories[column.cat.codes.to_numpy()].tolist()
+
+    mask = column.isna().to_numpy()
+
+    if unformat and pd.api.types.is_datetime64_any_dtype(dtype):
+        # Formatted as a column (like DataFrame.astype(str)): 'YYYY-MM-DD' when every time is midnight
+        values = column.astype(str).to_numpy(dtype=object)
+    elif unformat:
+        values = column.to_numpy(dtype=object).astype(str).astype(object)
+    elif pd.api.types.is_datetime64_any_dtype(dtype):
+        values = column.dt.strftime('%Y-%m-%d %H:%M:%S').to_numpy(dtype=object)
+    elif pd.api.types.is_timedelta64_dtype(dtype):
+        values = column.astype(str).to_numpy(dtype=object)
+    elif pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_numeric_dtype(dtype):
+        # Casting to object turns numpy scalars into python ones
+        values = column.to_numpy(dtype=object, na_value=null_value)
+    else:
+        values = column.to_numpy(dtype=object, copy=True)
+        if pd.api.types.infer_dtype(values, skipna=True) not in ('string', 'empty'):
+            values = np.array([_to_json_value(value) for value in values], dtype=object)
+
+    if mask.any():
+        values[mask] = null_value
+
+    return values.tolist()
+
+def _to_json_value(value):
+    import numpy as np
+    import pandas as pd
+
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (pd.Timestamp, np.datetime64)):
+        return pd.Timestamp(value).strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    return str(value)
+
+def serialize_headers(df,unformat = False):
+    """
+    Returns the column names of a DataFrame as a JSON-safe list.
+    """
+    if unformat:
+        return [str(column) for column in df.columns]
+
+    return [_to_json_value(column) for column in df.columns]
+
+def iter_rows(df,chunk_size,unformat = False):
+    """
+    Lazily serializes a DataFrame, one chunk of rows at a time.
+
+    Columns of each chunk are converted with serialize_column and then zipped into rows,
+    so memory only holds (python) values of the current chunk instead of full copies of
+    the whole DataFrame.
+
+    Args:
+        df: pandas DataFrame.
+        chunk_size: Rows per chunk.
+        unformat: If True, values are converted to string and missing values to 'NULL'.
+
+    Yields:
+        rows: List of rows (lists of JSON-safe values) of the chunk.
+    """
+    for start in range(0, len(df), chunk_size):
+        chunk = df.iloc[start:start + chunk_size]
+        columns = [serialize_column(chunk.iloc[:, i],unformat) for i in range(chunk.shape[1])]
+        yield [list(row) for row in zip(*columns)]
+
+def serial_numbers(column):
+    """
+    Converts a datetime column to spreadsheet date serial numbers (days since 1899-12-30).
+
+    Dates written by serialize_column are read back as these numbers with
+    dateTimeRenderOption='SERIAL_NUMBER'. Times are truncated to seconds and timezones
+    dropped, as serialize_column writes them. Missing values stay missing.
+
+    Args:
+        column: pandas Series with a datetime dtype.
+
+    Returns:
+        pandas.Series: float serial numbers.
+    """
+    import pandas as pd
+
+    if column.dt.tz is not None:
+        column = column.dt.tz_localize(None)
+
+    return (column.dt.floor('s') - pd.Timestamp('1899-12-30')) / pd.Timedelta(days=1)
+
+def with_serial_dates(df):
+    """
+    Returns df with its datetime columns converted to serial numbers (see serial_numbers),
+    to compare it with sheet values read with dateTimeRenderOption='SERIAL_NUMBER'.
+    df itself is returned if it has no datetime columns.
+    """
+    import pandas as pd
+
+    positions = [i for i,dtype in enumerate(df.dtypes) if pd.api.types.is_datetime64_any_dtype(dtype)]
+    if not positions:
+        return df
+
+    frame = pd.concat([serial_numbers(df.iloc[:, i]) if i in positions else df.iloc[:, i] for i in range(df.shape[1])], axis=1, keys=range(df.shape[1]))
+    frame.columns = df.columns
+    return frame
+
+def changed_cells(old_values,new_values):
+    """
+    Compares two grids of sheet values cell by cell, vectorized.
+
+    Grids are padded to the extent of the largest one, so cells only present in one of them
+    are compared against empty cells. Missing values and '' are equal, and numbers are compared
+    by value (e.g. 1, 1.0 and '1' are equal, as written with 'USER_ENTERED') up to a relative
+    difference of 1e-12 (below the 15 digits sheets keep, e.g. serial numbers of dates).
+
+    Args:
+        old_values: Current values of the sheet, as returned by values.get (list of rows, rows may be shorter).
+        new_values: New values (list of rows).
+
+    Returns:
+        numpy.ndarray: Boolean matrix, True for every cell whose value changed.
+    """
+    import numpy as np
+    import pandas as pd
+
+    num_rows = max(len(old_values), len(new_values))
+    num_cols = max([len(row) for row in old_values] + [len(row) for row in new_values] + [0])
+
+    old_frame = pd.DataFrame(old_values).reindex(index=range(num_rows), columns=range(num_cols))
+    new_frame = pd.DataFrame(new_values).reindex(index=range(num_rows), columns=range(num_cols))
+
+    old_strings = old_frame.fillna('').astype(str)
+    new_strings = new_frame.fillna('').astype(str)
+    equal = (old_strings.to_numpy() == new_strings.to_numpy())
+
+    old_numbers = old_frame.apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+    new_numbers = new_frame.apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+    # Booleans are numeric for pandas but not for sheets (1 != TRUE)
+    booleans = old_strings.isin(['True', 'False']).to_numpy() | new_strings.isin(['True', 'False']).to_numpy()
+    equal |= np.isclose(old_numbers, new_numbers, rtol=1e-12, atol=0) & ~booleans
+
+    return ~equal
+
+def changed_rectangles(mask):
+    """
+    Covers the True cells of a boolean matrix with rectangles.
+
+    Every row is split into runs of consecutive changed cells, and consecutive rows with the
+    same runs are merged into a single rectangle.
+
+    Args:
+        mask: Boolean matrix (e.g. from changed_cells).
+
+    Returns:
+        list: (top, left, bottom, right) tuples, 0-indexed with bottom and right excluded.
+    """
+    import numpy as np
+
+    rectangles = []
+    open_runs = {} # (left, right) -> top of the rectangle still growing
+    previous_row = -1
+
+    padded = np.zeros((mask.shape[0], mask.shape[1] + 2), dtype=np.int8)
+    padded[:, 1:-1] = mask
+    edges = np.diff(padded, axis=1)
+
+    for row in np.flatnonzero(mask.any(axis=1)):
+        starts = np.flatnonzero(edges[row] == 1)
+        ends = np.flatnonzero(edges[row] == -1)
+        runs = set(zip(starts.tolist(), ends.tolist()))
+
+        if row != previous_row + 1:
+            runs_to_close = set(open_runs)
+        else:
+            runs_to_close = set(open_runs) - runs
+        for left,right in runs_to_close:
+            rectangles.append((open_runs.pop((left,right)), left, previous_row + 1, right))
+
+        for run in runs:
+            open_runs.setdefault(run, row)
+        previous_row = row
+
+    for (left,right),top in open_runs.items():
+        rectangles.append((top, left, previous_row + 1, right))
+
+    return sorted(rectangles)
+
+def normalize_keys(values):
+    """
+    Converts key values to comparable strings.
+
+    Numbers are compared by value (1, 1.0 and '1' give the key '1') and missing values become ''.
+    Integers keep all their digits (no float rounding above 2**53) and text with leading zeros
+    (e.g. '007') stays text, so it doesn't match the number 7.
+
+    Args:
+        values: Iterable of key values (from a DataFrame column or read from a sheet).
+
+    Returns:
+        pandas.Series: The normalized keys.
+    """
+    import pandas as pd
+
+    return pd.Series([_normalize_key(value) for value in values], dtype=object)
+
+def _normalize_key(value):
+    import numpy as np
+    import pandas as pd
+
+    if isinstance(value, np.generic):
+        value = value.item()
+    if value is None or (pd.api.types.is_scalar(value) and pd.isna(value)):
+        return ''
+    if isinstance(value, bool):
+        return str(value)
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, float):
+        return str(int(value)) if value.is_integer() else repr(value)
+
+    value = str(value)
+    match = NUMBER_PATTERN.fullmatch(value)
+    if match:
+        return str(int(value)) if match.group(2) == None and match.group(3) == None else _normalize_key(float(value))
+
+    return value
+
+def contiguous_blocks(positions):
+    """
+    Splits sorted integer positions into blocks of consecutive values.
+
+    Args:
+        positions: Sorted list of integers.
+
+    Returns:
+        list: (start, stop) tuples, with stop excluded, e.g. [1, 2, 3, 7] -> [(1, 4), (7, 8)].
+    """
+    blocks = []
+    for position in positions:
+        if blocks and blocks[-1][1] == position:
+            blocks[-1][1] = position + 1
+        else:
+            blocks.append([position, position + 1])
+
+    return [tuple(block) for block in blocks]
+
+def row_blocks(num_rows,block_size):
+    """
+    Splits the rows of a sheet into blocks read by separate requests.
+
+    Returns:
+        list: (first_row, last_row) tuples of 1-indexed rows, both included.
+    """
+    return [(start, min(start + block_size - 1, num_rows)) for start in range(1, num_rows + 1, block_size)]
+
+def join_blocks(blocks):
+    """
+    Joins the values of consecutive row blocks read from a sheet.
+
+    The API omits the trailing empty rows of every range, so empty rows between blocks
+    are added back (trailing empty rows of the last blocks are dropped).
+
+    Args:
+        blocks: Iterable of (block_length, block_values) tuples, in order.
+
+    Returns:
+        list: Rows of the sheet.
+    """
+    values = []
+    pending_empty_rows = 0 # Trailing empty rows of the blocks read so far
+
+    for block_length,block_values in blocks:
+        if block_values:
+            values.extend([] for _ in range(pending_empty_rows))
+            values.extend(block_values)
+            pending_empty_rows = 0
+        pending_empty_rows += block_length - len(block_values)
+
+    return values
+
+def build_frame(values,unformat = False,infer_dtypes = False,dtype = None,dtype_backend = None):
+    """
+    Builds a DataFrame from sheet values (first row as header), column by column.
+
+    Rows returned by the Sheets API omit their trailing empty cells. Instead of padding every row
+    in python, ragged rows are given as they are to pandas, which pads them with None while
+    converting them to columns (a single pass in C).
+
+    Args:
+        values: List of rows, as returned by values.get. The first row is the header.
+        unformat: If True, fill missing values with 'NULL' and convert all to string.
+        infer_dtypes: If True, columns whose non-empty values are all numbers, booleans or dates are
+                      converted to numeric, boolean or datetime dtypes. Empty cells become missing values.
+        dtype: Dictionary {column: dtype} applied after inference (e.g. {'id': 'string'}).
+        dtype_backend: If set ('numpy_nullable' or 'pyarrow'), columns are converted with
+                       DataFrame.convert_dtypes(dtype_backend=...). 'pyarrow' needs the optional pyarrow package.
+
+    Returns:
+        pandas.DataFrame: The sheet content.
+    """
+    import pandas as pd
+
+    if dtype_backend == 'pyarrow':
+        try:
+            import pyarrow # noqa: F401
+        except ImportError:
+            raise ImportError("dtype_backend='pyarrow' requires pyarrow: pip install driveup[arrow]")
+
+    headers = list(values[0]) if values else []
+    rows = values[1:]
+
+    df = pd.DataFrame(rows) if rows else pd.DataFrame(index=range(0))
+    for position in range(df.shape[1], len(headers)):
+        df[position] = None
+    num_cols = df.shape[1]
+    headers += [None] * (num_cols - len(headers))
+    df.columns = headers
+
+    if infer_dtypes:
+        for position in range(num_cols):
+            df.isetitem(position, infer_column(df.iloc[:, position]))
+
+    if dtype:
+        df = df.astype({column: column_dtype for column, column_dtype in dtype.items() if column in df.columns})
+
+    if unformat == True:
+        df = df.fillna('NULL')
+        df = df.astype(str)
+        df.columns = df.columns.astype(str)
+
+    if dtype_backend != None:
+        df = df.convert_dtypes(dtype_backend=dtype_backend)
+
+    return df
+
+def infer_column(column):
+    """
+    Converts a column of sheet values to a numeric, boolean or datetime dtype, if all its non-empty values allow it.
+
+    - Integer columns stay int64 (nullable Int64 if some cells are empty), so big integers keep all their digits.
+    - Columns with numbers written with leading zeros (e.g. '00123', codes rather than numbers) stay text.
+    - Only text that looks like a date (see DATE_PATTERN) becomes datetime. Requires pandas >= 2.0.
+
+    Args:
+        column: pandas Series of python values (as read from a sheet).
+
+    Returns:
+        pandas.Series: The converted column, or column itself if no dtype fits.
+    """
+    import numpy as np
+    import pandas as pd
+
+    if column.dtype != object and not pd.api.types.is_string_dtype(column.dtype):
+        return column
+
+    missing = (column.isna() | (column.astype(object) == '')).to_numpy()
+    present = column[~missing]
+    if present.empty:
+        return column
+
+    kind = pd.api.types.infer_dtype(present, skipna=True)
+
+    if kind == 'boolean' or (kind == 'string' and present.isin(BOOLEAN_STRINGS).all()):
+        result = pd.Series(pd.NA, index=column.index, dtype='boolean')
+        result[~missing] = present.isin([True, *BOOLEAN_STRINGS[::2]]).to_numpy()
+        return result
+
+    texts = present[present.map(type) == str]
+    if texts.str.match(r'[-+]?0\d').any():
+        return column
+
+    numbers = pd.to_numeric(present, errors='coerce')
+    if numbers.notna().all():
+        if not missing.any():
+            return pd.Series(numbers.to_numpy(), index=column.index, name=column.name)
+        integers = pd.api.types.is_integer_dtype(numbers.dtype)
+        result = pd.Series(pd.NA if integers else np.nan, index=column.index, name=column.name, dtype='Int64' if integers else 'float64')
+        result[~missing] = numbers.to_numpy()
+        return result
+
+    if kind == 'string' and present.map(lambda value: DATE_PATTERN.fullmatch(value.strip()) != None).all():
+        dates = pd.to_datetime(present, errors='coerce', format='mixed')
+        if dates.notna().all():
+            result = pd.Series(pd.NaT, index=column.index, dtype=dates.dtype)
+            result[~missing] = dates.to_numpy()
+            return result
+
+    return column
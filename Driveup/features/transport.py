@@ -0,0 +1,63 @@
+import socket
+
+import httplib2
+
+DEFAULT_POOL_SIZE = 10
+
+class SessionHttp:
+    """
+    httplib2-compatible transport backed by a pooled, keep-alive requests session.
+
+    Google API clients only call http.request(uri, method, body, headers) and expect an
+    (httplib2.Response, content) tuple, so services built with http=SessionHttp(...) send
+    their requests through google.auth's AuthorizedSession. Its connection pool keeps TLS
+    connections open between requests and, unlike httplib2.Http, can be shared by several
+    threads: every worker builds its own service on the same SessionHttp and reuses the
+    warm connections.
+
+    Args:
+        credentials: google.auth credentials used to authorize the requests.
+        pool_size: Connections kept open per host (use at least the number of worker threads).
+        timeout: Seconds to wait for the server before giving up (None waits forever).
+    """
+    def __init__(self,credentials,pool_size = DEFAULT_POOL_SIZE,timeout = None):
+        try:
+            import requests
+            from google.auth.transport.requests import AuthorizedSession
+        except ImportError:
+            raise ImportError("Pooled transport requires requests: pip install driveup[pool]")
+
+        self._exceptions = requests.exceptions
+        self.credentials = credentials
+        self.timeout = timeout
+        self.session = AuthorizedSession(credentials)
+
+        adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def request(self,uri,method = 'GET',body = None,headers = None,redirections = 5,connection_type = None):
+        # Only safe methods follow redirects (as httplib2 does): 308 answers of resumable uploads mean "resume incomplete"
+        allow_redirects = method in ('GET', 'HEAD') and redirections > 0
+
+        try:
+            response = self.session.request(method, uri, data=body, headers=headers, timeout=self.timeout, allow_redirects=allow_redirects)
+        except self._exceptions.Timeout as e:
+            raise socket.timeout(str(e))
+        except self._exceptions.ConnectionError as e:
+            raise ConnectionError(str(e))
+
+        content = response.content
+        info = {key.lower(): value for key,value in response.headers.items()}
+        if info.pop('content-encoding', None) in ('gzip', 'deflate'):
+            # requests already decompressed the body
+            info['content-length'] = str(len(content))
+        info['status'] = str(response.status_code)
+
+        resp = httplib2.Response(info)
+        resp.reason = response.reason
+
+        return resp, content
+
+    def close(self):
+        self.session.close()
@@ -166,4 +166,38 @@ def get_export_type(file_metadata,extension):
 
         
         
-        
\ No newline at end of file
+        
+def download_path(file_metadata,folder_path):
+    """
+    Local path where a drive file is downloaded inside folder_path.
+
+    Google native files without an extension in their name get the default extension of their export type.
+    """
+    path = os.path.join(folder_path,file_metadata['name'])
+    extension = get_file_extension(path)
+    new_extension,_ = get_export_type(file_metadata,extension)
+
+    if extension == '' and new_extension:
+        path = path + '.' + new_extension
+
+    return path
+
+def unique_path(path,used_paths):
+    """
+    Returns path, or path with a ' (1)', ' (2)'... suffix before its extension if it's already in used_paths.
+
+    The returned path is added to used_paths, so files of the same transfer never share a local path.
+
+    Args:
+        path: Local path.
+        used_paths: Set of the (normalized) paths already taken.
+    """
+    root,extension = os.path.splitext(path)
+    candidate = path
+    suffix = 1
+    while os.path.normcase(os.path.abspath(candidate)) in used_paths:
+        candidate = f'{root} ({suffix}){extension}'
+        suffix += 1
+    used_paths.add(os.path.normcase(os.path.abspath(candidate)))
+
+    return candidate
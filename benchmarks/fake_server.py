@@ -0,0 +1,813 @@
+"""In-memory stand-in for the parts of the Drive v3 and Sheets v4 REST APIs used by Driveup.
+
+Implements files list/get/create/update/delete, media downloads (with Range), exports,
+resumable and multipart uploads, HTTP batches, and spreadsheets get/batchUpdate and
+values get/batchGet/update/batchUpdate/clear/append. Every request can be delayed by a
+fixed latency and each API can be given a per-minute quota, answered with 429 errors
+once exceeded. Services built with root_url=<server url> talk to it instead of Google.
+
+Run standalone with: python -m benchmarks.fake_server --latency 0.02
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+import uuid
+from collections import Counter
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs, unquote
+
+FOLDER_MIME = 'application/vnd.google-apps.folder'
+SHEET_MIME = 'application/vnd.google-apps.spreadsheet'
+
+# File fields set by the API that create bodies can't carry (answered with 403 fieldNotWritable)
+READ_ONLY_FIELDS = ('size', 'md5Checksum', 'kind', 'trashed')
+
+# Endpoints used to set up the backend and read its counters (not counted, no latency)
+ADMIN_PATH = '/_admin/'
+
+
+def _col_to_idx(letters):
+    idx = 0
+    for char in letters:
+        idx = idx * 26 + (ord(char) - 64)
+    return idx - 1
+
+
+def _idx_to_col(idx):
+    letters = ''
+    idx += 1
+    while idx:
+        idx, rem = divmod(idx - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+def _apply_mask(resource, mask):
+    """Applies a (simplified) partial response field mask to a resource."""
+    if not mask or mask == '*':
+        return resource
+    fields = []
+    depth, current = 0, ''
+    for char in mask:
+        if char == ',' and depth == 0:
+            fields.append(current.strip())
+            current = ''
+            continue
+        depth += char == '('
+        depth -= char == ')'
+        current += char
+    fields.append(current.strip())
+    result = {}
+    for field in fields:
+        match = re.match(r'^([\w/]+)(?:\((.*)\))?$', field)
+        if not match:
+            continue
+        name, sub = match.groups()
+        head, _, rest = name.partition('/')
+        if head not in resource:
+            continue
+        value = resource[head]
+        sub = rest or sub
+        if sub and isinstance(value, list):
+            value = [_apply_mask(item, sub) for item in value]
+        elif sub and isinstance(value, dict):
+            value = _apply_mask(value, sub)
+        result[head] = value
+    return result
+
+
+class RateLimiter:
+    """Token bucket used to answer with 429 once the configured per-minute quota is exceeded."""
+
+    def __init__(self, per_minute):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+# Day 0 of spreadsheet date serial numbers
+SERIAL_EPOCH = datetime(1899, 12, 30)
+
+
+class DateCell(float):
+    """Cell entered as a date: its serial number (days since SERIAL_EPOCH), formatted like en_US sheets do."""
+
+    def __new__(cls, text):
+        moment = datetime.fromisoformat(text)
+        cell = super().__new__(cls, (moment - SERIAL_EPOCH).total_seconds() / 86400)
+        cell.text = f'{moment.month}/{moment.day}/{moment.year} {moment.hour}:{moment:%M:%S}'
+        return cell
+
+
+class ApiError(Exception):
+    """Error answered with an HTTP status and a reason, like the ones of the real APIs."""
+
+    def __init__(self, status, message, reason):
+        super().__init__(message)
+        self.status = status
+        self.reason = reason
+
+
+class FakeGoogleAPIs:
+    """State and request dispatch of the fake Drive / Sheets backend.
+
+    Args:
+        latency: Seconds slept before answering every HTTP request (batch parts are not delayed again).
+        drive_rate_limit: Maximum Drive requests per minute before answering 429 (None = unlimited).
+        sheets_rate_limit: Maximum Sheets requests per minute before answering 429 (None = unlimited).
+    """
+
+    def __init__(self, latency=0.0, drive_rate_limit=None, sheets_rate_limit=None):
+        self.latency = latency
+        self.limiters = {
+            'drive': RateLimiter(drive_rate_limit) if drive_rate_limit else None,
+            'sheets': RateLimiter(sheets_rate_limit) if sheets_rate_limit else None,
+        }
+        self.lock = threading.RLock()
+        self.files = {}
+        self.content = {}
+        self.spreadsheets = {}
+        self.sessions = {}
+        self.stats = Counter()
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.base_url = ''
+        self.create_folder('root', 'My Drive', parent=None)
+
+    # --- State helpers ---
+
+    def reset_stats(self):
+        with self.lock:
+            self.stats.clear()
+            self.bytes_in = 0
+            self.bytes_out = 0
+
+    def admin(self, action, body):
+        """Answers a request to an admin endpoint (ADMIN_PATH + action) with a JSON body of arguments."""
+        params = json.loads(body) if body else {}
+        with self.lock:
+            if action == 'create_folder':
+                return self._json(200, {'id': self.create_folder(name=params.get('name', 'folder'), parent=params.get('parent', 'root'))})
+            if action == 'create_spreadsheet':
+                return self._json(200, {'id': self.create_spreadsheet(**params)})
+            if action == 'stats':
+                return self._json(200, {'requests': dict(self.stats), 'bytes_in': self.bytes_in, 'bytes_out': self.bytes_out})
+            if action == 'reset_stats':
+                self.reset_stats()
+                return self._json(200, {})
+        return self._error(404, f'Unknown admin action: {action}', 'notFound')
+
+    def _new_id(self):
+        return uuid.uuid4().hex[:33]
+
+    def create_folder(self, file_id=None, name='folder', parent='root'):
+        file_id = file_id or self._new_id()
+        self.files[file_id] = {'id': file_id, 'name': name, 'mimeType': FOLDER_MIME,
+                               'parents': [parent] if parent else [], 'trashed': False,
+                               'kind': 'drive#file', 'modifiedTime': self._now()}
+        return file_id
+
+    def create_file(self, name, data, parent='root', mime_type='text/plain'):
+        file_id = self._new_id()
+        self.files[file_id] = {'id': file_id, 'name': name, 'mimeType': mime_type,
+                               'parents': [parent], 'trashed': False, 'kind': 'drive#file'}
+        self._set_content(file_id, data)
+        return file_id
+
+    def create_spreadsheet(self, sheets=('Sheet1',), rows=1000, cols=26, parent='root', name='Spreadsheet'):
+        file_id = self._new_id()
+        self.files[file_id] = {'id': file_id, 'name': name, 'mimeType': SHEET_MIME,
+                               'parents': [parent], 'trashed': False, 'kind': 'drive#file',
+                               'modifiedTime': self._now()}
+        self.spreadsheets[file_id] = [
+            {'properties': {'sheetId': i, 'title': title, 'index': i,
+                            'gridProperties': {'rowCount': rows, 'columnCount': cols}},
+             'values': []}
+            for i, title in enumerate(sheets)
+        ]
+        return file_id
+
+    def _now(self):
+        return time.strftime('%Y-%m-%dT%H:%M:%S.000Z', time.gmtime())
+
+    def _set_content(self, file_id, data):
+        meta = self.files[file_id]
+        self.content[file_id] = data
+        meta['modifiedTime'] = self._now()
+        if meta['mimeType'].startswith('application/vnd.google-apps.'):
+            meta.pop('size', None)
+            meta.pop('md5Checksum', None)
+        else:
+            meta['size'] = str(len(data))
+            meta['md5Checksum'] = hashlib.md5(data).hexdigest()
+
+    # --- HTTP entry point ---
+
+    def handle(self, method, url, headers, body, nested=False):
+        """Answers a single HTTP request. Returns (status, headers, body bytes)."""
+        parts = urlsplit(url)
+        path = unquote(parts.path)
+        query_lists = parse_qs(parts.query, keep_blank_values=True)
+        query = {k: v[-1] for k, v in query_lists.items()}
+        query['_ranges'] = query_lists.get('ranges', [])
+        query['_range_header'] = headers.get('range')
+        api = 'sheets' if path.startswith('/v4/') or path == '/batch' else 'drive'
+        if not nested:
+            if self.latency:
+                time.sleep(self.latency)
+            limiter = self.limiters[api]
+            if limiter and not limiter.allow():
+                with self.lock:
+                    self.stats[f'{api}.throttled'] += 1
+                return self._error(429, 'Rate limit exceeded', 'rateLimitExceeded')
+        with self.lock:
+            self.bytes_in += len(body or b'')
+            try:
+                status, out_headers, out_body = self._dispatch(method, path, query, headers, body or b'')
+            except KeyError as e:
+                status, out_headers, out_body = self._error(404, f'Not found: {e}', 'notFound')
+            except ValueError as e:
+                status, out_headers, out_body = self._error(400, str(e), 'badRequest')
+            except ApiError as e:
+                status, out_headers, out_body = self._error(e.status, str(e), e.reason)
+            self.bytes_out += len(out_body)
+        return status, out_headers, out_body
+
+    def _json(self, status, payload, extra=None):
+        headers = {'Content-Type': 'application/json; charset=UTF-8'}
+        headers.update(extra or {})
+        return status, headers, json.dumps(payload).encode()
+
+    def _error(self, status, message, reason):
+        return self._json(status, {'error': {'code': status, 'message': message,
+                                             'errors': [{'reason': reason, 'message': message}]}})
+
+    def _count(self, op):
+        self.stats[op] += 1
+
+    def _dispatch(self, method, path, query, headers, body):
+        if path in ('/batch/drive/v3', '/batch'):
+            self._count('batch')
+            return self._batch(headers, body)
+        if path.startswith('/upload/drive/v3/files'):
+            return self._upload(method, path, query, headers, body)
+        if path.startswith('/drive/v3/files'):
+            return self._drive(method, path, query, body)
+        if path.startswith('/v4/spreadsheets/'):
+            return self._sheets(method, path, query, body)
+        raise KeyError(path)
+
+    # --- Drive ---
+
+    def _drive(self, method, path, query, body):
+        rest = path[len('/drive/v3/files'):].strip('/')
+        if not rest:
+            if method == 'GET':
+                self._count('drive.files.list')
+                return self._list(query)
+            if method == 'POST':
+                self._count('drive.files.create')
+                meta = self._create(json.loads(body or b'{}'))
+                return self._json(200, _apply_mask(meta, query.get('fields', 'id,name,mimeType,kind')))
+        file_id, _, action = rest.partition('/')
+        meta = self.files[file_id]
+        if action == 'export':
+            self._count('drive.files.export')
+            return 200, {'Content-Type': query.get('mimeType', 'application/octet-stream')}, self.content.get(file_id, b'')
+        if method == 'GET':
+            if query.get('alt') == 'media':
+                self._count('drive.files.get_media')
+                return self._media(file_id, query)
+            self._count('drive.files.get')
+            return self._json(200, _apply_mask(meta, query.get('fields')))
+        if method == 'PATCH':
+            self._count('drive.files.update')
+            self._patch(meta, json.loads(body or b'{}'), query)
+            return self._json(200, _apply_mask(meta, query.get('fields', 'id,name,mimeType,kind')))
+        if method == 'DELETE':
+            self._count('drive.files.delete')
+            del self.files[file_id]
+            return 204, {}, b''
+        raise ValueError(f'Unsupported {method} {path}')
+
+    def _list(self, query):
+        match = re.search(r"'([^']+)' in parents", query.get('q', ''))
+        parent = match.group(1) if match else 'root'
+        children = [f for f in self.files.values() if parent in f.get('parents', []) and not f['trashed']]
+        page_size = min(int(query.get('pageSize', 100)), 1000)
+        start = int(query.get('pageToken') or 0)
+        page = children[start:start + page_size]
+        payload = {'kind': 'drive#fileList', 'files': page}
+        if start + page_size < len(children):
+            payload['nextPageToken'] = str(start + page_size)
+        return self._json(200, _apply_mask(payload, query.get('fields', 'nextPageToken,kind,files(id,name,mimeType,kind)')))
+
+    def _check_writable(self, meta):
+        for key in READ_ONLY_FIELDS:
+            if key in meta:
+                raise ApiError(403, f'The resource body includes fields which are not directly writable: {key}', 'fieldNotWritable')
+
+    def _create(self, meta, data=None):
+        self._check_writable(meta)
+        file_id = meta.get('id') or self._new_id()
+        if file_id in self.files:
+            raise ValueError('A file already exists with the provided ID.')
+        parents = meta.get('parents') or ['root']
+        if isinstance(parents, str):
+            parents = [parents]
+        record = {'kind': 'drive#file', 'id': file_id, 'name': meta.get('name', 'Untitled'),
+                  'mimeType': meta.get('mimeType', 'application/octet-stream'),
+                  'parents': parents, 'trashed': False, 'modifiedTime': self._now()}
+        self.files[file_id] = record
+        if record['mimeType'] != FOLDER_MIME:
+            self._set_content(file_id, data or b'')
+        return record
+
+    def _patch(self, meta, changes, query):
+        for key in ('name', 'mimeType', 'description'):
+            if key in changes:
+                meta[key] = changes[key]
+        if query.get('removeParents'):
+            removed = query['removeParents'].split(',')
+            meta['parents'] = [p for p in meta['parents'] if p not in removed]
+        if query.get('addParents'):
+            for parent in query['addParents'].split(','):
+                if parent not in meta['parents']:
+                    meta['parents'].append(parent)
+        meta['modifiedTime'] = self._now()
+
+    def _media(self, file_id, query):
+        data = self.content.get(file_id, b'')
+        match = re.match(r'bytes=(\d+)-(\d*)', query.get('_range_header') or '')
+        if match is None:
+            return 200, {'Content-Type': 'application/octet-stream', 'Content-Length': str(len(data))}, data
+        start = int(match.group(1))
+        end = int(match.group(2)) if match.group(2) else len(data) - 1
+        if start >= len(data) and len(data) > 0:
+            return 416, {'Content-Range': f'bytes */{len(data)}'}, b''
+        if start >= len(data) and len(data) == 0:
+            return 416, {'Content-Range': 'bytes */0'}, b''
+        end = min(end, len(data) - 1)
+        chunk = data[start:end + 1]
+        return 206, {'Content-Type': 'application/octet-stream',
+                     'Content-Range': f'bytes {start}-{end}/{len(data)}'}, chunk
+
+    def _upload(self, method, path, query, headers, body):
+        upload_id = query.get('upload_id')
+        if upload_id:
+            return self._upload_chunk(upload_id, headers, body)
+        rest = path[len('/upload/drive/v3/files'):].strip('/')
+        upload_type = query.get('uploadType')
+        if upload_type == 'resumable':
+            self._count('drive.upload.start')
+            meta = json.loads(body or b'{}')
+            if not rest:
+                self._check_writable(meta)
+            upload_id = uuid.uuid4().hex
+            self.sessions[upload_id] = {'file_id': rest or None, 'meta': meta,
+                                        'data': bytearray(), 'query': query}
+            location = f'{self.base_url}/upload/drive/v3/files?uploadType=resumable&upload_id={upload_id}'
+            return 200, {'Location': location, 'Content-Length': '0'}, b''
+        if upload_type in ('multipart', 'media'):
+            self._count('drive.upload.multipart')
+            meta, data = self._parse_related(headers, body) if upload_type == 'multipart' else ({}, body)
+            return self._finish_upload(rest or None, meta, data, query)
+        raise ValueError(f'Unsupported uploadType {upload_type}')
+
+    def _upload_chunk(self, upload_id, headers, body):
+        session = self.sessions[upload_id]
+        content_range = headers.get('content-range', '')
+        match = re.match(r'bytes (\*|(\d+)-(\d+))/(\*|\d+)', content_range)
+        total = None
+        if match and match.group(4) != '*':
+            total = int(match.group(4))
+        if match and match.group(1) != '*':
+            self._count('drive.upload.chunk')
+            start = int(match.group(2))
+            if start != len(session['data']):
+                raise ValueError('Chunk does not start at the committed offset.')
+            session['data'] += body
+        elif not match:
+            self._count('drive.upload.chunk')
+            session['data'] += body
+            total = len(session['data'])
+        else:
+            self._count('drive.upload.status')
+        if total is not None and len(session['data']) >= total:
+            del self.sessions[upload_id]
+            return self._finish_upload(session['file_id'], session['meta'], bytes(session['data']), session['query'])
+        received = len(session['data'])
+        extra = {'Range': f'bytes=0-{received - 1}'} if received else {}
+        extra['Content-Length'] = '0'
+        return 308, extra, b''
+
+    def _finish_upload(self, file_id, meta, data, query):
+        if file_id:
+            record = self.files[file_id]
+            self._patch(record, meta, query)
+            self._set_content(file_id, data)
+        else:
+            record = self._create(meta, data)
+        return self._json(200, _apply_mask(record, query.get('fields', 'id,name,mimeType,kind')))
+
+    def _parse_related(self, headers, body):
+        boundary = re.search(r'boundary="?([^";]+)"?', headers.get('content-type', '')).group(1).encode()
+        parts = [p for p in body.split(b'--' + boundary) if p.strip() not in (b'', b'--')]
+        meta = json.loads(parts[0].split(b'\r\n\r\n', 1)[1] if b'\r\n\r\n' in parts[0] else parts[0].split(b'\n\n', 1)[1])
+        raw = parts[1].split(b'\r\n\r\n', 1)[1] if b'\r\n\r\n' in parts[1] else parts[1].split(b'\n\n', 1)[1]
+        return meta, raw.rstrip(b'\r\n')
+
+    # --- Batch ---
+
+    def _batch(self, headers, body):
+        boundary = re.search(r'boundary="?([^";]+)"?', headers.get('content-type', '')).group(1).encode()
+        responses = []
+        for part in body.split(b'--' + boundary):
+            if part.strip() in (b'', b'--'):
+                continue
+            part_headers, _, inner = part.replace(b'\r\n', b'\n').partition(b'\n\n')
+            content_id = re.search(rb'Content-ID: <([^>]+)>', part_headers, re.I)
+            request_line, _, inner = inner.partition(b'\n')
+            method, url, _ = request_line.decode().split(' ', 2)
+            inner_head, _, inner_body = inner.partition(b'\n\n')
+            inner_headers = {}
+            for line in inner_head.decode().split('\n'):
+                if ':' in line:
+                    key, value = line.split(':', 1)
+                    inner_headers[key.strip().lower()] = value.strip()
+            status, out_headers, out_body = self.handle(method, url, inner_headers, inner_body.rstrip(b'\n'), nested=True)
+            head = f'HTTP/1.1 {status} OK\r\n' + ''.join(f'{k}: {v}\r\n' for k, v in out_headers.items())
+            responses.append(
+                b'--batch_response\r\nContent-Type: application/http\r\n'
+                + (b'Content-ID: <response-' + content_id.group(1) + b'>\r\n' if content_id else b'')
+                + b'\r\n' + head.encode() + b'\r\n' + out_body + b'\r\n')
+        payload = b''.join(responses) + b'--batch_response--\r\n'
+        return 200, {'Content-Type': 'multipart/mixed; boundary=batch_response'}, payload
+
+    # --- Sheets ---
+
+    def _sheet(self, spreadsheet_id, title=None):
+        sheets = self.spreadsheets[spreadsheet_id]
+        if title is None:
+            return sheets[0]
+        for sheet in sheets:
+            if sheet['properties']['title'] == title:
+                return sheet
+        raise ValueError(f'Unable to parse range: {title}')
+
+    def _parse_range(self, spreadsheet_id, a1):
+        """Returns (sheet, row0, col0, row1, col1) with inclusive 0-indexed bounds (None = open)."""
+        title, cells = None, a1
+        if '!' in a1:
+            title, cells = a1.rsplit('!', 1)
+        elif not re.fullmatch(r'[A-Z]*\d*(:[A-Z]*\d*)?', a1):
+            title, cells = a1, ''
+        if title is not None and title.startswith("'") and title.endswith("'"):
+            title = title[1:-1].replace("''", "'")
+        sheet = self._sheet(spreadsheet_id, title)
+        if not cells:
+            return sheet, 0, 0, None, None
+        start, _, end = cells.partition(':')
+        s_col, s_row = re.fullmatch(r'([A-Z]*)(\d*)', start).groups()
+        row0 = int(s_row) - 1 if s_row else 0
+        col0 = _col_to_idx(s_col) if s_col else 0
+        if not end:
+            return sheet, row0, col0, (row0 if s_row else None), (col0 if s_col else None)
+        e_col, e_row = re.fullmatch(r'([A-Z]*)(\d*)', end).groups()
+        return sheet, row0, col0, (int(e_row) - 1 if e_row else None), (_col_to_idx(e_col) if e_col else None)
+
+    def _a1(self, sheet, row0, col0, row1, col1):
+        title = sheet['properties']['title'].replace("'", "''")
+        return f"'{title}'!{_idx_to_col(col0)}{row0 + 1}:{_idx_to_col(col1)}{row1 + 1}"
+
+    def _user_entered(self, value):
+        if isinstance(value, str):
+            if value.upper() in ('TRUE', 'FALSE'):
+                return value.upper() == 'TRUE'
+            try:
+                number = float(value)
+                return int(number) if number.is_integer() and 'e' not in value.lower() else number
+            except ValueError:
+                pass
+            if re.fullmatch(r'\d{4}-\d\d-\d\d( \d\d:\d\d:\d\d)?', value):
+                return DateCell(value)
+            return value
+        return value
+
+    def _render(self, value, option, date_option='SERIAL_NUMBER'):
+        if isinstance(value, DateCell):
+            return float(value) if option != 'FORMATTED_VALUE' and date_option == 'SERIAL_NUMBER' else value.text
+        if option in ('UNFORMATTED_VALUE', 'FORMULA'):
+            return value
+        if isinstance(value, bool):
+            return 'TRUE' if value else 'FALSE'
+        if isinstance(value, float) and value.is_integer():
+            return str(int(value))
+        return str(value)
+
+    def _read(self, spreadsheet_id, a1, query):
+        sheet, row0, col0, row1, col1 = self._parse_range(spreadsheet_id, a1)
+        grid = sheet['properties']['gridProperties']
+        row1 = grid['rowCount'] - 1 if row1 is None else row1
+        col1 = grid['columnCount'] - 1 if col1 is None else col1
+        if row1 >= grid['rowCount'] or col1 >= grid['columnCount']:
+            raise ValueError(f'Range ({a1}) exceeds grid limits.')
+        option = query.get('valueRenderOption', 'FORMATTED_VALUE')
+        date_option = query.get('dateTimeRenderOption', 'SERIAL_NUMBER')
+        rows = []
+        for row in sheet['values'][row0:row1 + 1]:
+            cells = row[col0:col1 + 1]
+            while cells and cells[-1] in (None, ''):
+                cells = cells[:-1]
+            rows.append([('' if v is None else self._render(v, option, date_option)) for v in cells])
+        while rows and not rows[-1]:
+            rows.pop()
+        major_dimension = query.get('majorDimension', 'ROWS')
+        if major_dimension == 'COLUMNS' and rows:
+            width = max(len(r) for r in rows)
+            columns = [[r[c] if c < len(r) else '' for r in rows] for c in range(width)]
+            rows = []
+            for column in columns:
+                while column and column[-1] == '':
+                    column.pop()
+                rows.append(column)
+        value_range = {'range': self._a1(sheet, row0, col0, row1, col1), 'majorDimension': major_dimension}
+        if rows:
+            value_range['values'] = rows
+        return value_range
+
+    def _write(self, spreadsheet_id, a1, values, input_option, grow=False):
+        sheet, row0, col0, _, _ = self._parse_range(spreadsheet_id, a1)
+        grid = sheet['properties']['gridProperties']
+        width = max((len(r) for r in values), default=0)
+        if values and (row0 + len(values) > grid['rowCount'] or col0 + width > grid['columnCount']):
+            if not grow:
+                raise ValueError(f'Range ({a1}) exceeds grid limits. Max rows: {grid["rowCount"]}, max columns: {grid["columnCount"]}')
+            grid['rowCount'] = max(grid['rowCount'], row0 + len(values))
+            grid['columnCount'] = max(grid['columnCount'], col0 + width)
+        data = sheet['values']
+        while len(data) < row0 + len(values):
+            data.append([])
+        cells = 0
+        for offset, row in enumerate(values):
+            target = data[row0 + offset]
+            if len(target) < col0 + len(row):
+                target.extend([None] * (col0 + len(row) - len(target)))
+            for c, value in enumerate(row):
+                if value is None:
+                    continue
+                target[col0 + c] = self._user_entered(value) if input_option == 'USER_ENTERED' else value
+                cells += 1
+        return {'spreadsheetId': spreadsheet_id,
+                'updatedRange': self._a1(sheet, row0, col0, row0 + max(len(values), 1) - 1, col0 + max(width, 1) - 1),
+                'updatedRows': len(values), 'updatedColumns': width, 'updatedCells': cells}
+
+    def _clear(self, spreadsheet_id, a1):
+        sheet, row0, col0, row1, col1 = self._parse_range(spreadsheet_id, a1)
+        for r, row in enumerate(sheet['values']):
+            if r < row0 or (row1 is not None and r > row1):
+                continue
+            for c in range(col0, len(row) if col1 is None else min(col1 + 1, len(row))):
+                row[c] = None
+        return {'spreadsheetId': spreadsheet_id, 'clearedRange': a1}
+
+    def _last_row(self, sheet):
+        for index in range(len(sheet['values']) - 1, -1, -1):
+            if any(v not in (None, '') for v in sheet['values'][index]):
+                return index
+        return -1
+
+    def _sheets(self, method, path, query, body):
+        rest = path[len('/v4/spreadsheets/'):]
+        payload = json.loads(body) if body else {}
+        if ':' in rest and '/values' not in rest:
+            spreadsheet_id, action = rest.split(':', 1)
+            if action == 'batchUpdate':
+                self._count('sheets.spreadsheets.batchUpdate')
+                return self._json(200, self._structure_update(spreadsheet_id, payload))
+            raise ValueError(action)
+        if '/values' not in rest:
+            self._count('sheets.spreadsheets.get')
+            sheets = [{'properties': s['properties']} for s in self.spreadsheets[rest]]
+            return self._json(200, _apply_mask({'spreadsheetId': rest, 'sheets': sheets}, query.get('fields')))
+        spreadsheet_id, _, value_path = rest.partition('/values')
+        value_path = value_path.lstrip('/')
+        if value_path == ':batchUpdate':
+            self._count('sheets.values.batchUpdate')
+            responses = [self._write(spreadsheet_id, d['range'], d.get('values', []), payload.get('valueInputOption'))
+                         for d in payload.get('data', [])]
+            return self._json(200, {'spreadsheetId': spreadsheet_id, 'responses': responses,
+                                    'totalUpdatedCells': sum(r['updatedCells'] for r in responses)})
+        if value_path == ':batchGet':
+            self._count('sheets.values.batchGet')
+            ranges = query['_ranges']
+            return self._json(200, {'spreadsheetId': spreadsheet_id,
+                                    'valueRanges': [self._read(spreadsheet_id, r, query) for r in ranges]})
+        a1, _, action = value_path.rpartition(':')
+        if action not in ('clear', 'append'):
+            a1, action = value_path, ''
+        if action == 'clear':
+            self._count('sheets.values.clear')
+            return self._json(200, self._clear(spreadsheet_id, a1))
+        if action == 'append':
+            self._count('sheets.values.append')
+            sheet, _, _, _, _ = self._parse_range(spreadsheet_id, a1)
+            start = self._last_row(sheet) + 1
+            title = sheet['properties']['title'].replace("'", "''")
+            update = self._write(spreadsheet_id, f"'{title}'!A{start + 1}", payload.get('values', []),
+                                 query.get('valueInputOption'), grow=True)
+            return self._json(200, {'spreadsheetId': spreadsheet_id, 'updates': update})
+        if method == 'GET':
+            self._count('sheets.values.get')
+            return self._json(200, self._read(spreadsheet_id, a1, query))
+        if method == 'PUT':
+            self._count('sheets.values.update')
+            return self._json(200, self._write(spreadsheet_id, a1, payload.get('values', []), query.get('valueInputOption')))
+        raise ValueError(f'Unsupported {method} {path}')
+
+    def _structure_update(self, spreadsheet_id, payload):
+        replies = []
+        for request in payload.get('requests', []):
+            if 'updateSheetProperties' in request:
+                props = request['updateSheetProperties']['properties']
+                sheet = next(s for s in self.spreadsheets[spreadsheet_id] if s['properties']['sheetId'] == props['sheetId'])
+                grid = props.get('gridProperties', {})
+                sheet['properties']['gridProperties'].update(grid)
+                rows = sheet['properties']['gridProperties']['rowCount']
+                cols = sheet['properties']['gridProperties']['columnCount']
+                sheet['values'] = [row[:cols] for row in sheet['values'][:rows]]
+            elif 'updateCells' in request:
+                grid_range = request['updateCells']['range']
+                sheet = next(s for s in self.spreadsheets[spreadsheet_id] if s['properties']['sheetId'] == grid_range.get('sheetId', 0))
+                if 'userEnteredValue' in request['updateCells'].get('fields', ''):
+                    row0, row1 = grid_range.get('startRowIndex', 0), grid_range.get('endRowIndex')
+                    col0, col1 = grid_range.get('startColumnIndex', 0), grid_range.get('endColumnIndex')
+                    for r, row in enumerate(sheet['values']):
+                        if r >= row0 and (row1 is None or r < row1):
+                            for c in range(col0, len(row) if col1 is None else min(col1, len(row))):
+                                row[c] = None
+            elif 'addSheet' in request:
+                sheets = self.spreadsheets[spreadsheet_id]
+                props = dict(request['addSheet'].get('properties', {}))
+                props.setdefault('sheetId', max(s['properties']['sheetId'] for s in sheets) + 1)
+                props.setdefault('title', f'Sheet{len(sheets) + 1}')
+                props.setdefault('gridProperties', {'rowCount': 1000, 'columnCount': 26})
+                props['index'] = len(sheets)
+                sheets.append({'properties': props, 'values': []})
+            replies.append({})
+        return {'spreadsheetId': spreadsheet_id, 'replies': replies}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    api = None
+
+    def log_message(self, *args):
+        pass
+
+    def _serve(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        headers = {k.lower(): v for k, v in self.headers.items()}
+        if self.path.startswith(ADMIN_PATH):
+            status, out_headers, out_body = self.api.admin(self.path[len(ADMIN_PATH):], body)
+        else:
+            status, out_headers, out_body = self.api.handle(self.command, self.path, headers, body)
+        self.send_response(status)
+        for key, value in out_headers.items():
+            if key.lower() != 'content-length':
+                self.send_header(key, value)
+        self.send_header('Content-Length', str(len(out_body)))
+        self.end_headers()
+        self.wfile.write(out_body)
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _serve
+
+
+def credentials(mode='client'):
+    """Credentials dictionary (as returned by auth.authorize) accepted by the fake server."""
+    from google.auth.credentials import AnonymousCredentials
+    return {'creds': AnonymousCredentials(), 'type': mode}
+
+
+class FakeServer:
+    """Runs a FakeGoogleAPIs instance on a local port in a background thread.
+
+    Usage:
+        with FakeServer(latency=0.02) as server:
+            drive = Drive(credentials(), root_url=server.url + '/')
+            folder_id = server.api.create_folder(name='target')
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, **api_options):
+        self.api = FakeGoogleAPIs(**api_options)
+        handler = type('Handler', (_Handler,), {'api': self.api})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.url = f'http://{host}:{self.httpd.server_address[1]}'
+        self.api.base_url = self.url
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class FakeServerProcess:
+    """Runs the fake server in a child process and controls it through its admin endpoints.
+
+    The server's own CPU time and memory (stored files and sheets) stay out of the measured
+    process. Same helpers as FakeGoogleAPIs: create_folder, create_spreadsheet, stats and
+    reset_stats.
+
+    Args:
+        latency: Seconds slept before answering every HTTP request.
+        drive_rate_limit: Maximum Drive requests per minute before answering 429 (None = unlimited).
+        sheets_rate_limit: Maximum Sheets requests per minute before answering 429 (None = unlimited).
+    """
+
+    def __init__(self, latency=0.0, drive_rate_limit=None, sheets_rate_limit=None):
+        command = [sys.executable, '-m', 'benchmarks.fake_server', '--latency', str(latency)]
+        if drive_rate_limit:
+            command += ['--drive-rate-limit', str(drive_rate_limit)]
+        if sheets_rate_limit:
+            command += ['--sheets-rate-limit', str(sheets_rate_limit)]
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        self.process = subprocess.Popen(command, cwd=root, stdout=subprocess.PIPE, text=True)
+        self.url = self.process.stdout.readline().strip()
+        if not self.url:
+            self.process.wait()
+            raise RuntimeError('The fake server process could not be started.')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.process.terminate()
+        self.process.wait()
+        self.process.stdout.close()
+
+    def _admin(self, action, **params):
+        request = urllib.request.Request(self.url + ADMIN_PATH + action, data=json.dumps(params).encode(), method='POST')
+        with urllib.request.urlopen(request) as response:
+            return json.loads(response.read())
+
+    def create_folder(self, name='folder', parent='root'):
+        return self._admin('create_folder', name=name, parent=parent)['id']
+
+    def create_spreadsheet(self, sheets=('Sheet1',), rows=1000, cols=26, parent='root', name='Spreadsheet'):
+        return self._admin('create_spreadsheet', sheets=list(sheets), rows=rows, cols=cols, parent=parent, name=name)['id']
+
+    def stats(self):
+        """Returns {'requests': {operation: count}, 'bytes_in': ..., 'bytes_out': ...} since the last reset."""
+        return self._admin('stats')
+
+    def reset_stats(self):
+        self._admin('reset_stats')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fake Drive v3 / Sheets v4 server. Prints its URL and serves until killed.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=0)
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds slept before answering every request.')
+    parser.add_argument('--drive-rate-limit', type=float, help='Drive requests per minute before answering 429.')
+    parser.add_argument('--sheets-rate-limit', type=float, help='Sheets requests per minute before answering 429.')
+    args = parser.parse_args()
+
+    server = FakeServer(args.host, args.port, latency=args.latency,
+                        drive_rate_limit=args.drive_rate_limit, sheets_rate_limit=args.sheets_rate_limit)
+    print(server.url, flush=True)
+    server.httpd.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
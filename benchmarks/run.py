@@ -0,0 +1,241 @@
+"""Offline benchmarks of Driveup's bulk operations against the fake Drive / Sheets server.
+
+For upload_folder, download_folder, df_update and df_download at several data sizes, reports
+the API requests sent (total and per API method), the wall time, the peak memory traced by
+tracemalloc in this process and the bytes sent and received. The server runs in a child
+process, so neither its CPU time nor its memory are measured.
+
+The construction benchmark times `import Driveup.drive`, `Drive(...)` and the first use of
+its Drive and Sheets clients in new interpreters (so modules already imported by this one
+don't hide their cost), and reports the medians of several runs.
+
+Usage:
+    python -m benchmarks.run
+    python -m benchmarks.run --files 10,100,1000 --rows 1000,100000 --latency 0.05 --max-workers 8
+    python -m benchmarks.run --operations df_update,df_download --json results.json
+    python -m benchmarks.run --operations construction --construction-runs 10
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from Driveup.drive import Drive
+from Driveup.features import executor
+from benchmarks.fake_server import FakeServerProcess, credentials
+
+OPERATIONS = ('construction', 'upload_folder', 'download_folder', 'df_update', 'df_download')
+
+# Run by every construction benchmark interpreter: prints the seconds of each step as JSON
+CONSTRUCTION_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+from Driveup.drive import Drive
+imported = time.perf_counter()
+from google.auth.credentials import AnonymousCredentials
+drive = Drive({'creds': AnonymousCredentials(), 'type': sys.argv[1]}, root_url=sys.argv[2])
+constructed = time.perf_counter()
+drive.drive_service, drive.sheets_service
+built = time.perf_counter()
+print(json.dumps({'import': imported - start, 'construct': constructed - imported, 'services': built - constructed}))
+"""
+FILES_PER_FOLDER = 25
+
+
+def make_folder(path, num_files, file_size):
+    """Writes num_files random files of file_size bytes, FILES_PER_FOLDER per subfolder."""
+    for i in range(num_files):
+        folder = os.path.join(path, f'folder_{i // FILES_PER_FOLDER}')
+        os.makedirs(folder, exist_ok=True)
+        with open(os.path.join(folder, f'file_{i}.bin'), 'wb') as f:
+            f.write(os.urandom(file_size))
+
+
+def make_frame(num_rows, num_cols):
+    """DataFrame of num_rows rows: integer, float and text columns (num_cols in total)."""
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(0)
+    columns = {}
+    for i in range(num_cols):
+        if i % 3 == 0:
+            columns[f'int_{i}'] = rng.integers(0, 1000000, num_rows)
+        elif i % 3 == 1:
+            columns[f'float_{i}'] = rng.random(num_rows).round(4)
+        else:
+            columns[f'text_{i}'] = rng.choice(['alpha', 'beta', 'gamma', 'delta'], num_rows)
+
+    return pd.DataFrame(columns)
+
+
+def measure(server, function, trace_memory=True):
+    """Runs function once and returns its requests, wall time and peak memory."""
+    # Fresh rate limiters, so results don't depend on the operations that ran before
+    executor.configure('drive', executor.DRIVE_REQUESTS_PER_MINUTE)
+    executor.configure('sheets', executor.SHEETS_REQUESTS_PER_MINUTE)
+    server.reset_stats()
+
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        result = function()
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+    if trace_memory:
+        tracemalloc.stop()
+
+    stats = server.stats()
+    by_method = stats['requests']
+    # Throttled requests are answered with 429, they are not API calls
+    throttled = sum(count for method, count in by_method.items() if method.endswith('.throttled'))
+
+    return result, {
+        'requests': sum(by_method.values()) - throttled,
+        'throttled': throttled,
+        'by_method': by_method,
+        'seconds': round(seconds, 3),
+        'peak_mb': round(peak / 2 ** 20, 1) if peak != None else None,
+        'sent_mb': round(stats['bytes_in'] / 2 ** 20, 2),
+        'received_mb': round(stats['bytes_out'] / 2 ** 20, 2),
+    }
+
+
+def bench_construction(server, args):
+    """Import and construction times of Drive, in args.construction_runs new interpreters."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    def run():
+        return [json.loads(subprocess.run([sys.executable, '-c', CONSTRUCTION_SCRIPT, args.mode, server.url + '/'],
+                                          capture_output=True, text=True, check=True, cwd=root).stdout)
+                for _ in range(args.construction_runs)]
+
+    runs, metrics = measure(server, run, trace_memory=False)
+    steps = {step: round(statistics.median(times[step] for times in runs), 3) for step in ('import', 'construct', 'services')}
+    metrics['seconds'] = round(sum(steps.values()), 3)
+    metrics['steps'] = steps
+
+    return [('construction', f'{args.construction_runs} runs', metrics)]
+
+
+def bench_folders(server, args, num_files, operations):
+    results = []
+    local_folder = tempfile.mkdtemp()
+    download_folder = tempfile.mkdtemp()
+    try:
+        make_folder(local_folder, num_files, args.file_size)
+        folder_id = server.create_folder(name=f'benchmark_{num_files}')
+
+        if 'upload_folder' in operations or 'download_folder' in operations:
+            drive = Drive(credentials(args.mode), root_url=server.url + '/', pool_size=args.pool_size)
+            errors, metrics = measure(server, lambda: drive.upload_folder(local_folder, folder_id, url=False, max_workers=args.max_workers), args.memory)
+            metrics['errors'] = len(errors)
+            if 'upload_folder' in operations:
+                results.append(('upload_folder', f'{num_files} files', metrics))
+
+        if 'download_folder' in operations:
+            drive = Drive(credentials(args.mode), root_url=server.url + '/', pool_size=args.pool_size)
+            _, metrics = measure(server, lambda: drive.download_folder(download_folder, folder_id, url=False, max_workers=args.max_workers), args.memory)
+            downloaded = sum(len(files) for _, _, files in os.walk(download_folder))
+            metrics['errors'] = num_files - downloaded
+            results.append(('download_folder', f'{num_files} files', metrics))
+    finally:
+        shutil.rmtree(local_folder, ignore_errors=True)
+        shutil.rmtree(download_folder, ignore_errors=True)
+
+    return results
+
+
+def bench_sheets(server, args, num_rows, operations):
+    results = []
+    df = make_frame(num_rows, args.cols)
+    spreadsheet_id = server.create_spreadsheet(cols=args.cols)
+
+    if 'df_update' in operations or 'df_download' in operations:
+        drive = Drive(credentials(args.mode), root_url=server.url + '/', pool_size=args.pool_size)
+        _, metrics = measure(server, lambda: drive.df_update(df, spreadsheet_id, 'Sheet1'), args.memory)
+        if 'df_update' in operations:
+            results.append(('df_update', f'{num_rows} rows', metrics))
+
+    if 'df_download' in operations:
+        drive = Drive(credentials(args.mode), root_url=server.url + '/', pool_size=args.pool_size)
+        downloaded, metrics = measure(server, lambda: drive.df_download(spreadsheet_id, 'Sheet1', max_workers=args.max_workers), args.memory)
+        metrics['errors'] = 0 if downloaded is not None and downloaded.shape == df.shape else 1
+        results.append(('df_download', f'{num_rows} rows', metrics))
+
+    return results
+
+
+def print_table(results):
+    print(f"{'operation':<16}{'size':>13}{'requests':>10}{'throttled':>10}{'seconds':>9}{'peak MB':>9}{'sent MB':>9}{'recv MB':>9}{'errors':>8}  requests by method")
+    for operation, size, metrics in results:
+        by_method = ', '.join(f'{method}={count}' for method, count in sorted(metrics['by_method'].items()) if not method.endswith('.throttled'))
+        if 'steps' in metrics:
+            by_method = ', '.join([f'{step} {seconds}s' for step, seconds in metrics['steps'].items()] + ([by_method] if by_method else []))
+        peak = metrics['peak_mb'] if metrics['peak_mb'] != None else '-'
+        print(f"{operation:<16}{size:>13}{metrics['requests']:>10}{metrics['throttled']:>10}{metrics['seconds']:>9}{peak:>9}"
+              f"{metrics['sent_mb']:>9}{metrics['received_mb']:>9}{metrics.get('errors', 0):>8}  {by_method}")
+
+
+def parse_sizes(value):
+    return [int(size) for size in value.split(',') if size]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--operations', default=','.join(OPERATIONS), help='Comma separated operations to run.')
+    parser.add_argument('--files', type=parse_sizes, default=[10, 100, 500], help='Numbers of files of the folder benchmarks.')
+    parser.add_argument('--file-size', type=int, default=64 * 1024, help='Bytes of every file of the folder benchmarks.')
+    parser.add_argument('--rows', type=parse_sizes, default=[1000, 10000, 50000], help='Numbers of DataFrame rows of the sheet benchmarks.')
+    parser.add_argument('--cols', type=int, default=10, help='DataFrame columns of the sheet benchmarks.')
+    parser.add_argument('--max-workers', type=int, default=4, help='max_workers of upload_folder, download_folder and df_download.')
+    parser.add_argument('--pool-size', type=int, default=None, help='Use the pooled transport with this many connections.')
+    parser.add_argument('--mode', choices=('client', 'service'), default='client', help='Credentials type the operations run as.')
+    parser.add_argument('--latency', type=float, default=0.02, help='Seconds the server waits before answering every request.')
+    parser.add_argument('--drive-rate-limit', type=float, default=None, help='Drive requests per minute before the server answers 429.')
+    parser.add_argument('--sheets-rate-limit', type=float, default=None, help='Sheets requests per minute before the server answers 429.')
+    parser.add_argument('--construction-runs', type=int, default=5, help='New interpreters timed by the construction benchmark (the medians are reported).')
+    parser.add_argument('--no-memory', dest='memory', action='store_false', help="Don't trace memory (tracemalloc slows python code down).")
+    parser.add_argument('--json', help='Also write the results to this JSON file.')
+    args = parser.parse_args()
+
+    operations = [operation for operation in args.operations.split(',') if operation]
+    unknown = [operation for operation in operations if operation not in OPERATIONS]
+    if unknown:
+        parser.error(f'Unknown operations: {unknown}. Available: {list(OPERATIONS)}')
+
+    # Parses the discovery documents once, so the first measured operation of each API doesn't pay for it
+    warm_up = Drive(credentials(args.mode))
+    warm_up.drive_service, warm_up.sheets_service
+
+    results = []
+    with FakeServerProcess(latency=args.latency, drive_rate_limit=args.drive_rate_limit, sheets_rate_limit=args.sheets_rate_limit) as server:
+        if 'construction' in operations:
+            results.extend(bench_construction(server, args))
+        if 'upload_folder' in operations or 'download_folder' in operations:
+            for num_files in args.files:
+                results.extend(bench_folders(server, args, num_files, operations))
+        if 'df_update' in operations or 'df_download' in operations:
+            for num_rows in args.rows:
+                results.extend(bench_sheets(server, args, num_rows, operations))
+
+    print_table(results)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'options': {key: value for key, value in vars(args).items() if key != 'json'},
+                       'results': [{'operation': operation, 'size': size, **metrics} for operation, size, metrics in results]}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -19,8 +19,14 @@ setup(
     description='Python package for uploading files and folders to Google Drive.',
     packages=find_packages(include=["Driveup","Driveup.features"]),
     install_requires=[
-        'google-api-python-client',
+        'google-api-python-client>=2.0.0,<3', # Driveup builds on HttpRequest/resumable media internals of the 2.x client
         'google-auth-httplib2',
         'google-auth-oauthlib',
     ],
+    extras_require={
+        'pandas': ['pandas>=2.0'], # DataFrame methods (df_update, df_download...)
+        'arrow': ['pyarrow'],
+        'pool': ['requests'],
+        'async': ['aiohttp'],
+    },
 )
\ No newline at end of file
@@ -0,0 +1,194 @@
+import unittest
+import asyncio
+import contextlib
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import pandas as pd
+import numpy as np
+
+from Driveup.async_drive import AsyncDrive
+from Driveup.features import executor
+from benchmarks.fake_server import ApiError, FakeServer, credentials
+
+CHUNK_SIZE = 256 * 1024
+
+
+class TestAsyncDriveFakeServer(unittest.TestCase):
+    """AsyncDrive methods against benchmarks.fake_server (no credentials or network needed)."""
+    def setUp(self):
+        self.max_backoff = executor.MAX_BACKOFF
+        executor.MAX_BACKOFF = 0
+        # The fake server has no quota, tests don't wait for the one of the real API
+        executor.configure('sheets',6000)
+        self.server = FakeServer().__enter__()
+        self.api = self.server.api
+        self.tmp = tempfile.mkdtemp()
+        self.quiet = contextlib.ExitStack()
+        self.quiet.enter_context(contextlib.redirect_stdout(io.StringIO()))
+        self.quiet.enter_context(contextlib.redirect_stderr(io.StringIO()))
+
+    def tearDown(self):
+        self.quiet.close()
+        self.server.__exit__(None, None, None)
+        shutil.rmtree(self.tmp, ignore_errors=True)
+        executor.MAX_BACKOFF = self.max_backoff
+        executor.configure('sheets',executor.SHEETS_REQUESTS_PER_MINUTE)
+
+    def run_drive(self,function,mode='client'):
+        """Runs function(drive) with an AsyncDrive connected to the fake server and returns its result."""
+        async def main():
+            async with AsyncDrive(credentials(mode), root_url=self.server.url + '/') as drive:
+                return await function(drive)
+        return asyncio.run(main())
+
+    def make_tree(self,name,files):
+        """Writes {relative path: bytes} under a new local folder and returns its path."""
+        root = os.path.join(self.tmp, name)
+        for relative_path,data in files.items():
+            path = os.path.join(root, relative_path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(data)
+        return root
+
+    def local_tree(self,root):
+        """{relative path: md5} of every file under a local folder."""
+        tree = {}
+        for folder,_,names in os.walk(root):
+            for name in names:
+                with open(os.path.join(folder, name), 'rb') as f:
+                    tree[os.path.relpath(os.path.join(folder, name), root).replace(os.sep, '/')] = hashlib.md5(f.read()).hexdigest()
+        return tree
+
+    def fail_once(self,name,condition):
+        """Makes the fake api method name answer a 503 once (after processing the request) when condition(*args) is True."""
+        original = getattr(self.api, name)
+        failures = []
+
+        def method(*args):
+            response = original(*args)
+            if not failures and condition(*args):
+                failures.append(args)
+                raise ApiError(503, 'Backend error', 'backendError')
+            return response
+
+        setattr(self.api, name, method)
+        return failures
+
+    def test_upload_folder_and_download_folder(self):
+        files = {
+            'big.bin': os.urandom(3 * CHUNK_SIZE + 17),
+            'empty.txt': b'',
+            'a/one.txt': b'one',
+            'a/b/two.txt': b'two' * 1000,
+        }
+        local = self.make_tree('local', files)
+        folder = self.api.create_folder(name='target')
+
+        errors = self.run_drive(lambda drive: drive.upload_folder(local, folder, url=False, chunk_size=CHUNK_SIZE))
+        self.assertEqual(errors, {})
+
+        target = os.path.join(self.tmp, 'downloaded')
+        os.makedirs(target)
+        counts = self.run_drive(lambda drive: drive.download_folder(target, folder, url=False, chunk_size=CHUNK_SIZE))
+
+        self.assertEqual(counts, (4, 4))
+        self.assertEqual(self.local_tree(target), {path: hashlib.md5(data).hexdigest() for path,data in files.items()})
+
+    def test_service_upload_parents(self):
+        folder = self.api.create_folder(name='target')
+        local = self.make_tree('local', {'one.txt': b'one', 'two.txt': b'two'})
+
+        errors = self.run_drive(lambda drive: drive.upload([os.path.join(local, 'one.txt'), os.path.join(local, 'two.txt')], folder, url=False, progress=False), mode='service')
+
+        self.assertEqual(errors, {})
+        self.assertEqual(sorted((file['name'], file['parents']) for file in self.api.files.values() if file['name'].endswith('.txt')),
+                         [('one.txt', [folder]), ('two.txt', [folder])])
+        self.assertEqual(self.api.stats['drive.files.update'], 0)
+
+    def test_upload_and_update_resume_after_chunk_error(self):
+        folder = self.api.create_folder(name='target')
+        path = os.path.join(self.tmp, 'file.bin')
+
+        for data,content_range in ((os.urandom(3 * CHUNK_SIZE + 17), 'bytes 262144-'), (os.urandom(2 * CHUNK_SIZE + 5), 'bytes 0-')):
+            with open(path, 'wb') as f:
+                f.write(data)
+            # The chunk is stored, but its response is lost
+            failures = self.fail_once('_upload_chunk', lambda upload_id,headers,body: headers.get('content-range', '').startswith(content_range))
+
+            file = self.run_drive(lambda drive: drive.upload(path, folder, url=False, chunk_size=CHUNK_SIZE, progress=False))
+
+            self.assertEqual(len(failures), 1)
+            self.assertEqual(self.api.content[file['id']], data)
+            del self.api._upload_chunk
+
+        self.assertEqual([file['name'] for file in self.api.files.values() if folder in file['parents']], ['file.bin'])
+        self.assertEqual(self.api.stats['drive.upload.status'], 2)
+
+    def test_download_resumes_after_chunk_error(self):
+        data = os.urandom(2 * CHUNK_SIZE + 5)
+        file_id = self.api.create_file('file.bin', data)
+        failures = self.fail_once('_media', lambda file_id,query: (query.get('_range_header') or '').startswith(f'bytes={CHUNK_SIZE}-'))
+        path = os.path.join(self.tmp, 'file.bin')
+
+        downloaded = self.run_drive(lambda drive: drive.download(file_id, path, chunk_size=CHUNK_SIZE, progress=False))
+
+        self.assertEqual(downloaded, path)
+        self.assertEqual(len(failures), 1)
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), data)
+        self.assertEqual(self.api.stats['drive.files.get_media'], 4)
+
+    def test_download_restarts_when_range_is_ignored(self):
+        data = os.urandom(2 * CHUNK_SIZE + 5)
+        file_id = self.api.create_file('file.bin', data)
+        self.api.files[file_id].pop('md5Checksum', None)
+        self.api._media = lambda file_id,query: (200, {'Content-Type': 'application/octet-stream'}, self.api.content[file_id])
+        path = os.path.join(self.tmp, 'file.bin')
+        with open(path + '.part', 'wb') as f:
+            f.write(data[:1000])
+
+        downloaded = self.run_drive(lambda drive: drive.download(file_id, path, chunk_size=CHUNK_SIZE, progress=False))
+
+        self.assertEqual(downloaded, path)
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), data)
+
+    def test_download_folder_same_names(self):
+        root = self.api.create_folder(name='root')
+        subfolder = self.api.create_folder(name='sub', parent=root)
+        contents = [os.urandom(1000 + i) for i in range(3)]
+        for data,parent in zip(contents,(root, root, subfolder)):
+            self.api.create_file('same.bin', data, parent=parent)
+        # Google document with an extension it can't be exported to
+        self.api.create_file('bad.xyz', b'', parent=root, mime_type='application/vnd.google-apps.document')
+
+        target = os.path.join(self.tmp, 'downloaded')
+        os.makedirs(target)
+        counts = self.run_drive(lambda drive: drive.download_folder(target, root, recursive=False, url=False))
+
+        self.assertEqual(counts, (4, 3))
+        self.assertEqual(sorted(os.listdir(target)), ['same (1).bin', 'same (2).bin', 'same.bin'])
+        self.assertEqual(sorted(self.local_tree(target).values()), sorted(hashlib.md5(data).hexdigest() for data in contents))
+
+    def test_df_update_and_df_download(self):
+        spreadsheet = self.api.create_spreadsheet(sheets=('One', "Two's"), rows=10, cols=3)
+        df = pd.DataFrame(np.random.randint(0, 1000, (2500, 4)), columns=['a', 'b', 'c', 'd'])
+
+        self.run_drive(lambda drive: drive.df_update(df, spreadsheet, "Two's", chunk_size=1000, max_payload_bytes=20000))
+
+        values = self.api.spreadsheets[spreadsheet][1]['values']
+        self.assertEqual(values[0], ['a', 'b', 'c', 'd'])
+        self.assertEqual(len(values), 2501)
+        self.assertGreater(self.api.stats['sheets.values.batchUpdate'], 1)
+
+        downloaded = self.run_drive(lambda drive: drive.df_download(spreadsheet, "Two's", block_size=1000, max_concurrency=3, infer_dtypes=True))
+
+        pd.testing.assert_frame_equal(downloaded, df, check_dtype=False)
+
+
+if __name__ == '__main__':
+    unittest.main()
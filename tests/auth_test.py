@@ -1,7 +1,12 @@
 import unittest
 import os
+import json
+import tempfile
+import threading
+import logging
+from unittest import mock
 
-from Driveup.features import auth
+from Driveup.features import auth,metrics
 
 tests_dir = os.path.dirname(os.path.abspath(__file__)) # Driveup/tests/
 
@@ -21,6 +26,86 @@ class TestAuth(unittest.TestCase):
         
         self.assertEqual(credentials["type"], 'client')
 
+class TestTokenStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.token_path = os.path.join(self.tmp_dir.name,"token.json")
+        self.secret = {'installed': {'client_id': 'test_client_id', 'client_secret': 'test_secret', 'token_uri': 'https://oauth2.googleapis.com/token'}}
+        self.token_info = {'token': 'test_token', 'refresh_token': 'test_refresh_token', 'client_id': 'test_client_id',
+                           'client_secret': 'test_secret', 'expiry': '2999-01-01T00:00:00Z'}
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_save_and_load(self):
+        store = auth.TokenStore(self.token_path)
+        with store.lock():
+            store.save(auth.UserCredentials.from_authorized_user_info(self.token_info))
+
+        credentials = store.load(auth.SCOPES)
+
+        self.assertEqual(credentials.token, 'test_token')
+        self.assertEqual(credentials.refresh_token, 'test_refresh_token')
+        self.assertIs(credentials.token_store, store)
+
+    def test_authorize_reuses_saved_token(self):
+        with open(self.token_path, 'w') as f:
+            json.dump(self.token_info, f)
+
+        credentials = auth.authorize(self.secret,token_path=self.token_path)
+
+        self.assertEqual(credentials['type'], 'client')
+        self.assertEqual(credentials['creds'].token, 'test_token')
+        self.assertIs(auth.authorize(self.secret,token_path=self.token_path)['creds'], credentials['creds'])
+
+    def test_failed_refresh_is_logged(self):
+        with open(self.token_path, 'w') as f:
+            json.dump({**self.token_info, 'expiry': '2000-01-01T00:00:00Z'}, f)
+        flow = mock.Mock(run_local_server=lambda port = 0: auth.UserCredentials.from_authorized_user_info(self.token_info))
+        logger = logging.getLogger('driveup_auth_test')
+        metrics.set_logger(logger)
+
+        try:
+            with mock.patch.object(auth.UserCredentials,'refresh',side_effect=auth.RefreshError('revoked')), \
+                 mock.patch.object(auth.InstalledAppFlow,'from_client_config',return_value=flow), \
+                 self.assertLogs(logger,'WARNING') as logs:
+                credentials = auth.authorize(self.secret,token_path=self.token_path)
+        finally:
+            metrics.set_logger(None)
+
+        self.assertEqual(credentials['creds'].token, 'test_token')
+        self.assertEqual(logs.records[0].fields, {'token_path': self.token_path})
+
+    def test_browser_flow_does_not_block_other_secrets(self):
+        with open(self.token_path, 'w') as f:
+            json.dump(self.token_info, f)
+        other_secret = {'installed': {**self.secret['installed'], 'client_id': 'other_client_id'}}
+        other_token_path = os.path.join(self.tmp_dir.name,"other_token.json")
+        flow_started = threading.Event()
+        flow_released = threading.Event()
+        flow_finished = threading.Event()
+
+        def run_local_server(port = 0):
+            flow_started.set()
+            flow_released.wait(10)
+            flow_finished.set()
+            return auth.UserCredentials.from_authorized_user_info(self.token_info)
+
+        flow = mock.Mock(run_local_server=run_local_server)
+        with mock.patch.object(auth.InstalledAppFlow,'from_client_config',return_value=flow):
+            waiting = threading.Thread(target=auth.authorize,args=(other_secret,),kwargs={'token_path': other_token_path})
+            waiting.start()
+            self.assertTrue(flow_started.wait(10))
+            try:
+                credentials = auth.authorize(self.secret,token_path=self.token_path)
+                self.assertFalse(flow_finished.is_set())
+            finally:
+                flow_released.set()
+                waiting.join(10)
+
+        self.assertEqual(credentials['creds'].token, 'test_token')
+        self.assertTrue(os.path.exists(other_token_path))
+
 
 if __name__ == "__main__":
     unittest.main()
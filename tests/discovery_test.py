@@ -0,0 +1,38 @@
+import unittest
+
+import httplib2
+from googleapiclient import discovery as google_discovery
+
+from Driveup.features import discovery
+
+# Methods of the API clients that Driveup calls
+DRIVE_METHODS = {'files': ('create', 'get', 'get_media', 'export_media', 'list', 'update')}
+SHEETS_METHODS = {'spreadsheets': ('get', 'batchUpdate', 'values')}
+SHEETS_VALUES_METHODS = ('get', 'batchGet', 'update', 'batchUpdate', 'append', 'clear')
+
+
+class TestDiscovery(unittest.TestCase):
+    def test_built_clients_have_driveup_methods(self):
+        drive = discovery.build('drive','v3',http=httplib2.Http())
+        sheets = discovery.build('sheets','v4',http=httplib2.Http())
+
+        for client,methods in ((drive,DRIVE_METHODS),(sheets,SHEETS_METHODS)):
+            for resource,names in methods.items():
+                for name in names:
+                    self.assertTrue(callable(getattr(getattr(client,resource)(),name,None)),f'{resource}.{name}')
+        for name in SHEETS_VALUES_METHODS:
+            self.assertTrue(callable(getattr(sheets.spreadsheets().values(),name,None)),f'spreadsheets.values.{name}')
+
+    def test_requests_match_googleapiclient(self):
+        drive = discovery.build('drive','v3',root_url='http://localhost:8080/',http=httplib2.Http())
+        reference = google_discovery.build_from_document(discovery.get_document('drive','v3','http://localhost:8080/'),http=httplib2.Http())
+
+        for client in (drive,reference):
+            request = client.files().list(q="name = 'file'",fields='files(id)')
+            self.assertEqual(request.methodId,'drive.files.list')
+        self.assertEqual(drive.files().list(q="name = 'file'").uri,reference.files().list(q="name = 'file'").uri)
+        self.assertTrue(drive.files().list(q="name = 'file'").uri.startswith('http://localhost:8080/drive/v3/files?'))
+
+
+if __name__ == '__main__':
+    unittest.main()
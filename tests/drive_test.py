@@ -1,11 +1,22 @@
 import unittest
+import contextlib
+import hashlib
+import io
 import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
 import pandas as pd
 
 import numpy as np
 
+from googleapiclient.errors import HttpError
 from Driveup.drive import Drive
+from Driveup.features import executor
 from Driveup.features.auth import authorize
+from benchmarks.fake_server import FakeServer, credentials
 
 
 tests_dir = os.path.dirname(os.path.abspath(__file__)) # Driveup/tests/
@@ -199,6 +210,220 @@ class TestDrive(unittest.TestCase):
 
         
         
+class TestImport(unittest.TestCase):
+    def test_import_is_lazy(self):
+        # In a new interpreter, so modules imported by other tests don't count
+        code = "import sys, Driveup.drive; print(sorted(m for m in ('pandas', 'numpy', 'tqdm', 'aiohttp') if m in sys.modules))"
+        output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(tests_dir)).stdout
+
+        self.assertEqual(output.strip(), '[]')
+
+class TestDriveFakeServer(unittest.TestCase):
+    """Drive methods against benchmarks.fake_server (no credentials or network needed)."""
+    def setUp(self):
+        # The fake server has no quota, tests don't wait for the one of the real API
+        executor.configure('sheets',6000)
+        self.server = FakeServer().__enter__()
+        self.api = self.server.api
+        self.tmp = tempfile.mkdtemp()
+        self.quiet = contextlib.ExitStack()
+        self.quiet.enter_context(contextlib.redirect_stdout(io.StringIO()))
+        self.quiet.enter_context(contextlib.redirect_stderr(io.StringIO()))
+
+    def tearDown(self):
+        self.quiet.close()
+        self.server.__exit__(None, None, None)
+        shutil.rmtree(self.tmp, ignore_errors=True)
+        executor.configure('sheets',executor.SHEETS_REQUESTS_PER_MINUTE)
+
+    def drive(self,mode='client'):
+        return Drive(credentials(mode), root_url=self.server.url + '/')
+
+    def make_tree(self,name,files):
+        """Writes {relative path: bytes} under a new local folder and returns its path."""
+        root = os.path.join(self.tmp, name)
+        for relative_path,data in files.items():
+            path = os.path.join(root, relative_path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(data)
+        return root
+
+    def drive_tree(self,folder_id,prefix=''):
+        """{relative path: md5} of every file under a fake drive folder."""
+        tree = {}
+        for file in list(self.api.files.values()):
+            if folder_id in file['parents'] and not file['trashed']:
+                path = prefix + file['name']
+                if file['mimeType'] == 'application/vnd.google-apps.folder':
+                    tree.update(self.drive_tree(file['id'], path + '/'))
+                else:
+                    tree[path] = hashlib.md5(self.api.content[file['id']]).hexdigest()
+        return tree
+
+    def test_upload_folder_parallel(self):
+        files = {'test_file1.csv': b'a,b\n1,2\n', 'big.bin': os.urandom(600000), 'sub/test_file2.csv': b'c\n3\n', 'sub/deeper/empty.txt': b''}
+        local = self.make_tree('test_folder', files)
+
+        for mode in ('client', 'service'):
+            folder = self.api.create_folder(name=mode)
+            errors = self.drive(mode).upload_folder(local, folder, url=False, max_workers=4, chunk_size=256 * 1024)
+
+            self.assertEqual(errors, {})
+            self.assertEqual(self.drive_tree(folder), {path: hashlib.md5(data).hexdigest() for path,data in files.items()})
+
+    def test_download_folder_parallel(self):
+        root = self.api.create_folder(name='test_folder')
+        subfolder = self.api.create_folder(name='sub', parent=root)
+        files = {'test_file1.csv': (b'a,b\n1,2\n', root), 'big.bin': (os.urandom(600000), root), 'sub/test_file2.csv': (b'c\n3\n', subfolder)}
+        for path,(data,parent) in files.items():
+            self.api.create_file(os.path.basename(path), data, parent=parent)
+
+        found,downloaded = self.drive().download_folder(self.tmp, root, subfolder=True, url=False, max_workers=4, chunk_size=256 * 1024)
+
+        self.assertEqual((found, downloaded), (3, 3))
+        for path,(data,_) in files.items():
+            with open(os.path.join(self.tmp, 'test_folder', path), 'rb') as f:
+                self.assertEqual(hashlib.md5(f.read()).hexdigest(), hashlib.md5(data).hexdigest())
+
+    def test_concurrent_upload_folders(self):
+        drive = self.drive()
+        trees = {
+            name: {f'{name}_{i}.bin': os.urandom(1000 + i) for i in range(8)} | {f'sub/{name}.txt': name.encode()}
+            for name in ('one', 'two')
+        }
+        folder_ids = {name: self.api.create_folder(name=name) for name in trees}
+        results = {}
+
+        def upload(name):
+            results[name] = drive.upload_folder(self.make_tree(name, trees[name]), folder_ids[name], url=False, max_workers=3)
+
+        threads = [threading.Thread(target=upload, args=(name,)) for name in trees]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for name,files in trees.items():
+            self.assertEqual(results[name], {})
+            self.assertEqual(self.drive_tree(folder_ids[name]), {path: hashlib.md5(data).hexdigest() for path,data in files.items()})
+
+    def test_upload_without_update_creates_copies(self):
+        local = self.make_tree('copies', {'report.txt': b'report'})
+        folder = self.api.create_folder(name='copies')
+        drive = self.drive()
+
+        for _ in range(2):
+            drive.upload(os.path.join(local, 'report.txt'), folder, update=False)
+
+        copies = [file for file in self.api.files.values() if folder in file['parents']]
+        self.assertEqual([file['name'] for file in copies], ['report.txt', 'report.txt'])
+        self.assertEqual([self.api.content[file['id']] for file in copies], [b'report', b'report'])
+
+    def test_upload_folder_reports_failed_moves(self):
+        local = self.make_tree('moves', {'a.txt': b'a', 'b.txt': b'b', 'sub/c.txt': b'c'})
+        patch = self.api._patch
+
+        def failing_patch(meta,changes,query):
+            if meta['name'] == 'b.txt' and query.get('addParents'):
+                raise ValueError('Move rejected')
+            patch(meta,changes,query)
+        self.api._patch = failing_patch
+
+        for max_workers in (1, 3):
+            folder = self.api.create_folder(name=f'moves_{max_workers}')
+            errors = self.drive('service').upload_folder(local, folder, max_workers=max_workers)
+
+            self.assertEqual([os.path.normpath(path) for path in errors], [os.path.join(local, 'b.txt')])
+            self.assertEqual(set(self.drive_tree(folder)), {'a.txt', 'b.txt', 'sub/c.txt'})
+
+    def test_df_update_diff_keeps_dates(self):
+        spreadsheet = self.api.create_spreadsheet(rows=10, cols=5)
+        df = pd.DataFrame({
+            'id': [1, 2, 3],
+            'when': pd.to_datetime(['2024-01-01 08:30:15', None, '2031-12-31 23:59:59']),
+        })
+        drive = self.drive()
+        drive.df_update(df, spreadsheet, 'Sheet1')
+
+        self.api.reset_stats()
+        drive.df_update(df, spreadsheet, 'Sheet1', diff=True)
+        self.assertEqual(self.api.stats['sheets.values.batchUpdate'], 0)
+
+        df.loc[2, 'when'] = pd.Timestamp('2032-01-01 00:00:00')
+        drive.df_update(df, spreadsheet, 'Sheet1', diff=True)
+        self.assertEqual(self.api.stats['sheets.values.batchUpdate'], 1)
+        self.assertEqual(self.api.spreadsheets[spreadsheet][0]['values'][3][1].text, '1/1/2032 0:00:00')
+
+    def test_df_upsert_keys(self):
+        spreadsheet = self.api.create_spreadsheet(rows=10, cols=3)
+        sheet = self.api.spreadsheets[spreadsheet][0]
+        # Text key with leading zeros, and a row with a blank key at the bottom
+        sheet['values'] = [['value', 'id', 'notes'], ['a', '007', 'kept'], ['b', 2, 'kept'], ['blank key', '', 'kept']]
+        read_ranges = []
+        read = self.api._read
+        self.api._read = lambda spreadsheet_id,a1,query: read_ranges.append(a1) or read(spreadsheet_id,a1,query)
+
+        self.drive().df_upsert(pd.DataFrame({'id': [7, 2.0], 'value': ['new', 'B']}), spreadsheet, 'Sheet1', 'id')
+
+        self.assertEqual(read_ranges, ["'Sheet1'!1:1", "'Sheet1'!B:B"])
+        self.assertEqual(sheet['values'][:5], [['value', 'id', 'notes'], ['a', '007', 'kept'], ['B', 2, 'kept'], ['blank key', '', 'kept'], ['new', 7]])
+        self.assertEqual(self.api.stats['sheets.values.append'], 1)
+        with self.assertRaises(ValueError):
+            self.drive().df_upsert(pd.DataFrame({'code': [1]}), spreadsheet, 'Sheet1', 'code')
+
+    def test_df_download_errors(self):
+        spreadsheet = self.api.create_spreadsheet(rows=4, cols=2)
+        drive = self.drive()
+
+        self.assertIsNone(drive.df_download(spreadsheet, 'Missing'))
+        with self.assertRaises(HttpError) as error:
+            drive.df_download('missing_spreadsheet', 'Sheet1')
+        self.assertEqual(error.exception.resp.status, 404)
+
+    def test_sheet_changed_by_others_while_cached(self):
+        spreadsheet = self.api.create_spreadsheet(rows=4, cols=2)
+        sheet = self.api.spreadsheets[spreadsheet][0]
+        sheet['values'] = [['a', 'b'], [1, 2]]
+        drive = self.drive()
+        drive.df_download(spreadsheet, 'Sheet1')
+
+        # Grid widened and filled by someone else while the metadata is cached
+        sheet['properties']['gridProperties'].update({'rowCount': 12, 'columnCount': 6})
+        sheet['values'] = [['a', 'b', 'c', 'd', 'e', 'f']] + [[row] * 6 for row in range(1, 12)]
+
+        for block_size in (10000, 5):
+            df = drive.df_download(spreadsheet, 'Sheet1', block_size=block_size)
+            self.assertEqual(df.shape, (11, 6))
+
+        drive.df_update(pd.DataFrame({'a': [1], 'b': [2], 'c': [3]}), spreadsheet, 'Sheet1', reset_sheet_structure=False)
+        self.assertEqual(sheet['properties']['gridProperties'], {'rowCount': 12, 'columnCount': 6})
+
+    def test_download_folder_same_names(self):
+        root = self.api.create_folder(name='root')
+        subfolder = self.api.create_folder(name='sub', parent=root)
+        contents = [os.urandom(600000) for _ in range(3)]
+        for data,parent in zip(contents,(root, root, subfolder)):
+            self.api.create_file('same.bin', data, parent=root if parent == root else subfolder)
+        # Google document with an extension it can't be exported to
+        self.api.create_file('bad.xyz', b'', parent=root, mime_type='application/vnd.google-apps.document')
+
+        for max_workers in (1, 4):
+            target = os.path.join(self.tmp, f'download_{max_workers}')
+            os.makedirs(target)
+            found,downloaded = self.drive().download_folder(target, root, recursive=False, url=False, max_workers=max_workers, chunk_size=256 * 1024)
+
+            self.assertEqual((found, downloaded), (4, 3))
+            self.assertEqual(sorted(os.listdir(target)), ['same (1).bin', 'same (2).bin', 'same.bin'])
+            downloaded_md5 = []
+            for name in os.listdir(target):
+                with open(os.path.join(target, name), 'rb') as f:
+                    downloaded_md5.append(hashlib.md5(f.read()).hexdigest())
+            downloaded_md5.sort()
+            self.assertEqual(downloaded_md5, sorted(hashlib.md5(data).hexdigest() for data in contents))
+
+
 if __name__ == "__main__":
     unittest.main()
     # Auth tests can't be tested simultaneously (API conflict)
\ No newline at end of file
@@ -0,0 +1,94 @@
+import unittest
+import asyncio
+import json
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+from Driveup.features import executor
+
+
+def http_error(status,reason = None):
+    content = json.dumps({'error': {'code': status, 'errors': [{'reason': reason}]}}).encode()
+    return HttpError(httplib2.Response({'status': status}),content)
+
+
+class TestExecutor(unittest.TestCase):
+    def setUp(self):
+        self.max_backoff = executor.MAX_BACKOFF
+        executor.MAX_BACKOFF = 0
+        executor.configure('drive',6000)
+
+    def tearDown(self):
+        executor.MAX_BACKOFF = self.max_backoff
+        executor.configure('drive',executor.DRIVE_REQUESTS_PER_MINUTE)
+
+    def test_is_retryable(self):
+        self.assertTrue(executor.is_rate_limit(http_error(429)))
+        self.assertTrue(executor.is_rate_limit(http_error(403,'userRateLimitExceeded')))
+        self.assertFalse(executor.is_retryable(http_error(403,'insufficientFilePermissions')))
+        self.assertTrue(executor.is_retryable(http_error(503)))
+        self.assertFalse(executor.is_retryable(http_error(404)))
+
+    def test_bucket_bursts_a_few_seconds_of_quota(self):
+        bucket = executor.TokenBucket(600)
+
+        self.assertEqual(bucket.capacity,10 * executor.BURST_SECONDS)
+        for _ in range(int(bucket.capacity)):
+            self.assertIsNone(bucket._take(1))
+        self.assertGreater(bucket._take(1),0)
+        self.assertEqual(executor.TokenBucket(executor.SHEETS_REQUESTS_PER_MINUTE).capacity,executor.BURST_SECONDS)
+
+    def test_call_retries_and_adapts_rate(self):
+        errors = [http_error(429),http_error(500)]
+
+        def request():
+            if errors:
+                raise errors.pop(0)
+            return 'response'
+
+        self.assertEqual(executor.call(request,'drive'),'response')
+        limiter = executor.LIMITERS['drive']
+        self.assertLess(limiter.rate,limiter.max_rate)
+
+    def test_call_raises_permanent_errors(self):
+        def request():
+            raise http_error(404)
+
+        with self.assertRaises(HttpError):
+            executor.call(request,'drive')
+
+    def test_call_retries_creates_only_on_rate_limits(self):
+        for error,calls in ((http_error(503),1),(ConnectionError('reset'),1),(http_error(403,'rateLimitExceeded'),2)):
+            errors = [error]
+            sent = []
+
+            def request():
+                sent.append(True)
+                if errors:
+                    raise errors.pop(0)
+                return 'response'
+
+            try:
+                executor.call(request,'drive',method='drive.files.create')
+            except Exception as e:
+                self.assertIs(e,error)
+            self.assertEqual(len(sent),calls)
+
+        self.assertFalse(executor.is_retryable(http_error(500),idempotent=False))
+        self.assertTrue(executor.is_retryable(http_error(429),idempotent=False))
+
+    def test_call_async_retries(self):
+        errors = [http_error(503),ConnectionError('reset')]
+
+        async def request():
+            if errors:
+                raise errors.pop(0)
+            return 'response'
+
+        self.assertEqual(asyncio.run(executor.call_async(request,'drive')),'response')
+        self.assertEqual(errors,[])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+import os
+import tempfile
+
+from Driveup.features import manifest
+
+
+class TestManifest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.tmp_dir.name,"file.csv")
+        self.manifest_path = os.path.join(self.tmp_dir.name,"manifest.json")
+
+        with open(self.file_path, 'w') as f:
+            f.write("a,b\n1,2\n")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_is_unchanged(self):
+        remote_metadata = {'size': str(os.path.getsize(self.file_path)), 'md5Checksum': manifest.file_md5(self.file_path)}
+
+        self.assertTrue(manifest.is_unchanged(self.file_path,remote_metadata))
+        self.assertFalse(manifest.is_unchanged(self.file_path,{**remote_metadata, 'md5Checksum': '0'}))
+        self.assertFalse(manifest.is_unchanged(self.file_path,{'mimeType': 'application/vnd.google-apps.spreadsheet'}))
+
+    def test_record_and_reload(self):
+        upload_manifest = manifest.Manifest(self.manifest_path)
+        upload_manifest.record(self.file_path,'drive_file_id')
+        upload_manifest.save()
+
+        reloaded = manifest.Manifest(self.manifest_path)
+        entry = reloaded.entries[os.path.abspath(self.file_path)]
+
+        self.assertEqual(entry['id'], 'drive_file_id')
+        self.assertEqual(entry['md5'], manifest.file_md5(self.file_path))
+
+    def test_md5_is_cached_while_file_is_unchanged(self):
+        upload_manifest = manifest.Manifest(self.manifest_path)
+        upload_manifest.md5(self.file_path)
+
+        # A stale checksum is returned as long as mtime and size don't change
+        upload_manifest.entries[os.path.abspath(self.file_path)]['md5'] = 'cached'
+
+        self.assertEqual(upload_manifest.md5(self.file_path), 'cached')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+import contextlib
+import io
+import logging
+
+from googleapiclient.errors import HttpError
+from googleapiclient.http import HttpMockSequence, HttpRequest
+from googleapiclient.model import JsonModel
+
+from Driveup.features import executor,metrics
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.max_backoff = executor.MAX_BACKOFF
+        executor.MAX_BACKOFF = 0
+        metrics.REGISTRY.reset()
+        self.records = []
+        metrics.add_hook(self.records.append)
+
+    def tearDown(self):
+        executor.MAX_BACKOFF = self.max_backoff
+        metrics.remove_hook(self.records.append)
+        metrics.REGISTRY.reset()
+        metrics.set_logger(None)
+
+    def test_histogram_quantiles(self):
+        histogram = metrics.Histogram((0.1,1,10))
+        for value in (0.05,0.05,0.5,0.5,0.5,20):
+            histogram.observe(value)
+
+        self.assertEqual(histogram.quantile(0.3),0.1)
+        self.assertEqual(histogram.quantile(0.5),1)
+        self.assertEqual(histogram.quantile(1),20)
+        self.assertEqual(histogram.as_dict()['buckets'],{'0.1': 2,'1': 3,'10': 0,'inf': 1})
+
+    def test_execute_records_call(self):
+        http = HttpMockSequence([
+            ({'status': '429'}, b'{"error": {"code": 429, "errors": []}}'),
+            ({'status': '200'}, b'{"id": "file_id"}'),
+        ])
+        request = HttpRequest(http,JsonModel().response,'https://www.googleapis.com/drive/v3/files',
+                              method='POST',body='{"name": "file"}',methodId='drive.files.create')
+
+        self.assertEqual(executor.execute(request),{'id': 'file_id'})
+
+        record = self.records[0]
+        self.assertEqual((record.method,record.status,record.retries,record.requests),('drive.files.create',200,1,2))
+        self.assertEqual(record.bytes_sent,2 * len('{"name": "file"}'))
+        self.assertEqual(record.bytes_received,len(b'{"error": {"code": 429, "errors": []}}') + len(b'{"id": "file_id"}'))
+
+        stats = metrics.REGISTRY.snapshot()['drive.files.create']
+        self.assertEqual((stats['calls'],stats['errors'],stats['retries'],stats['throttled'],stats['latency']['count']),(1,0,1,1,1))
+
+    def test_execute_does_not_repeat_create_after_server_error(self):
+        http = HttpMockSequence([
+            ({'status': '503'}, b'{"error": {"code": 503, "errors": []}}'),
+            ({'status': '200'}, b'{"id": "file_id"}'),
+        ])
+        request = HttpRequest(http,JsonModel().response,'https://www.googleapis.com/drive/v3/files',
+                              method='POST',body='{"name": "file"}',methodId='drive.files.create')
+
+        with self.assertRaises(HttpError):
+            executor.execute(request)
+
+        record = self.records[0]
+        self.assertEqual((record.status,record.retries,record.requests),(503,0,1))
+
+    def test_log_uses_logger(self):
+        with contextlib.redirect_stdout(io.StringIO()) as stdout:
+            metrics.log('Printed message')
+        self.assertEqual(stdout.getvalue(),'Printed message\n')
+
+        logger = logging.getLogger('driveup_metrics_test')
+        with self.assertLogs(logger,'WARNING') as logs:
+            metrics.set_logger(logger)
+            metrics.log('Logged message','warning',file_id='id')
+        self.assertEqual(logs.records[0].getMessage(),'Logged message')
+        self.assertEqual(logs.records[0].fields,{'file_id': 'id'})
@@ -0,0 +1,85 @@
+import unittest
+import io
+import os
+import tempfile
+
+from googleapiclient.http import HttpMockSequence, HttpRequest, MediaFileUpload
+from googleapiclient.model import JsonModel
+
+from Driveup.features import resumable
+
+
+class TestResumable(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.tmp_dir.name,"file.bin")
+        with open(self.file_path, 'wb') as f:
+            f.write(os.urandom(300000))
+
+        self.session_store = resumable.SessionStore(os.path.join(self.tmp_dir.name,"sessions.json"))
+        self.key = resumable.session_key(self.file_path,'create:folder/file.bin')
+        self.session_store.set(self.key,'https://upload.example/session',0)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def create_request(self,http):
+        media = MediaFileUpload(self.file_path, chunksize=resumable.CHUNK_SIZE_UNIT, resumable=True)
+        return HttpRequest(http,JsonModel().response,'https://www.googleapis.com/upload/drive/v3/files?uploadType=resumable',
+                           method='POST',body='{"name": "file.bin"}',headers={'content-type': 'application/json'},
+                           methodId='drive.files.create',resumable=media)
+
+    def test_upload_resumes_saved_session(self):
+        http = HttpMockSequence([
+            ({'status': '308', 'range': 'bytes=0-262143'}, b''),
+            ({'status': '200'}, b'{"id": "file_id"}'),
+        ])
+
+        response = resumable.upload_chunks(self.create_request(http),session_store=self.session_store,key=self.key)
+
+        self.assertEqual(response,{'id': 'file_id'})
+        (_,_,_,query_headers),(uri,_,_,chunk_headers) = http.request_sequence
+        self.assertEqual(query_headers['Content-Range'],'bytes */300000')
+        self.assertEqual((uri,chunk_headers['Content-Range']),('https://upload.example/session','bytes 262144-299999/300000'))
+        self.assertEqual(self.session_store.get(self.key),None)
+
+    def test_upload_restarts_expired_session(self):
+        http = HttpMockSequence([
+            ({'status': '404'}, b'{"error": {"code": 404, "errors": []}}'),
+            ({'status': '200', 'location': 'https://upload.example/new_session'}, b''),
+            ({'status': '308', 'range': 'bytes=0-262143'}, b''),
+            ({'status': '200'}, b'{"id": "file_id"}'),
+        ])
+
+        response = resumable.upload_chunks(self.create_request(http),session_store=self.session_store,key=self.key)
+
+        self.assertEqual(response,{'id': 'file_id'})
+        self.assertEqual([uri for uri,_,_,_ in http.request_sequence[2:]],['https://upload.example/new_session'] * 2)
+        self.assertEqual(http.request_sequence[2][3]['Content-Range'],'bytes 0-262143/300000')
+
+    def test_range_download_continues_at_offset(self):
+        http = HttpMockSequence([
+            ({'status': '206', 'content-range': 'bytes 5-9/10'}, b'56789'),
+        ])
+        request = HttpRequest(http,None,'https://www.googleapis.com/drive/v3/files/file_id?alt=media',methodId='drive.files.get')
+        fh = io.BytesIO(b'01234')
+        fh.seek(5)
+
+        status,done = resumable.MediaRangeDownload(fh,request,chunksize=1024,offset=5).next_chunk()
+
+        self.assertEqual((status.resumable_progress,status.total_size,done),(10,10,True))
+        self.assertEqual(http.request_sequence[0][3]['range'],'bytes=5-1028')
+        self.assertEqual(fh.getvalue(),b'0123456789')
+
+    def test_range_download_rewrites_whole_file(self):
+        http = HttpMockSequence([
+            ({'status': '200', 'content-length': '10'}, b'0123456789'),
+        ])
+        request = HttpRequest(http,None,'https://www.googleapis.com/drive/v3/files/file_id?alt=media',methodId='drive.files.get')
+        fh = io.BytesIO(b'xxxxx')
+        fh.seek(5)
+
+        status,done = resumable.MediaRangeDownload(fh,request,chunksize=1024,offset=5).next_chunk()
+
+        self.assertTrue(done)
+        self.assertEqual(fh.getvalue(),b'0123456789')
@@ -0,0 +1,123 @@
+import unittest
+import json
+
+import numpy as np
+import pandas as pd
+
+from Driveup.features import sheets
+
+
+class TestSheets(unittest.TestCase):
+    def setUp(self):
+        self.df = pd.DataFrame({
+            'int': np.array([1, 2, 3], dtype='int64'),
+            'float': [1.5, np.nan, 3.0],
+            'bool': [True, False, True],
+            'str': ['a', None, 'c'],
+            'date': pd.to_datetime(['2024-01-01', None, '2024-01-03']),
+            'cat': pd.Categorical(['x', None, 'y']),
+        })
+
+    def test_iter_rows(self):
+        rows = [row for chunk in sheets.iter_rows(self.df,2) for row in chunk]
+
+        self.assertEqual(rows, [
+            [1, 1.5, True, 'a', '2024-01-01 00:00:00', 'x'],
+            [2, '', False, '', '', ''],
+            [3, 3.0, True, 'c', '2024-01-03 00:00:00', 'y'],
+        ])
+        # Values must be plain python objects
+        json.dumps(rows)
+
+    def test_iter_rows_unformat(self):
+        rows = [row for chunk in sheets.iter_rows(self.df,10,unformat=True) for row in chunk]
+
+        self.assertEqual(rows[1], ['2', 'NULL', 'False', 'NULL', 'NULL', 'NULL'])
+        self.assertEqual(rows[0][:3], ['1', '1.5', 'True'])
+        # Dates keep the format of DataFrame.astype(str): without time only if every time is midnight
+        self.assertEqual(rows[0][4], '2024-01-01')
+        with_time = sheets.serialize_column(pd.Series(pd.to_datetime(['2024-01-01 00:00:00', '2024-01-02 10:30:00'])),unformat=True)
+        self.assertEqual(with_time, ['2024-01-01 00:00:00', '2024-01-02 10:30:00'])
+
+    def test_pack_ranges(self):
+        ranges = [(f"A{i}", [['x' * 100]]) for i in range(10)]
+        payloads = list(sheets.pack_ranges(ranges,max_payload_bytes=500))
+
+        self.assertTrue(len(payloads) > 1)
+        self.assertEqual(sum(len(data) for data in payloads), 10)
+
+    def test_estimate_size(self):
+        values = [[i, f'name {i}', i * 1.5, i % 2 == 0] for i in range(5000)]
+        size = len(json.dumps(values))
+
+        self.assertEqual(sheets.estimate_size(values[:10]), len(json.dumps(values[:10])))
+        self.assertLess(abs(sheets.estimate_size(values) - size), size * 0.05)
+
+    def test_changed_cells(self):
+        old_values = [['id', 'value'], [1, 'a'], [2, 'b'], [3]]
+        new_values = [['id', 'value'], ['1', 'a'], [2, 'c'], [3, ''], [4, 'd']]
+
+        mask = sheets.changed_cells(old_values,new_values)
+
+        self.assertEqual(mask.tolist(), [
+            [False, False],
+            [False, False],
+            [False, True],
+            [False, False],
+            [True, True],
+        ])
+
+    def test_changed_rectangles(self):
+        mask = np.array([
+            [True, True, False, False],
+            [True, True, False, True],
+            [False, False, False, True],
+            [False, False, False, False],
+            [True, False, False, False],
+        ])
+
+        self.assertEqual(sheets.changed_rectangles(mask), [(0, 0, 2, 2), (1, 3, 3, 4), (4, 0, 5, 1)])
+
+    def test_normalize_keys(self):
+        keys = sheets.normalize_keys([1, '1', 1.0, np.int64(1), '1.0', 'a', None, np.nan, True, 1.5, '1.50'])
+        self.assertEqual(keys.tolist(), ['1', '1', '1', '1', '1', 'a', '', '', 'True', '1.5', '1.5'])
+
+        keys = sheets.normalize_keys(['007', 7, 9007199254740993, 9007199254740992, '9007199254740993'])
+        self.assertEqual(keys.tolist(), ['007', '7', '9007199254740993', '9007199254740992', '9007199254740993'])
+        self.assertEqual(sheets.contiguous_blocks([1, 2, 3, 7, 9, 10]), [(1, 4), (7, 8), (9, 11)])
+
+    def test_join_blocks(self):
+        blocks = sheets.row_blocks(10,4)
+        self.assertEqual(blocks, [(1, 4), (5, 8), (9, 10)])
+
+        values = sheets.join_blocks([(4, [['a'], ['b']]), (4, []), (2, [['c']])])
+        self.assertEqual(values, [['a'], ['b'], [], [], [], [], [], [], ['c']])
+
+    def test_build_frame(self):
+        values = [['id', 'flag', 'date'], [1, 'TRUE', '2024-01-01'], ['2', 'FALSE'], [], [3.5, '', '2024-02-03']]
+
+        df = sheets.build_frame(values)
+        self.assertEqual(df.shape, (4, 3))
+        self.assertEqual(df.iloc[1].tolist()[:2], ['2', 'FALSE'])
+        self.assertTrue(df.iloc[2].isna().all())
+
+        df = sheets.build_frame(values,infer_dtypes=True,dtype={'id': 'string'})
+        self.assertEqual(df['flag'].dtype, 'boolean')
+        self.assertTrue(pd.api.types.is_datetime64_any_dtype(df['date']))
+        self.assertEqual(df['id'].dtype, 'string')
+        self.assertEqual(sheets.build_frame(values,unformat=True).iloc[2].tolist(), ['NULL', 'NULL', 'NULL'])
+
+    def test_infer_column(self):
+        column = sheets.infer_column(pd.Series(['9007199254740993', 2, '']))
+        self.assertEqual(column.dtype, 'Int64')
+        self.assertEqual(column[0], 9007199254740993)
+        self.assertTrue(column.isna()[2])
+
+        self.assertEqual(sheets.infer_column(pd.Series([1, '2'])).dtype, 'int64')
+        self.assertEqual(sheets.infer_column(pd.Series(['00123', '45'])).tolist(), ['00123', '45'])
+        self.assertEqual(sheets.infer_column(pd.Series(['Jan', 'Feb'])).tolist(), ['Jan', 'Feb'])
+        self.assertTrue(pd.api.types.is_datetime64_any_dtype(sheets.infer_column(pd.Series(['2024-01-31', '1/2/2024 10:00:00', '']))))
+
+
+if __name__ == '__main__':
+    unittest.main()